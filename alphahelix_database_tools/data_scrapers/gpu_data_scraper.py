@@ -4,6 +4,8 @@ from bs4 import BeautifulSoup
 import re
 import logging
 
+from alphahelix_database_tools.utils.http_session import get_http_session
+
 logging.basicConfig(level=logging.INFO)
 
 def fetch_gpu_pricing(source):
@@ -30,7 +32,7 @@ def _fetch_gpu_pricing_from_coreweave():
     url = "https://www.coreweave.com/gpu-cloud-pricing"
 
     try:
-        response = requests.get(url, timeout=10)
+        response = get_http_session().get(url, timeout=10)
         response.raise_for_status()  # Raise an error for HTTP issues
     except requests.exceptions.RequestException as error:
         logging.warning(f"Error fetching the URL: {error}")
@@ -89,7 +91,7 @@ def _fetch_gpu_pricing_from_cudocompute():
     }
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = get_http_session().get(url, headers=headers, timeout=10)
         response.raise_for_status()
     except requests.exceptions.RequestException as error:
         print(f"Error fetching the URL: {error}")
@@ -135,7 +137,7 @@ def _fetch_gpu_pricing_from_runpod():
     }
 
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = get_http_session().get(url, headers=headers, timeout=10)
         response.raise_for_status()
     except requests.exceptions.RequestException as error:
         print(f"Error fetching the URL: {error}")
@@ -176,7 +178,7 @@ def _fetch_gpu_pricing_from_datacrunch():
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
     }
     try:    
-        response = requests.get(url, headers=headers)
+        response = get_http_session().get(url, headers=headers)
         response.raise_for_status()  # Raise HTTPError for bad responses
     except requests.RequestException as e:
         print(f"Error fetching URL: {e}")
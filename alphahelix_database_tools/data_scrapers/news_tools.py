@@ -2,7 +2,6 @@ from datetime import datetime, timezone, timedelta
 import os, re, time, base64
 import logging, time
 import pandas as pd
-import requests
 
 import google.auth
 import google.auth.transport.requests
@@ -12,6 +11,7 @@ import google_auth_oauthlib.flow
 from googleapiclient.discovery import build
 
 from alphahelix_database_tools.utils import str2datetime, str2unix_timestamp
+from alphahelix_database_tools.utils.http_session import get_http_session
 
 ### news API 測試
 def get_stock_news_from_news_API(API_key, ticker, start_timestamp=None):
@@ -20,7 +20,7 @@ def get_stock_news_from_news_API(API_key, ticker, start_timestamp=None):
     else:
         url = f"https://newsapi.org/v2/everything?q={ticker}&language=en&zh&apiKey={API_key}"
     
-    res = requests.get(url).json()
+    res = get_http_session().get(url).json()
     if res["status"] == "error":
         print(f"Error: {res['code']} - {res['message']}")
         return pd.DataFrame()
@@ -59,7 +59,7 @@ def get_stock_report_from_seekingalpha(API_key, ticker, start_date=None, size=40
         start_date_unix = str2unix_timestamp(start_date)
         query_string.update({"since": str(start_date_unix)})
         
-    response = requests.get(url, headers=headers, params=query_string)
+    response = get_http_session().get(url, headers=headers, params=query_string)
     raw_data_list = dict(response.json())["data"]
     
     # 處理數據格式
@@ -103,7 +103,7 @@ def get_stock_news_from_seekingalpha(API_key, ticker, start_date=None, size=40):
         start_date_unix = str2unix_timestamp(start_date)
         querystring.update({"since": str(start_date_unix)})
 
-    response = requests.get(url, headers=headers, params=querystring)
+    response = get_http_session().get(url, headers=headers, params=querystring)
     raw_data_list = dict(response.json())["data"]
 
     # 處理數據格式
@@ -139,7 +139,7 @@ def get_articles_from_reuters(API_key, keyword, num=10):
         'X-RapidAPI-Key': API_key,
         'X-RapidAPI-Host': "reuters-business-and-financial-news.p.rapidapi.com"
     }
-    response = requests.get(url, headers=headers)
+    response = get_http_session().get(url, headers=headers)
     raw_data_list = dict(response.json())['articles']
 
     article_meta_list = list()
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Coroutine, List
+
+import httpx
+
+POLYGON_BASE_URL = "https://api.polygon.io"
+
+class PolygonStatusError(Exception):
+    """Polygon 回應的 status 非正常狀態（如 NOT_AUTHORIZED / ERROR），翻頁查詢無法取得完整結果"""
+
+class TokenBucket:
+    """
+    令牌桶限速器：每秒補充 rate 個令牌，最多累積 capacity 個（允許短暫突發），每次請求消耗一個令牌。
+    """
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class PolygonClient:
+    """
+    Polygon API 的非同步客戶端：共用 httpx.AsyncClient（keep-alive 連線池），以令牌桶限制每秒請求數、以 semaphore 限制同時請求數，
+    並於 429 / 5xx / 連線錯誤時以指數退避重試。
+
+    使用方式：
+        async with PolygonClient(API_key) as client:
+            data_json = await client.get_json("/v3/reference/splits", params={"execution_date": "2024-01-02"})
+    """
+    # 預設值可由環境變數覆寫，以配合 Polygon 方案的速率上限
+    DEFAULT_REQUESTS_PER_SECOND = float(os.getenv("polygon_requests_per_second", 50))
+    DEFAULT_MAX_CONCURRENCY = int(os.getenv("polygon_max_concurrency", 20))
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+    # 翻頁查詢時視為正常的回應狀態
+    OK_STATUS_SET = {"OK", "DELAYED"}
+
+    def __init__(self, API_key: str, requests_per_second: float = None, max_concurrency: int = None,
+                 max_retries: int = 5, backoff_base: float = 0.5, timeout: float = 30.0):
+        """
+        - requests_per_second: 每秒請求數上限（依 Polygon 方案設定）
+        - max_concurrency: 同時進行的請求數上限（亦為連線池大小）
+        - max_retries: 429 / 5xx / 連線錯誤的重試次數
+        - backoff_base: 指數退避的基礎秒數（第 n 次重試等待 backoff_base * 2^n 秒，並加上隨機抖動）
+        """
+        self.API_key = API_key
+        self.requests_per_second = requests_per_second or self.DEFAULT_REQUESTS_PER_SECOND
+        self.max_concurrency = max_concurrency or self.DEFAULT_MAX_CONCURRENCY
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self._client = None
+
+    async def __aenter__(self):
+        limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+        self._rate_limiter = TokenBucket(self.requests_per_second)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self._client.aclose()
+        self._client = None
+
+    def _get_retry_delay(self, attempt: int, response: httpx.Response = None) -> float:
+        # 429 回應若帶有 Retry-After，依其指示等待
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff_base * (2 ** attempt) + random.uniform(0, self.backoff_base)
+
+    async def get_json(self, url: str, params: dict = None) -> dict:
+        """
+        發送 GET 請求並返回 JSON（API key 自動附加）。
+        - url: 完整網址（如翻頁的 next_url），或以 "/" 開頭的 API 路徑
+        - params: 查詢參數（與網址中既有的參數合併）
+        """
+        if url.startswith("/"):
+            url = POLYGON_BASE_URL + url
+        params = {**(params or {}), "apiKey": self.API_key}
+
+        for attempt in range(self.max_retries + 1):
+            await self._rate_limiter.acquire()
+            response = None
+            try:
+                async with self._semaphore:
+                    response = await self._client.get(url, params=params)
+                if response.status_code not in self.RETRY_STATUS_CODES:
+                    return response.json()
+                error = httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request, response=response)
+            except httpx.TransportError as e:
+                error = e
+
+            if attempt == self.max_retries:
+                raise error
+            delay = self._get_retry_delay(attempt, response)
+            logging.warning(f"[Polygon][{url.split('?')[0]}][請求失敗（{error}），{delay:.1f} 秒後重試（{attempt + 1}/{self.max_retries}）]")
+            await asyncio.sleep(delay)
+
+    async def iter_paginated_results(self, url: str, params: dict = None, strict: bool = True) -> AsyncIterator[dict]:
+        """
+        依 next_url 逐筆產出 results（Polygon 單頁上限 1000 筆），不需先收集全部頁面。
+        取得一頁後即先發出下一頁的請求（預取），於呼叫端處理本頁資料的同時下載下一頁。
+        - strict: 任一頁的 status 異常時拋出 PolygonStatusError（避免呼叫端將不完整的結果視為完整）；
+                  False 時僅記錄錯誤並停止翻頁（保留已取得的結果）
+        """
+        limit = (params or {}).get("limit", 1000)
+        next_page_task = asyncio.ensure_future(self.get_json(url, params))
+        try:
+            while next_page_task is not None:
+                data_json = await next_page_task
+                next_page_task = None
+                if data_json.get("status") not in self.OK_STATUS_SET:
+                    message = f"[Polygon][{url.split('?')[0]}][資料狀態異常({data_json.get('status', 'Unknown error')})，停止翻頁]"
+                    if strict:
+                        raise PolygonStatusError(message)
+                    logging.error(message)
+                    break
+                next_url = data_json.get("next_url")
+                if next_url:
+                    next_page_task = asyncio.ensure_future(self.get_json(next_url, params={"limit": limit}))
+                for result in data_json.get("results", []):
+                    yield result
+        finally:
+            # 呼叫端提前結束迭代時，取消尚未完成的預取請求
+            if next_page_task is not None and not next_page_task.done():
+                next_page_task.cancel()
+
+    async def get_paginated_results(self, url: str, params: dict = None, strict: bool = True) -> List[dict]:
+        """
+        依 next_url 逐頁取出全部 results（Polygon 單頁上限 1000 筆），strict 同 iter_paginated_results。
+        """
+        return [result async for result in self.iter_paginated_results(url, params, strict=strict)]
+
+    async def map(self, task_function: Callable[[Any], Awaitable[Any]], arg_list: List[Any], label: str = "") -> List[Any]:
+        """
+        以固定數量的 worker 併發執行 task_function(arg)（同時進行的任務數不超過 max_concurrency），返回與 arg_list 對應的結果。
+        單一任務失敗時僅記錄警告，對應結果為 None（不中斷其他任務）。
+        """
+        results = [None] * len(arg_list)
+        arg_iterator = iter(enumerate(arg_list))
+        completed_count = 0
+
+        async def _worker():
+            nonlocal completed_count
+            for index, arg in arg_iterator:
+                try:
+                    results[index] = await task_function(arg)
+                except Exception as e:
+                    logging.warning(f"[Polygon][{arg}]{label} 資料下載失敗: {e}")
+                completed_count += 1
+                percentage = 100*round(completed_count/len(arg_list), 2)
+                logging.info(f"[Polygon][{arg}]{label} 資料下載中，完成度{percentage}%")
+
+        await asyncio.gather(*(_worker() for _ in range(min(self.max_concurrency, len(arg_list)))))
+        return results
+
+def run_async(coroutine: Coroutine) -> Any:
+    """
+    於同步程式中執行協程；若目前執行緒已有執行中的事件迴圈（如 Jupyter），則改於新執行緒中執行。
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    result = {}
+    def _run():
+        try:
+            result["value"] = asyncio.run(coroutine)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=_run)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
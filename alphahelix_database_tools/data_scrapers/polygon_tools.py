@@ -1,28 +1,32 @@
-import requests
-import os, logging, time
+import os, logging
 from datetime import datetime, timedelta, timezone
-from threading import Thread
 import pandas as pd
 
 from alphahelix_database_tools.utils import datetime2str
+from alphahelix_database_tools.data_scrapers.polygon_client import PolygonClient, run_async
+
+def get_request_date_list(start_date, end_date, trade_calendar=None, include_non_trade_dates=False):
+    """
+    規劃需發出請求的日期（字串）：給定交易日曆（TradingCalendar，由 MarketStatusDAO 提供）時，日曆涵蓋範圍內僅保留交易日，
+    超出日曆範圍的日期無法判斷，仍逐日請求；未給定日曆或 include_non_trade_dates 為 True 時則逐日請求。
+    """
+    date_range = pd.date_range(start_date, end_date, freq='d')
+    if trade_calendar is not None and not include_non_trade_dates:
+        is_covered = (date_range >= pd.Timestamp(trade_calendar.start_timestamp)) & (date_range <= pd.Timestamp(trade_calendar.end_timestamp))
+        date_range = date_range[~is_covered | date_range.isin(trade_calendar.trade_dates)]
+    return list(map(lambda x:datetime2str(x), list(date_range)))
 
 # Note：已去除存檔，改為回傳data dict
 # 自polygon下載EOD價量相關資料，若無指定起始/結束日期，則自動以上次更新日期的後一日開始抓取資料，更新至今日
-def save_stock_OHLCV_from_Polygon(API_key, start_date=None, end_date=None, adjust=False):
-    def _save_stock_OHLCV_from_Polygon_singleDate(API_key, date, item_list, data_dict, adjust):
+def save_stock_OHLCV_from_Polygon(API_key, start_date=None, end_date=None, adjust=False, trade_calendar=None):
+    async def _save_stock_OHLCV_from_Polygon_singleDate(client, date):
         # 將boolean value串連url string，用於呼叫API
         adjust_flag = "true" if adjust else "false"
-
-        url = (
-                f"https://api.polygon.io/v2/aggs/grouped/locale/us/market/stocks/{date}"
-                f"?adjusted={adjust_flag}&apiKey={API_key}"
-            )
-        
-        data_json = requests.get(url).json()
+        data_json = await client.get_json(f"/v2/aggs/grouped/locale/us/market/stocks/{date}", params={"adjusted": adjust_flag})
         
         # status DELAYED代表美股盤後交易時段，約台灣時間中午12點方能取得昨日的正式收盤價（確切時間待確定）
         if (data_json["status"] in ["NOT_AUTHORIZED", "DELAYED"]) or (data_json["queryCount"] == 0):
-            logging.warning(f"[Polygon][{date}][OHLCV] 資料狀態異常({data_json["status"]})，請稍後再試")
+            logging.warning(f"[Polygon][{date}][OHLCV] 資料狀態異常({data_json['status']})，請稍後再試")
             return False
         # 將polygon回傳資料轉化為dataframe
         df = pd.DataFrame(data_json["results"])
@@ -42,142 +46,223 @@ def save_stock_OHLCV_from_Polygon(API_key, start_date=None, end_date=None, adjus
             # {item:{date:{ticker:value}}}
             data_dict[item][date] = data_series.to_dict()
 
-    # 列出起始/結束日，中間的日期，並轉為字串形式
-    date_range_list = list(map(lambda x:datetime2str(x), list(pd.date_range(start_date, end_date, freq='d'))))
-    threads = list()
+    # 列出起始/結束日，中間的日期（給定交易日曆時略過非交易日），並轉為字串形式
+    date_range_list = get_request_date_list(start_date, end_date, trade_calendar)
     
-    # 逐日下載資料，儲存在dict中
+    # 逐日下載資料（由 PolygonClient 控制速率與併發數），儲存在dict中
     item_list = ["open", "high", "low", "close", "volume", "avg_price", "transaction_num"]
     data_dict = {item: {} for item in item_list}
 
-    for index, date in enumerate(date_range_list, 1):
-        t = Thread(target=_save_stock_OHLCV_from_Polygon_singleDate, 
-            args=(API_key, date, item_list, data_dict, adjust))
-        t.start()  # 開啟線程，在線程之間設定間隔，避免資料源過載或爬蟲阻擋
-        time.sleep(0.1)
-        threads.append(t)
-        percentage = 100*round(index/len(date_range_list), 2)            
-        logging.info("[Polygon][{date}][OHLCV] 資料下載中，完成度{percentage}%".format(date=date, percentage=percentage))
+    async def _save_all():
+        async with PolygonClient(API_key) as client:
+            await client.map(lambda date: _save_stock_OHLCV_from_Polygon_singleDate(client, date), date_range_list, label="[OHLCV]")
+    
+    run_async(_save_all())
+    return data_dict
+
+# polygon flat file（每日彙總 CSV.gz）欄位與資料庫 item 的對應；flat file 皆為未調整價格
+FLAT_FILE_ITEM_COLUMN_DICT = {"open": "open", "high": "high", "low": "low", "close": "close", "volume": "volume", "transaction_num": "transactions"}
+FLAT_FILE_CHUNK_SIZE = 100000
 
-    for t in threads:
-        t.join()
+def get_polygon_flat_file_path_dict(folder_path):
+    """
+    取得本地資料夾（含子資料夾，如 polygon 原始的 year/month 結構）中的 flat file 路徑：{date_str: file_path}
+    檔名須為日期（如 2024-01-02.csv.gz）
+    """
+    file_path_dict = dict()
+    for root, _, file_name_list in os.walk(folder_path):
+        for file_name in file_name_list:
+            if file_name.endswith(".csv.gz") or file_name.endswith(".csv"):
+                file_path_dict[file_name.split(".")[0]] = os.path.join(root, file_name)
+    return file_path_dict
+
+# 自本地的polygon flat file（每日彙總 CSV.gz）讀取EOD價量資料，僅讀取date_list中的日期（呼叫端依交易日曆給定，跳過非交易日）
+def save_stock_OHLCV_from_Polygon_flat_file(folder_path, date_list, chunk_size=FLAT_FILE_CHUNK_SIZE, file_path_dict=None):
+    """
+    回傳格式與 save_stock_OHLCV_from_Polygon 相同：{item: {date_str: {ticker: value}}}，缺少檔案的日期不列入。
+    - chunk_size: 每次讀取的列數（分段讀取，不需一次載入整個檔案）
+    - file_path_dict: get_polygon_flat_file_path_dict 的結果（重複呼叫時可傳入，避免重複掃描資料夾）
+    """
+    if file_path_dict is None:
+        file_path_dict = get_polygon_flat_file_path_dict(folder_path)
+    
+    data_dict = {item: {} for item in FLAT_FILE_ITEM_COLUMN_DICT}
+    usecols = ["ticker"] + list(FLAT_FILE_ITEM_COLUMN_DICT.values())
+    for date in map(datetime2str, date_list):
+        file_path = file_path_dict.get(date)
+        if file_path is None:
+            logging.warning(f"[Polygon][{date}][OHLCV][flat file] 找不到檔案，略過")
+            continue
         
+        date_item_dict = {item: {} for item in FLAT_FILE_ITEM_COLUMN_DICT}
+        for chunk_df in pd.read_csv(file_path, usecols=usecols, chunksize=chunk_size, keep_default_na=False, na_values=[""]):
+            # 將polygon ticker格式轉化為資料庫格式（用"_"標示所有連接符）
+            ticker_list = chunk_df["ticker"].astype(str).str.replace(".", "_", regex=False).tolist()
+            for item, column in FLAT_FILE_ITEM_COLUMN_DICT.items():
+                date_item_dict[item].update(zip(ticker_list, chunk_df[column].tolist()))
+        
+        for item in FLAT_FILE_ITEM_COLUMN_DICT:
+            data_dict[item][date] = date_item_dict[item]
+        logging.info(f"[Polygon][{date}][OHLCV][flat file] 讀取完成")
+    
     return data_dict
 
-def save_stock_split_from_Polygon(API_key, start_date=None, end_date=None):
-    def _save_stock_split_from_Polygon_singleDate(API_key, date, data_dict):
-        url = "https://api.polygon.io/v3/reference/splits?execution_date={date}&apiKey={API_key}".format(date=date, API_key=API_key)
-        data_json = requests.get(url).json()
-        results_dict = data_json["results"]
-        if len(results_dict) > 0:
-            df = pd.DataFrame(results_dict)
-            df["adjust_factor"] = df["split_to"] / df["split_from"]
-            df = df.pivot(index="execution_date", columns="ticker", values="adjust_factor").T
-            data_dict[date] = df.sort_index()
-    
-    date_range_list = list(map(lambda x:datetime2str(x), list(pd.date_range(start_date, end_date, freq='d'))))
+def pivot_result_list(result_list, date_key, value_key, aggregate="last"):
+    """
+    將 polygon 回傳的 results（每筆含 ticker、日期與數值）一次轉為 {date_str: {ticker: value}}（日期排序）
+    - aggregate: 同日同 ticker 有多筆時的處理方式，last（取最後一筆）/ sum（加總，如同日除息的一般與特別現金股利）
+      （同一筆資料（id 相同）重複出現時僅計入一次）
+    """
+    if aggregate not in ["last", "sum"]:
+        raise ValueError("aggregate 必須是 'last' 或 'sum'")
     
     data_dict = dict()
-    threads = list()  # 儲存線程以待關閉
-    try:
-        for index, date in enumerate(date_range_list, 1):
-            t = Thread(target=_save_stock_split_from_Polygon_singleDate, 
-                        args=(API_key, date, data_dict))
-            t.start()  # 開啟線程
+    seen_id_set = set()
+    for result in result_list:
+        result_id = result.get("id")
+        if result_id is not None:
+            if result_id in seen_id_set:
+                continue
+            seen_id_set.add(result_id)
+        
+        date_data_dict = data_dict.setdefault(result[date_key], dict())
+        if aggregate == "sum" and result["ticker"] in date_data_dict:
+            date_data_dict[result["ticker"]] += result[value_key]
+        else:
+            date_data_dict[result["ticker"]] = result[value_key]
+    return {date: data_dict[date] for date in sorted(data_dict)}
 
-            #在線程之間設定間隔（0.5秒），避免資料源過載或爬蟲阻擋
-            time.sleep(0.1)
-            threads.append(t)
-            percentage = 100*round(index/len(date_range_list), 2)            
-            logging.info("[Polygon][{date}][split] 資料下載中，完成度{percentage}%".format(date=date, percentage=percentage))                
-        for t in threads:
-            t.join()
+async def _get_range_results(client, url, date_key, start_date, end_date, params=None):
+    """以 {date_key}.gte / .lte 範圍查詢取得整段期間的 results（依日期排序並翻頁）"""
+    params = {**(params or {}), f"{date_key}.gte": datetime2str(start_date), f"{date_key}.lte": datetime2str(end_date),
+              "sort": date_key, "order": "asc", "limit": 1000}
+    return await client.get_paginated_results(url, params=params)
+
+def save_stock_split_from_Polygon(API_key, start_date=None, end_date=None, trade_calendar=None, mode="daily"):
+    """
+    回傳 {date_str: {ticker: split_to / split_from}}
+    mode: daily（逐日請求，預設）/ range（以 execution_date 範圍查詢，整段期間僅需少數翻頁請求，查詢失敗時拋出錯誤）
+          range 模式以 Polygon 回傳的日期為 key，該日期為非交易日時與 daily 模式（僅請求交易日）的結果不同
+    trade_calendar: 給定時略過非交易日的請求（僅 daily 模式；range 模式不逐日請求，不需交易日曆）
+    """
+    async def _save_stock_split_from_Polygon_singleDate(client, date):
+        data_json = await client.get_json("/v3/reference/splits", params={"execution_date": date})
+        result_list.extend(data_json["results"])
+    
+    async def _save_stock_split_from_Polygon_range(client):
+        result_list.extend(await _get_range_results(client, "/v3/reference/splits", "execution_date", start_date, end_date))
+    
+    if mode not in ["range", "daily"]:
+        raise ValueError(f"[Polygon][split] 不支持的模式: {mode}")
+    
+    # 分割生效日（execution_date）皆為交易日，給定交易日曆時略過非交易日（僅 daily 模式需規劃逐日請求）
+    if mode == "daily":
+        date_range_list = get_request_date_list(start_date, end_date, trade_calendar)
     
+    result_list = list()
+    async def _save_all():
+        async with PolygonClient(API_key) as client:
+            if mode == "range":
+                await _save_stock_split_from_Polygon_range(client)
+            else:
+                await client.map(lambda date: _save_stock_split_from_Polygon_singleDate(client, date), date_range_list, label="[split]")
+    
+    try:
+        run_async(_save_all())
     except Exception as e:
+        # range 模式為整段期間單一翻頁查詢，部分失敗即無法取得完整結果，須拋出錯誤（不可將部分結果視為完整寫入）
+        if mode == "range":
+            logging.error(f"[Polygon][split][{datetime2str(start_date)} ~ {datetime2str(end_date)}] 範圍查詢失敗: {e}")
+            raise
         logging.warning(e)
+    
+    result_list = [{**result, "adjust_factor": result["split_to"] / result["split_from"]} for result in result_list if result.get("split_from")]
+    return pivot_result_list(result_list, date_key="execution_date", value_key="adjust_factor")
 
-    return data_dict
-
-def save_stock_cash_dividend_from_Polygon(API_key, start_date, end_date, div_type):
+def save_stock_cash_dividend_from_Polygon(API_key, start_date, end_date, div_type, trade_calendar=None, include_non_trade_dates=None, mode="daily"):
     """
     div_type: ex_dividend_date / pay_date
+    trade_calendar: 給定時略過非交易日的請求（僅 daily 模式；range 模式不逐日請求，不需交易日曆）
+    include_non_trade_dates: 是否仍請求非交易日（僅 daily 模式，預設僅 pay_date 為 True，因發放日可能落在非交易日）
+    mode: daily（逐日請求，預設）/ range（以 div_type 範圍查詢，整段期間僅需少數翻頁請求）
+          range 模式以 Polygon 回傳的日期為 key，該日期為非交易日時與 daily 模式（略過非交易日）的結果不同
+    回傳 {date_str: {ticker: cash_amount}}（僅美元股利，同日多筆股利加總；當日僅有外幣股利時為空dict）
+    range 模式查詢失敗時拋出錯誤（不返回部分結果）
     """
-    def _save_stock_cash_dividend_from_Polygon_singleDate(API_key, date, div_type, data_dict):
+    async def _save_stock_cash_dividend_from_Polygon_singleDate(client, date):
         #只下載現金股利（CD）
-        url = "https://api.polygon.io/v3/reference/dividends?{0}={1}&apiKey={2}&dividend_type=CD".format(div_type, date, API_key)
-        data_json = requests.get(url).json()
+        data_json = await client.get_json("/v3/reference/dividends", params={div_type: date, "dividend_type": "CD"})
         
         # 確認資料狀態
         if data_json["status"] != "OK":
-            logging.warning(f"[Polygon][{date}][dividends][{div_type}] 資料狀態異常({data_json["status"]})，請稍後再試")
+            logging.warning(f"[Polygon][{date}][dividends][{div_type}] 資料狀態異常({data_json['status']})，請稍後再試")
             return False
         
-        results_dict = data_json["results"]
-        if len(results_dict) > 0:
-            df = pd.DataFrame(results_dict)
-            df = df[df["currency"] == "USD"] # 只取美元股利（外幣股利暫不處理）
-            if len(df) > 0:
-                d = df.pivot(index="ticker", columns=div_type, values="cash_amount").to_dict()
-            else:
-                d = {date: {}}
-            
-            data_dict.update(d)
+        result_list.extend(data_json["results"])
+    
+    async def _save_stock_cash_dividend_from_Polygon_range(client):
+        #只下載現金股利（CD）
+        result_list.extend(await _get_range_results(client, "/v3/reference/dividends", div_type, start_date, end_date, params={"dividend_type": "CD"}))
     
     if div_type not in ["ex_dividend_date", "pay_date"]:
-        logging.warning(f"[Polygon][{date}][dividends][{div_type}] 資料類型錯誤，請檢查")
+        logging.warning(f"[Polygon][dividends][{div_type}] 資料類型錯誤，請檢查")
         return False
     
-    # 列出起始/結束日，中間的日期，並轉為字串形式
-    data_dict = dict()
-    date_range_list = list(map(lambda x:datetime2str(x), list(pd.date_range(start_date, end_date, freq='d'))))
-    threads = list()  # 儲存線程以待關閉
-    try:
-        for index, date in enumerate(date_range_list, 1):
-            t = Thread(target=_save_stock_cash_dividend_from_Polygon_singleDate, 
-                        args=(API_key, date, div_type, data_dict))
-            t.start()  # 開啟線程
-            time.sleep(0.1) #在線程之間設定間隔（0.1秒），避免資料源過載或爬蟲阻擋
-            threads.append(t)
-            percentage = 100*round(index/len(date_range_list), 2)         
-            logging.info(f"[Polygon][{date}][dividends][{div_type}] 資料下載中，完成度{percentage}%")                
-        for t in threads:
-            t.join()
+    if mode not in ["range", "daily"]:
+        raise ValueError(f"[Polygon][dividends] 不支持的模式: {mode}")
+    
+    # 列出起始/結束日，中間的日期，並轉為字串形式（僅 daily 模式需規劃逐日請求）
+    if include_non_trade_dates is None:
+        include_non_trade_dates = (div_type == "pay_date")
+    result_list = list()
+    if mode == "daily":
+        date_range_list = get_request_date_list(start_date, end_date, trade_calendar, include_non_trade_dates)
     
+    async def _save_all():
+        async with PolygonClient(API_key) as client:
+            if mode == "range":
+                await _save_stock_cash_dividend_from_Polygon_range(client)
+            else:
+                await client.map(lambda date: _save_stock_cash_dividend_from_Polygon_singleDate(client, date), date_range_list, label=f"[dividends][{div_type}]")
+    
+    try:
+        run_async(_save_all())
     except Exception as e:
+        # range 模式為整段期間單一翻頁查詢，部分失敗即無法取得完整結果，須拋出錯誤（不可將部分結果視為完整寫入）
+        if mode == "range":
+            logging.error(f"[Polygon][dividends][{datetime2str(start_date)} ~ {datetime2str(end_date)}] 範圍查詢失敗: {e}")
+            raise
         logging.warning(e)
-
-    return data_dict
+    
+    # 只取美元股利（外幣股利暫不處理），有資料但皆非美元股利的日期保留為空dict
+    data_dict = {result[div_type]: dict() for result in result_list if result.get(div_type)}
+    data_dict.update(pivot_result_list([result for result in result_list if result.get("currency") == "USD" and result.get(div_type)],
+                                       date_key=div_type, value_key="cash_amount", aggregate="sum"))
+    return {date: data_dict[date] for date in sorted(data_dict)}
 
 def save_stock_shares_outstanding_from_Polygon(API_key, ticker_list, start_date, end_date):
     # 流通股數係透過polygon中的ticker detail資訊取得，索取方式為給定ticker與date，故包裝為雙重函數
-    def _save_stock_shares_outstanding_from_Polygon_singleDate(API_key, ticker_list, date):
-        def _save_stock_shares_outstanding_from_Polygon_singleTicker(API_key, ticker, date):
-            url = "https://api.polygon.io/v3/reference/tickers/{}?date={}&apiKey={}".format(ticker, date, API_key)
-            data_json = requests.get(url).json()
+    async def _save_stock_shares_outstanding_from_Polygon_singleDate(client, ticker_list, date):
+        async def _save_stock_shares_outstanding_from_Polygon_singleTicker(ticker):
+            data_json = await client.get_json(f"/v3/reference/tickers/{ticker}", params={"date": date})
             # Note：不能用weighted shares
             data_dict[ticker] = data_json["results"]["share_class_shares_outstanding"]
         
         data_dict = dict()
-        threads = list()
-        for index, ticker in enumerate(ticker_list, 1):
-            t = Thread(target=_save_stock_shares_outstanding_from_Polygon_singleTicker, 
-                args=(API_key, ticker, date))
-            t.start()  # 開啟線程，在線程之間設定間隔，避免資料源過載或爬蟲阻擋
-            time.sleep(0.1)
-            threads.append(t)
-            percentage = 100*round(index/len(ticker_list), 2)            
-            logging.info("[Polygon][{date}][{ticker}]流通股數下載中，完成度{percentage}%".format(date=date, ticker=ticker, percentage=percentage))
-
-        for t in threads:
-            t.join()
-
+        await client.map(_save_stock_shares_outstanding_from_Polygon_singleTicker, ticker_list, label=f"[{date}]流通股數")
         return pd.Series(data_dict)
 
     date_range_list = list(map(lambda x:datetime2str(x), list(pd.date_range(start_date, end_date,freq='d'))))
     result_dict = dict()
-    for date in date_range_list:
-        data_series = _save_stock_shares_outstanding_from_Polygon_singleDate(API_key, ticker_list, date)
-        result_dict[date] = data_series.to_dict()
+    
+    async def _save_all():
+        # 所有日期共用同一客戶端（連線池與限速器）
+        async with PolygonClient(API_key) as client:
+            for date in date_range_list:
+                data_series = await _save_stock_shares_outstanding_from_Polygon_singleDate(client, ticker_list, date)
+                result_dict[date] = data_series.to_dict()
+    
+    run_async(_save_all())
     return result_dict
 
 def save_stock_universe_ticker_from_polygon(API_key, universe_name, start_date, end_date):    
@@ -189,48 +274,32 @@ def save_stock_universe_ticker_from_polygon(API_key, universe_name, start_date,
     
     data_dict = dict()
     date_range_list = list(map(lambda x:datetime2str(x), list(pd.date_range(start_date, end_date, freq='d'))))
-    for date in date_range_list:
-        ticker_list = list()
-        url = "https://api.polygon.io/v3/reference/tickers?type={ticker_type}&date={date}&market=stocks&active=True&limit=1000&apiKey={API_key}".format(ticker_type=ticker_type, date=date, API_key=API_key)
-        data_json = requests.get(url).json()
-        # 因polygon標的資料有索引上限1000，故須進行翻頁索引
-        part_ticker_list = list(pd.DataFrame(data_json["results"])["ticker"])
-        ticker_list.extend(part_ticker_list)
-        while True:
-            if "next_url" in data_json.keys():
-                next_url = data_json["next_url"] + "&apiKey={API_key}&limit=1000".format(API_key=API_key)
-                data_json = requests.get(next_url).json()
-                part_ticker_list = list(pd.DataFrame(data_json["results"])["ticker"])
-                ticker_list.extend(part_ticker_list)
-            else:
-                break
-
-        data_dict[date] = ticker_list
-        logging.info("[Polygon][{universe_name}][{date}]成分股資料抓取完成".format(universe_name=universe_name, date=date))
     
-    return data_dict
+    async def _save_stock_universe_ticker_from_polygon_singleDate(client, date):
+        # 因polygon標的資料有索引上限1000，故須進行翻頁索引（逐筆取出ticker，並預取下一頁）
+        # 任一頁狀態異常時拋出錯誤，該日不列入data_dict（不寫入不完整的成分股）
+        params = {"type": ticker_type, "date": date, "market": "stocks", "active": "True", "limit": 1000}
+        data_dict[date] = [result["ticker"] async for result in client.iter_paginated_results("/v3/reference/tickers", params=params)]
+    
+    async def _save_all():
+        # 多個日期併發下載（共用同一客戶端的限速器與併發上限）
+        async with PolygonClient(API_key) as client:
+            await client.map(lambda date: _save_stock_universe_ticker_from_polygon_singleDate(client, date), date_range_list, label=f"[{universe_name}]成分股")
+    
+    run_async(_save_all())
+    # 依日期排序（併發下載完成的順序不固定）
+    return {date: data_dict[date] for date in date_range_list if date in data_dict}
 
 def save_stock_delisted_info_from_polygon(folder_path, universe_type, API_key):
-    df_list = list()
-    url = "https://api.polygon.io/v3/reference/tickers?type={universe_type}&market=stocks&active=false&limit=1000&apiKey={API_key}".format(universe_type=universe_type, API_key=API_key)
-    data_json = requests.get(url).json()
-
-    # 因polygon標的資料有索引上限1000，故須進行翻頁索引
-    df = pd.DataFrame(data_json["results"])
-    df_list.append(df)
-    while True:
-        if "next_url" in data_json.keys():
-            next_url = data_json["next_url"] + "&apiKey={API_key}&limit=1000".format(API_key=API_key)
-            data_json = requests.get(next_url).json()
-            df = pd.DataFrame(data_json["results"])
-            df_list.append(df)
-        else:
-            break
+    async def _save_all():
+        async with PolygonClient(API_key) as client:
+            # 因polygon標的資料有索引上限1000，故須進行翻頁索引
+            params = {"type": universe_type, "market": "stocks", "active": "false", "limit": 1000}
+            # 逐筆僅保留所需欄位（原日期編碼為utc字串，前10碼為年月日）
+            return [(result["ticker"], result.get("name"), (result.get("delisted_utc") or "")[:10])
+                    async for result in client.iter_paginated_results("/v3/reference/tickers", params=params)]
     
-    df = pd.concat(df_list)
-    # 原日期編碼為utc字串，前10碼為年月日
-    df["delisted_date"] = df["delisted_utc"].apply(lambda x:x[:10])
-    df = df.loc[:, ["ticker", "name", "delisted_date"]]
+    df = pd.DataFrame(run_async(_save_all()), columns=["ticker", "name", "delisted_date"])
     df = df.drop_duplicates(subset=["ticker"])
     df = df.sort_values(by="delisted_date")
     df = df.reset_index(drop=True)
@@ -246,32 +315,25 @@ def save_stock_delisted_info_from_polygon(folder_path, universe_type, API_key):
     df.to_csv(filePath)
 
 def save_stock_company_info_from_Polygon(API_key, ticker_list):
-    def _save_stock_company_info_from_Polygon_singleTicker(API_key, ticker):
-        url = "https://api.polygon.io/v3/reference/tickers/{}?&apiKey={}".format(ticker, API_key)
-        data_json = requests.get(url).json()
+    async def _save_stock_company_info_from_Polygon_singleTicker(client, ticker):
+        data_json = await client.get_json(f"/v3/reference/tickers/{ticker}")
         company_info_dict[ticker] = data_json["results"]
     
     company_info_dict = {ticker:dict() for ticker in ticker_list}
-    threads = list()
-    for index, ticker in enumerate(ticker_list, 1):
-        t = Thread(target=_save_stock_company_info_from_Polygon_singleTicker, 
-            args=(API_key, ticker))
-        t.start()  # 開啟線程，在線程之間設定間隔，避免資料源過載或爬蟲阻擋
-        time.sleep(0.1)
-        threads.append(t)
-        percentage = 100*round(index/len(ticker_list), 2)            
-        logging.info("[Polygon][{ticker}]公司資訊下載中，完成度{percentage}%".format(ticker=ticker, percentage=percentage))
-
-    for t in threads:
-        t.join()
-
+    async def _save_all():
+        async with PolygonClient(API_key) as client:
+            await client.map(lambda ticker: _save_stock_company_info_from_Polygon_singleTicker(client, ticker), ticker_list, label="公司資訊")
+    
+    run_async(_save_all())
     company_info_df = pd.DataFrame(company_info_dict).T
     return company_info_df
 
 # 自polygon獲取市場狀態，1: 交易日, 0:六日休市, -1:非六日休市
 def save_stock_market_status_from_Polygon(API_key):
-    url = "https://api.polygon.io/v1/marketstatus/upcoming?apiKey={}".format(API_key)
-    data_json = requests.get(url).json()
+    async def _save_all():
+        async with PolygonClient(API_key) as client:
+            return await client.get_json("/v1/marketstatus/upcoming")
+    data_json = run_async(_save_all())
     
     # polygon會直接返回未來一年多的法定假日，故設定範圍為查詢日期之一年內
     start_date = datetime2str(datetime.today())
@@ -298,31 +360,16 @@ def save_stock_market_status_from_Polygon(API_key):
     return market_status_series
 
 def save_stock_news_from_Polygon(API_key, ticker, start_timestamp=None):
-    url = f"https://api.polygon.io/v2/reference/news?ticker={ticker}&limit=1000&apiKey={API_key}"
+    params = {"ticker": ticker, "limit": 1000}
     if start_timestamp is not None:
-        url += f"&published_utc.gt={start_timestamp.isoformat()}"
+        params["published_utc.gt"] = start_timestamp.isoformat()
     
-    response = requests.get(url)
-    data_dict = response.json()
-    raw_news_meta_list = []
-
-    if data_dict.get("status") == "OK":
-        raw_news_meta_list += data_dict.get("results", [])
-        
-        next_url = data_dict.get("next_url", None)
-        
-        page_count = 1
-        while next_url:
-            page_count += 1
-            response = requests.get(next_url + f"&apiKey={API_key}")
-            data_dict = response.json()
-            # 若翻頁過程中，status不為OK，則中斷迴圈
-            if data_dict.get("status") != "OK":
-                logging.error(f"Error: {data_dict.get('status', 'Unknown error')}")
-                break
-            
-            raw_news_meta_list += data_dict.get("results", [])
-            next_url = data_dict.get("next_url", None)
+    async def _save_all():
+        async with PolygonClient(API_key) as client:
+            # 翻頁過程中，若status不為OK，則停止翻頁（保留已取得的新聞）
+            return await client.get_paginated_results("/v2/reference/news", params=params, strict=False)
+    
+    raw_news_meta_list = run_async(_save_all())
 
     news_meta_list = list()
     for raw_news_meta in raw_news_meta_list:
@@ -1,6 +1,5 @@
-import os, tempfile, requests
+import os, tempfile
 
-import requests
 import numpy as np
 from concurrent.futures import ThreadPoolExecutor
 import cv2  #opencv-python #type: ignore
@@ -9,6 +8,7 @@ from PIL import Image, ImageFile #type: ignore
 
 from alphahelix_database_tools.utils.folder_ops import delete_folder_files
 from alphahelix_database_tools.external_tools.pdf_tools import clean_gibberish_text, count_text_length
+from alphahelix_database_tools.utils.http_session import get_http_session
 
 # 創建 OCR reader（只初始化一次，默認使用 CPU）
 import easyocr #type: ignore
@@ -181,7 +181,7 @@ def get_pdf_filtered_images(url, filtered_image_folder_path, min_text_length=15,
     # 使用 tempfile.TemporaryDirectory() 來管理臨時資料夾
     with tempfile.TemporaryDirectory() as temp_folder_path:
         # 透過 URL 下載 PDF 文件
-        response = requests.get(url)
+        response = get_http_session().get(url)
         if response.status_code == 200:
             # 將下載的 PDF 文件保存到臨時資料夾中
             temp_file_path = os.path.join(temp_folder_path, "temp_pdf_file.pdf")
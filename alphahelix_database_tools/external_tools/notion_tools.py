@@ -1,6 +1,7 @@
-import requests
 from pprint import pprint
 
+from alphahelix_database_tools.utils.http_session import get_http_session
+
 # 教學：https://tonisives.com/blog/2021/11/30/add-text-and-images-to-notion-via-the-official-api-and-python/
 class Notion:
     def __init__(self, notion_token: str):
@@ -12,7 +13,7 @@ class Notion:
 
     def _upload_blocks(self, parent_id: str, element_list: []):
         url = self.base_url + f"/blocks/{parent_id}/children"
-        res = requests.request("PATCH", url, headers=self.headers, json={"children": element_list})
+        res = get_http_session().request("PATCH", url, headers=self.headers, json={"children": element_list})
         
         if res.json()["object"] == "error":
             print(res.text)
@@ -80,7 +81,7 @@ class Notion:
                     ]
             }
         }
-        res = requests.request("POST", url=url, headers=self.headers, json=json)
+        res = get_http_session().request("POST", url=url, headers=self.headers, json=json)
         new_page_id = res.json()["id"]
         return new_page_id
     
@@ -1,9 +1,11 @@
 import fitz  # fitz（PyMuPDF）擷取PDF文字 &圖片
-import re, os, tempfile, requests, logging
+import re, os, tempfile, logging
 import numpy as np
 from concurrent.futures import ThreadPoolExecutor
 import tiktoken
 
+from alphahelix_database_tools.utils.http_session import get_http_session
+
 # import nltk
 # from nltk.tokenize import sent_tokenize, word_tokenize
 # import statistics
@@ -70,7 +72,7 @@ def get_pdf_text_from_url(url):
     # 使用临时文件夹，每个线程都有一个独立的临时文件夹
     with tempfile.TemporaryDirectory() as temp_folder_path:
         # 透过url取得报告PDF文件
-        response = requests.get(url)
+        response = get_http_session().get(url)
         # 将下载的 PDF 文件保存到本地
         if response.status_code == 200:
             temp_file_path = os.path.join(temp_folder_path, "temp_pdf_file.pdf")
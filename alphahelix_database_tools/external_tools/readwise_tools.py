@@ -1,9 +1,10 @@
-import requests
 from datetime import datetime, timezone, timedelta
 import re
 from bson.objectid import ObjectId
 import logging
 
+from alphahelix_database_tools.utils.http_session import get_http_session
+
 class ReadwiseTool():
     def __init__(self, MDB_client, token=None):
         self.client = MDB_client
@@ -29,7 +30,7 @@ class ReadwiseTool():
             if updated_after:
                 params['updatedAfter'] = updated_after
             
-            response = requests.get(
+            response = get_http_session().get(
                 url="https://readwise.io/api/v2/export/",
                 params=params,
                 headers={"Authorization": f"Token {token}"}, verify=False
@@ -1,7 +1,9 @@
 import logging
 from typing import List, Dict, Any, Union
+import numpy as np
 import pandas as pd
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 from .data_manager import UsStockDataManager
 
 class UsStockDataDetector:
@@ -11,17 +13,24 @@ class UsStockDataDetector:
         self.threshold = 0 # Default threshold for error detection
         self.description = "" # Description of the detector
         self.max_error_count = 1000
+        # 跨日檢測所需的前置交易日數（增量檢測時，額外載入新日期之前的資料，但不重複回報其中的錯誤）
+        self.lookback_days = 0
         
 
     def detect(self, data_set: Dict[str, pd.DataFrame]) -> pd.DataFrame:
         raise NotImplementedError("Subclasses must implement the detect method.")
 
-    def run(self, data_set: Dict[str, pd.DataFrame]) -> dict:
+    def run(self, data_set: Dict[str, pd.DataFrame], start_timestamp: datetime = None) -> dict:
+        """
+        - start_timestamp: 僅回報此日（含）之後的錯誤（之前的資料僅作為跨日檢測的前置資料）
+        """
         if not self._has_required_columns(data_set):
             raise ValueError(f"Data set is missing required columns for {self.name}.")
 
         try:
             detect_result_df = self.detect(data_set)
+            if start_timestamp is not None:
+                detect_result_df = detect_result_df.loc[detect_result_df.index >= start_timestamp]
             return self.generate_result(detect_result_df)
         
         except Exception as e:
@@ -42,27 +51,44 @@ class UsStockDataDetector:
                     "error_rate": 0.0,
                 }
         
-        if detect_result_df.any().any():
-            result["error_records"] = self._locate_errors(detect_result_df)
-            result["error_count"] = len(result["error_records"])
-            result["error_rate"] = result["error_count"] / detect_result_df.size
+        # 直接於布林陣列上計數與定位（不需 stack 整個 DataFrame）
+        error_mask = detect_result_df.to_numpy(dtype=bool, na_value=False)
+        error_count = int(np.count_nonzero(error_mask))
+        
+        if error_count > 0:
+            result["error_records"] = self._locate_errors(detect_result_df, error_mask, limit=self.max_error_count)
+            result["error_count"] = error_count
+            result["error_rate"] = error_count / error_mask.size
             
             if result["error_rate"] > self.threshold:
                 logging.error(f"Error rate exceeds threshold for detector '{self.name}'.")
             
-            # Limit the number of error records
-            if result["error_count"] > self.max_error_count:
-                result["error_records"] = result["error_records"][:self.max_error_count] 
-            
         else:
             logging.info(f"Check passed for detector '{self.name}'.")
             
         return result
 
-    def _locate_errors(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        error_locations = df.stack().reset_index()
-        error_locations.columns = ['data_timestamp', 'ticker', 'error']
-        return error_locations[error_locations['error']][['data_timestamp', 'ticker']].to_dict('records')    
+    def _locate_errors(self, df: pd.DataFrame, error_mask: np.ndarray, limit: int = None) -> List[Dict[str, Any]]:
+        """
+        以 np.nonzero 定位錯誤（依日期、ticker 順序），僅取出前 limit 筆（逐列取出，達上限即停止）。
+        """
+        row_positions, column_positions = [], []
+        remaining_count = limit if limit is not None else error_mask.size
+        for row in np.nonzero(error_mask.any(axis=1))[0]:
+            if remaining_count <= 0:
+                break
+            columns = np.nonzero(error_mask[row])[0][:remaining_count]
+            row_positions.append(np.full(len(columns), row))
+            column_positions.append(columns)
+            remaining_count -= len(columns)
+        
+        if not row_positions:
+            return []
+        row_positions, column_positions = np.concatenate(row_positions), np.concatenate(column_positions)
+        return [
+            {"data_timestamp": data_timestamp, "ticker": ticker}
+            for data_timestamp, ticker in zip(df.index[row_positions], df.columns[column_positions])
+        ]
 
 
 class NegValueDetector(UsStockDataDetector):
@@ -106,54 +132,140 @@ class UsStockDataDetectorManager(UsStockDataManager):
     """
     Data detector manager for US stock data.
     """
-    def __init__(self, username: str, password: str, start_timestamp: datetime, end_timestamp: datetime):
-        super().__init__(username, password)
+    # 併發執行的檢測器數上限（同時存在的檢測結果遮罩數亦受此限制）
+    DETECTOR_MAX_WORKERS = 4
+    
+    def __init__(self, username: str, password: str, start_timestamp: datetime, end_timestamp: datetime, max_pool_size: int = None, cache_dir: str = None,
+                 incremental: bool = False, lookback_days: int = 5):
+        """
+        - incremental: 增量檢測，僅檢測各 item 上次檢測之後的新日期（首次執行時自 start_timestamp 開始）
+        - lookback_days: 增量檢測時，額外載入新日期之前的交易日數（供跨日檢測使用，與各檢測器的 lookback_days 取較大者）
+        """
+        super().__init__(username, password, max_pool_size=max_pool_size, cache_dir=cache_dir)
         self.detectors: List[UsStockDataDetector] = []
         self.data_set: Dict[str, pd.DataFrame] = {}
         self.universe_tickers: Dict[str, List[str]] = {}
         self.start_timestamp = start_timestamp
         self.end_timestamp = end_timestamp
+        self.incremental = incremental
+        self.lookback_days = lookback_days
+        # 實際回報錯誤的起始日（增量檢測時為新日期的起始日，否則為 start_timestamp）
+        self.validation_start_timestamp = start_timestamp
 
     def register_detector(self, detector: UsStockDataDetector):
         self.detectors.append(detector)
 
-    def prepare_detector_data(self):
+    def prepare_detector_data(self, start_timestamp: datetime = None):
+        """
+        - start_timestamp: 載入資料的起始日（預設為 start_timestamp，增量檢測時為新日期的起始日往前推 lookback 個交易日）
+        """
+        start_timestamp = start_timestamp or self.start_timestamp
         required_items = {item for detector in self.detectors for item in detector.required_item_list}
         logging.info(f"Preparing data for items: {list(required_items)}")
 
         self.data_set = self.get_item_df_dict(
             item_list=list(required_items),
             method="by_date",
-            start_timestamp = self.start_timestamp,
+            start_timestamp = start_timestamp,
             end_timestamp = self.end_timestamp,
             if_align=True,
         )
 
         self.universe_tickers = {
-            universe: self.get_universe_tickers(universe, self.start_timestamp, self.end_timestamp)
+            universe: self.get_universe_tickers(universe, start_timestamp, self.end_timestamp)
             for universe in ["univ_spx500", "univ_ray3000"]
         }
+    
+    def _get_incremental_start_timestamp(self, item_list: List[str]) -> datetime:
+        """
+        取得增量檢測的起始日：各 item 上次檢測日的下一日中最早者（任一 item 未曾檢測則為 start_timestamp）。
+        """
+        checkpoint_dict = self._get_dao_instance("error_report").get_validation_checkpoint(item_list)
+        if any(item not in checkpoint_dict for item in item_list):
+            return self.start_timestamp
+        return max(self.start_timestamp, min(checkpoint_dict.values()) + timedelta(days=1))
+    
+    def _get_lookback_start_timestamp(self, start_timestamp: datetime) -> datetime:
+        """往前推 lookback 個交易日（交易日曆未涵蓋時以日曆日計算）"""
+        lookback_days = max([self.lookback_days] + [detector.lookback_days for detector in self.detectors])
+        if lookback_days <= 0:
+            return start_timestamp
+        try:
+            return self.shift_trade_date(start_timestamp, -lookback_days)
+        except ValueError:
+            return start_timestamp - timedelta(days=lookback_days)
+    
+    def _get_first_error_timestamp_dict(self, execution_logs: List[dict]) -> Dict[str, datetime]:
+        """
+        取得各 item 尚未解決的最早錯誤日（{item: datetime}）：檢測器回報錯誤的最早日期，
+        檢測器執行失敗時則為檢測起始日（該檢測器涉及的 item 皆視為未檢測）。
+        """
+        first_error_timestamp_dict = {}
+        for log in execution_logs:
+            detector = log["detector"]
+            if log.get("execution_error"):
+                first_error_timestamp = self.validation_start_timestamp
+            else:
+                error_records = (log.get("execution_log") or {}).get("error_records", [])
+                if not error_records:
+                    continue
+                first_error_timestamp = pd.Timestamp(min(record["data_timestamp"] for record in error_records)).to_pydatetime()
+            for item in detector.required_item_list:
+                first_error_timestamp_dict[item] = min(first_error_timestamp_dict.get(item, first_error_timestamp), first_error_timestamp)
+        return first_error_timestamp_dict
+    
+    def _save_validation_checkpoint(self, item_list: List[str], missing_data: Dict[str, List[datetime]], execution_logs: List[dict] = None):
+        """
+        記錄各 item 已檢測至的日期：有缺漏或檢測錯誤者僅推進至第一個缺漏日 / 錯誤日的前一日（待資料補齊或修正後再檢測）。
+        """
+        first_error_timestamp_dict = self._get_first_error_timestamp_dict(execution_logs or [])
+        item_timestamp_dict = {}
+        for item in item_list:
+            latest_data_date = self.get_latest_data_date(item)
+            if latest_data_date is None:
+                continue
+            last_validated_timestamp = min(latest_data_date, self.end_timestamp)
+            if missing_data.get(item):
+                last_validated_timestamp = min(last_validated_timestamp, min(missing_data[item]) - timedelta(days=1))
+            if item in first_error_timestamp_dict:
+                last_validated_timestamp = min(last_validated_timestamp, first_error_timestamp_dict[item] - timedelta(days=1))
+            if last_validated_timestamp >= self.validation_start_timestamp:
+                item_timestamp_dict[item] = last_validated_timestamp
+        
+        self._get_dao_instance("error_report").save_validation_checkpoint(item_timestamp_dict)
 
-    def execute_detectors(self) -> List[dict]:
+    def execute_detectors(self, max_workers: int = None) -> List[dict]:
+        """
+        以執行緒池併發執行各檢測器（共用同一份唯讀的 data_set，不需複製資料；運算以 NumPy 為主，執行時會釋放 GIL）。
+        
+        Args:
+            max_workers (int, optional): 併發執行的檢測器數，設為 1 則逐一執行。預設為 DETECTOR_MAX_WORKERS。
+        """
         def _create_execution_log(detector: UsStockDataDetector, execution_log: dict = None, execution_error: str = None):
             return {
                 "detector": detector,
                 "execution_log": execution_log,
                 "execution_error": execution_error,
             }
-
-        execution_logs = []
-        for detector in self.detectors:
+        
+        def _execute_detector(detector: UsStockDataDetector) -> dict:
             try:
-                detect_log = detector.run(self.data_set)
+                detect_log = detector.run(self.data_set, start_timestamp=self.validation_start_timestamp)
                 if detect_log.get("error_count", 0) > 0:
                     logging.error(f"Detector '{detector.name}' found {detect_log['error_count']} errors.")
                     logging.error(detect_log.get("error_records", []))
-                execution_logs.append(_create_execution_log(detector, execution_log=detect_log))
+                return _create_execution_log(detector, execution_log=detect_log)
             except Exception as e:
                 logging.error(f"Error executing detector '{detector.name}': {str(e)}")
-                execution_logs.append(_create_execution_log(detector, execution_error=str(e)))
-        return execution_logs
+                return _create_execution_log(detector, execution_error=str(e))
+        
+        max_workers = max_workers or self.DETECTOR_MAX_WORKERS
+        if max_workers > 1 and len(self.detectors) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(self.detectors))) as executor:
+                # executor.map 保持與 self.detectors 相同的順序
+                return list(executor.map(_execute_detector, self.detectors))
+        
+        return [_execute_detector(detector) for detector in self.detectors]
 
     def calculate_error_rate(self, error_tickers: List[str], universe_tickers: List[str]) -> float:
         if not universe_tickers:
@@ -218,31 +330,34 @@ class UsStockDataDetectorManager(UsStockDataManager):
         # 確認uni_spx500是否有超過門檻值的錯誤率
         return bool(df[df["univ_name"].isin(["univ_spx500"])]["is_above_threshold"].any())
 
-    def check_data_missing(self, item_list) -> bool:
+    def get_missing_data(self, item_list: List[str], start_timestamp: datetime, end_timestamp: datetime) -> Dict[str, List[datetime]]:
+        """取得各 item 於範圍內缺少資料的交易日（由資料覆蓋矩陣取得）"""
+        # 資料通常由其他程序寫入，重新載入檢查範圍內的日期索引
+        coverage_df = self.get_data_coverage(item_list, start_timestamp, end_timestamp, refresh=True)
+        return {
+            item: list(coverage_df.columns[~coverage_df.loc[item].to_numpy()].to_pydatetime())
+            for item in item_list
+        }
+
+    def check_data_missing(self, item_list, missing_data: Dict[str, List[datetime]] = None) -> bool:
         """
         Check if there is any missing data for the given item list.
         
         Args:
             item_list (List[str]): List of items to check.
+            missing_data (Dict[str, List[datetime]], optional): Precomputed result of get_missing_data (computed if not given).
 
         Returns:
             bool: True if there is missing data, False otherwise.
         """
-        def _get_missing_data(item_list: List[str], start_timestamp: datetime, end_timestamp: datetime) -> Dict[str, List[datetime]]:
-            trade_dates = self.get_trade_date_list(start_timestamp, end_timestamp)
-            return {
-                item: list(set(trade_dates) - set(self._get_dao_instance(item).distinct(
-                    "data_timestamp", {"data_timestamp": {"$in": trade_dates}}
-                )))
-                for item in item_list
-            }
-            
-        missing_data = _get_missing_data(item_list, self.start_timestamp, self.end_timestamp)
+        if missing_data is None:
+            missing_data = self.get_missing_data(item_list, self.validation_start_timestamp, self.end_timestamp)
         # Ensure the return value is a Python bool
         has_missing_data = bool(any(missing_data[item] for item in item_list))
         
         if has_missing_data:
-            for item, dates in missing_data.items():
+            for item in item_list:
+                dates = missing_data[item]
                 if dates:
                     logging.info(f"Missing data for {item}: {dates}")
         return has_missing_data
@@ -253,15 +368,28 @@ class UsStockDataDetectorManager(UsStockDataManager):
         self.register_detector(ExtremeHighReturnDetector())
         self.register_detector(ExtremeLowReturnDetector())
         
-        self.prepare_detector_data()
+        item_list = ["open", "high", "low", "close", "volume", "c2c_ret", "o2o_ret"]
+        required_item_list = sorted({item for detector in self.detectors for item in detector.required_item_list} | set(item_list))
+        
+        # 增量檢測：僅檢測上次檢測之後的新日期，並額外載入 lookback 個交易日供跨日檢測
+        load_start_timestamp = self.start_timestamp
+        if self.incremental:
+            self.validation_start_timestamp = self._get_incremental_start_timestamp(required_item_list)
+            if self.validation_start_timestamp > self.end_timestamp:
+                logging.info(f"Data has already been validated up to {self.end_timestamp}, skipping.")
+                return
+            load_start_timestamp = self._get_lookback_start_timestamp(self.validation_start_timestamp)
+            logging.info(f"Incremental validation: {self.validation_start_timestamp} ~ {self.end_timestamp} (loading data from {load_start_timestamp}).")
+        
+        self.prepare_detector_data(start_timestamp=load_start_timestamp)
         
         execution_logs = self.execute_detectors()
         detection_result = self.generate_detector_report(execution_logs)
         detection_analysis = self.analyze_detector_report(detection_result)
         
-        # 檢測資料缺漏
-        item_list = ["open", "high", "low", "close", "volume", "c2c_ret", "o2o_ret"]
-        is_data_missing = self.check_data_missing(item_list)
+        # 檢測資料缺漏（覆蓋矩陣僅計算一次，同時供增量檢測的 checkpoint 使用）
+        missing_data = self.get_missing_data(required_item_list, self.validation_start_timestamp, self.end_timestamp)
+        is_data_missing = self.check_data_missing(item_list, missing_data=missing_data)
         
         # 檢測資料錯誤
         is_data_error = self.check_data_error(detection_analysis)
@@ -276,7 +404,7 @@ class UsStockDataDetectorManager(UsStockDataManager):
             "data_timestamp": self.end_timestamp,
             "created_timestamp": datetime.now(timezone.utc),
             "time_range": {
-                "start_timestamp": self.start_timestamp,
+                "start_timestamp": self.validation_start_timestamp,
                 "end_timestamp": self.end_timestamp,
             },
             "data_status": data_status,
@@ -285,3 +413,6 @@ class UsStockDataDetectorManager(UsStockDataManager):
         }
         
         self._get_dao_instance("error_report").insert_one(detect_result)
+        
+        if self.incremental:
+            self._save_validation_checkpoint(required_item_list, missing_data, execution_logs)
@@ -1,5 +1,10 @@
 from .actions_data import *
+from .adjust_factor import *
 from .alternative_data import *
+from .client_registry import *
 from .priceVolume_data import *
 from .reference_data import *
-from .universe_data import *
\ No newline at end of file
+from .tickerMajor_data import *
+from .trading_calendar import *
+from .universe_data import *
+from .universe_membership import *
\ No newline at end of file
@@ -1,7 +1,15 @@
-from .base_data import BaseDAO
+from datetime import datetime, timedelta, timezone
+from typing import List
+import logging
+from pymongo import ReplaceOne
 import pandas as pd
 
+from .base_data import BaseDAO
+from .adjust_factor import AdjustFactorStore, cal_cumulative_factor_doc
+
 class ActionsBaseDAO(BaseDAO):
+    is_numeric_values = True
+    
     def __init__(self, collection_name: str, uri: str):
         db_name = "Actions"
         super().__init__(db_name, collection_name, uri)
@@ -16,4 +24,107 @@ class PayDividendDAO(ActionsBaseDAO):
     
 class StockSplitDAO(ActionsBaseDAO):
     def __init__(self, uri):
-        super().__init__("stock_split", uri)
\ No newline at end of file
+        super().__init__("stock_split", uri)
+class AdjustFactorDAO(BaseDAO):
+    """
+    稀疏的股票分割調整因子：每個 ticker 一份文件，僅保存分割日與累積因子（forward / backward），
+    寫入新的分割資料時僅重算受影響的 ticker。
+    """
+    # 調整因子的快取時效（供其他程序寫入新資料後自動重新載入）
+    STORE_MAX_AGE = timedelta(hours=12)
+    
+    def __init__(self, uri):
+        super().__init__("Actions", "adjust_factor", uri)
+        self._store = None
+        self._store_loaded_timestamp = None
+        self._is_bootstrapped = False
+        # 記錄調整因子是否已由完整的 stock_split 資料建立（rebuild），避免以「已有部分 ticker」誤判為完整
+        self.build_status_collection = self.db["adjust_factor_status"]
+    
+    def is_bootstrapped(self, refresh: bool = False) -> bool:
+        """
+        調整因子是否已由完整的 stock_split 資料建立（與 get_store 一同載入並快取）
+        """
+        self.get_store(refresh=refresh)
+        return self._is_bootstrapped
+    
+    def get_store(self, refresh: bool = False) -> AdjustFactorStore:
+        """
+        取得記憶體內的調整因子（首次呼叫時載入全部文件，之後重複使用）。
+        """
+        is_expired = (self._store_loaded_timestamp is None
+                      or datetime.now() - self._store_loaded_timestamp > self.STORE_MAX_AGE)
+        
+        if refresh or self._store is None or is_expired:
+            factor_docs = self.find(query={}, projection={"_id": 0, "ticker": 1, "split_dates": 1, "cumulative_factors": 1})
+            self._store = AdjustFactorStore(factor_docs)
+            self._is_bootstrapped = self.build_status_collection.find_one({"collection": self.collection.name}) is not None
+            self._store_loaded_timestamp = datetime.now()
+        
+        return self._store
+    
+    def apply_split_documents(self, split_documents: List[dict]) -> int:
+        """
+        併入新的分割資料（stock_split 格式：{"data_timestamp": 分割日, "values": {ticker: split_to / split_from}}），
+        僅重算出現在其中的 ticker（同一分割日的既有因子將被覆寫）。
+        尚未以 rebuild 建立完整的調整因子時不寫入（避免產生僅含部分 ticker 的調整因子）。
+        
+        Returns:
+            int: 更新的 ticker 數
+        """
+        if not self.is_bootstrapped(refresh=True):
+            logging.warning("[SAVE][adjust_factor][調整因子尚未建立，略過增量更新（請執行 update_stock_adjust_factor）]")
+            return 0
+        
+        new_split_dict = {}
+        for document in split_documents:
+            for ticker, factor in document.get("values", {}).items():
+                new_split_dict.setdefault(ticker, {})[document["data_timestamp"]] = factor
+        if not new_split_dict:
+            return 0
+        
+        existing_doc_dict = {
+            doc["ticker"]: doc
+            for doc in self.find(query={"ticker": {"$in": list(new_split_dict.keys())}},
+                                 projection={"_id": 0, "ticker": 1, "split_dates": 1, "split_factors": 1})
+        }
+        
+        factor_docs = []
+        for ticker, split_factor_dict in new_split_dict.items():
+            existing_doc = existing_doc_dict.get(ticker, {})
+            merged_split_factor_dict = dict(zip(existing_doc.get("split_dates", []), existing_doc.get("split_factors", [])))
+            merged_split_factor_dict.update(split_factor_dict)
+            factor_docs.append(cal_cumulative_factor_doc(ticker, merged_split_factor_dict))
+        
+        return self._write_factor_docs(factor_docs)
+    
+    def rebuild(self, split_documents: List[dict]) -> int:
+        """
+        以完整的分割資料重建全部調整因子（初次建立，或歷史分割資料被修正後）。
+        """
+        split_dict = {}
+        for document in split_documents:
+            for ticker, factor in document.get("values", {}).items():
+                split_dict.setdefault(ticker, {})[document["data_timestamp"]] = factor
+        
+        factor_docs = [cal_cumulative_factor_doc(ticker, split_factor_dict) for ticker, split_factor_dict in split_dict.items()]
+        self.collection.delete_many({"ticker": {"$nin": list(split_dict.keys())}})
+        updated_count = self._write_factor_docs(factor_docs)
+        self.build_status_collection.update_one(
+            {"collection": self.collection.name},
+            {"$set": {"rebuilt_timestamp": datetime.now(timezone.utc), "ticker_count": updated_count}},
+            upsert=True,
+        )
+        return updated_count
+    
+    def _write_factor_docs(self, factor_docs: List[dict]) -> int:
+        self.ensure_index([("ticker", 1)], unique=True)
+        updated_timestamp = datetime.now(timezone.utc)
+        operations = [ReplaceOne({"ticker": doc["ticker"]}, {**doc, "updated_timestamp": updated_timestamp}, upsert=True)
+                      for doc in factor_docs]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+        self._store = None  # 寫入後重新載入調整因子
+        
+        logging.info(f"[SAVE][adjust_factor][更新 {len(factor_docs)} 個 ticker 的調整因子]")
+        return len(factor_docs)
@@ -0,0 +1,108 @@
+from datetime import datetime
+from typing import Dict, List, Union
+import numpy as np
+import pandas as pd
+
+from alphahelix_database_tools.utils.datetime_utils import datetime2datetime64
+
+def cal_cumulative_factor_doc(ticker: str, split_factor_dict: Dict[datetime, float]) -> dict:
+    """
+    依單一 ticker 的分割資料 {分割日: split_to / split_from}，計算稀疏的累積調整因子文件：
+    - cumulative_factors: 各分割日（含）之前所有分割因子的累乘（forward 調整，首次分割前為 1）
+    - backward_factors: cumulative_factors / 全部分割因子的累乘（backward 調整，最後一次分割後為 1）
+    """
+    split_date_list = sorted(date for date, factor in split_factor_dict.items() if factor and not np.isnan(factor))
+    split_factors = np.array([split_factor_dict[date] for date in split_date_list], dtype=np.float64)
+    cumulative_factors = np.cumprod(split_factors)
+    total_factor = cumulative_factors[-1] if len(cumulative_factors) else 1.0
+    return {
+        "ticker": ticker,
+        "split_dates": split_date_list,
+        "split_factors": split_factors.tolist(),
+        "cumulative_factors": cumulative_factors.tolist(),
+        "backward_factors": (cumulative_factors / total_factor).tolist(),
+    }
+
+class AdjustFactorStore:
+    """
+    記憶體內的稀疏調整因子：僅保存各 ticker 分割日的累積因子（依 ticker 排序串接，以 indptr 切分）。
+    任一日期的累積因子為該日（含）之前最近一次分割的累積值，以 np.searchsorted 取得，不需展開為（交易日 x ticker）矩陣。
+    """
+    def __init__(self, factor_docs: List[dict]):
+        """
+        - factor_docs: AdjustFactorDAO 的文件（含 ticker / split_dates / cumulative_factors）
+        """
+        factor_docs = sorted((doc for doc in factor_docs if doc.get("split_dates")), key=lambda doc: doc["ticker"])
+        self.tickers = pd.Index([doc["ticker"] for doc in factor_docs])
+        row_lengths = [len(doc["split_dates"]) for doc in factor_docs]
+        self.indptr = np.concatenate([[0], np.cumsum(row_lengths)]).astype(np.int64)
+        self.split_dates = np.array([date for doc in factor_docs for date in doc["split_dates"]], dtype="datetime64[ns]")
+        self.cumulative_factors = np.array([factor for doc in factor_docs for factor in doc["cumulative_factors"]], dtype=np.float64)
+
+    def _get_cumulative_factors(self, ticker_position: int, date_values: np.ndarray, side: str = "right") -> np.ndarray:
+        """取得單一 ticker 於各日期的累積因子（side="left" 時不含當日的分割）"""
+        start, end = self.indptr[ticker_position], self.indptr[ticker_position + 1]
+        rows = np.searchsorted(self.split_dates[start:end], date_values, side=side) - 1
+        return np.where(rows >= 0, self.cumulative_factors[start:end][np.maximum(rows, 0)], 1.0)
+
+    def get_split_tickers(self, start_timestamp: Union[datetime, str], end_timestamp: Union[datetime, str]) -> List[str]:
+        """取得 [start_timestamp, end_timestamp] 範圍內有分割的 ticker"""
+        is_in_range = ((self.split_dates >= datetime2datetime64(start_timestamp))
+                       & (self.split_dates <= datetime2datetime64(end_timestamp)))
+        ticker_positions = np.searchsorted(self.indptr, np.nonzero(is_in_range)[0], side="right") - 1
+        return self.tickers[np.unique(ticker_positions)].tolist()
+
+    def get_adjust_factor_df(self, date_list: List[datetime], tickers: List[str] = None, method: str = "backward") -> pd.DataFrame:
+        """
+        取得 date_list x tickers 的調整因子（未指定 tickers 時為範圍內有分割的 ticker）：
+        - forward: 以 date_list 首日之前的股價為基準（首日前為 1，其後依分割累乘）
+        - backward: 以 date_list 末日的股價為基準（末日為 1，使最新股價等於未調整股價）
+        """
+        if method not in {"forward", "backward"}:
+            raise ValueError("method 必須是 'forward' 或 'backward'")
+
+        date_index = pd.DatetimeIndex(date_list)
+        if tickers is None:
+            tickers = self.get_split_tickers(date_index.min(), date_index.max()) if len(date_index) else []
+
+        factor_values = np.ones((len(date_index), len(tickers)), dtype=np.float64)
+        if len(date_index):
+            date_values = date_index.as_unit("ns").values
+            ticker_positions = self.tickers.get_indexer(tickers)
+            for column, ticker_position in enumerate(ticker_positions):
+                if ticker_position < 0:
+                    continue
+                cumulative_factors = self._get_cumulative_factors(ticker_position, date_values)
+                if method == "forward":
+                    base_factor = self._get_cumulative_factors(ticker_position, date_values.min(keepdims=True), side="left")[0]
+                else:
+                    base_factor = cumulative_factors[np.argmax(date_values)]
+                factor_values[:, column] = cumulative_factors / base_factor
+
+        return pd.DataFrame(factor_values, index=date_index, columns=pd.Index(tickers))
+
+def cal_dividend_adjust_factor_values(close_values: np.ndarray, forward_factor_values: np.ndarray, dividend_values: np.ndarray) -> np.ndarray:
+    """
+    計算 (T x N) 股利還原因子（backward，末日為 1）：每個除息日 t 之前的股價皆乘上 1 - 股利 / 前一有效收盤價，
+    股利與前一日收盤價皆以 forward 分割因子換算至同一基準。
+    - close_values: 未調整收盤價
+    - forward_factor_values: forward 分割調整因子
+    - dividend_values: 除息日的現金股利（無股利為 0）
+    """
+    row_count, ticker_count = close_values.shape
+    dividend_factor_values = np.ones((row_count, ticker_count), dtype=np.float64)
+    if row_count < 2:
+        return dividend_factor_values
+
+    adjusted_close_values = close_values * forward_factor_values
+    is_valid = ~np.isnan(adjusted_close_values)
+    last_valid_rows = np.maximum.accumulate(np.where(is_valid, np.arange(row_count)[:, np.newaxis], 0), axis=0)
+    last_adjusted_close_values = adjusted_close_values[last_valid_rows, np.arange(ticker_count)]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio_values = 1 - dividend_values[1:] * forward_factor_values[1:] / last_adjusted_close_values[:-1]
+    ratio_values[~np.isfinite(ratio_values) | (ratio_values <= 0)] = 1
+
+    # 第 u 列的因子為 u 之後（不含）所有除息日比例的累乘
+    dividend_factor_values[:-1] = np.cumprod(ratio_values[::-1], axis=0)[::-1]
+    return dividend_factor_values
@@ -1,17 +1,264 @@
-from pymongo import MongoClient
+from pymongo import ReplaceOne, UpdateOne
 from pymongo.errors import DuplicateKeyError, BulkWriteError
 
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 import logging
+import threading
 import pandas as pd
 import numpy as np
 from typing import List, Tuple, Union
 
+from .client_registry import MongoClientRegistry
+from .local_cache import LocalItemCache
+from .value_codec import PACKED_ENCODING, PACKED_FIELD_LIST, TickerDictionaryStore, encode_values
+from .value_decoder import NumericMatrixDecoder
+
+# 已確認存在的索引（每個程序僅需向資料庫確認一次）：{(client id, collection 全名, 索引名稱)}
+_ENSURED_INDEX_SET = set()
+_ENSURED_INDEX_LOCK = threading.Lock()
+
 class BaseDAO:
+    # values 是否為 {ticker: 數值} 格式（可轉為數值矩陣，並支援本地快取），由子類別覆寫
+    is_numeric_values = False
+    # 壓縮格式寫入時，當日 ticker 數少於字典的比例超過此值，即建立新字典（避免字典隨下市標的無限膨脹）
+    TICKER_DICT_MAX_SLACK = 0.1
+    # 指定 ticker 查詢的篩選策略門檻（ticker 數）：
+    # 不超過 PROJECTION_MAX_TICKERS 時使用 find projection（每個 ticker 一個 "values.{ticker}" 鍵），
+    # 不超過 AGGREGATION_MAX_TICKERS 時使用 aggregation $project（$filter + $objectToArray，僅傳遞一個 ticker 陣列），
+    # 超過則取出完整文件後於本地切片（籃子已接近全市場時，伺服器端篩選無法省下多少傳輸量）
+    # 預設值為估計值（尚未正式量測）：projection 的解析成本隨鍵數線性上升，數百檔以上改以單一 ticker 陣列 $filter；
+    # 籃子約達全市場（約 1 萬檔）的 15% 後，伺服器端篩選省下的傳輸量預期不足以抵銷 $objectToArray 的成本。
+    # 實際轉折點依文件 ticker 數與網路頻寬而異，可由 set_ticker_filter_thresholds（或 UsStockDataManager 參數）依實測調整。
+    PROJECTION_MAX_TICKERS = 200
+    AGGREGATION_MAX_TICKERS = 1500
+    # 數值矩陣解碼時，未指定 limit 的初始配置列數（筆數超過時自動擴充）
+    NUMERIC_DECODE_INITIAL_ROWS = 256
+    # data_timestamp 日期索引的快取時效（供其他程序寫入新資料後自動重新載入）
+    DATE_INDEX_MAX_AGE = timedelta(hours=12)
+    
     def __init__(self, db_name, collection_name, uri):
-        self.client = MongoClient(uri)
+        # 向註冊表取得共用的 client 並增加引用計數（同一 URI 的所有 DAO 共用連線池），close() 時釋放
+        self.uri = uri
+        self.client = MongoClientRegistry.acquire(uri)
         self.db = self.client[db_name]
         self.collection = self.db[collection_name]
+        self.local_cache = None
+        # 版本化寫入時，保存所有版本的 collection（{collection}_versions），未啟用時為 None
+        self.version_collection = None
+        
+        # 寫入格式："dict"（{ticker: value}）或 "packed"（ticker 字典 + 二進位數值陣列），讀取時自動判斷
+        self.value_encoding = "dict"
+        self.packed_value_dtype = "float64"
+        self._ticker_dictionary_store = None
+        self._current_ticker_dict = None
+        
+        # 全部文件 data_timestamp 的快取（排序後的 datetime64 陣列），寫入時同步加入新日期
+        self._date_index_values = None
+        self._date_index_loaded_timestamp = None
+        self._date_index_lock = threading.Lock()
+    
+    def close(self):
+        """
+        釋放共用 client 的引用（所有使用者皆釋放後，註冊表才關閉 client），之後此 DAO 不可再使用。
+        """
+        if self.client is not None:
+            MongoClientRegistry.release(self.uri)
+            self.client = None
+    
+    @property
+    def ticker_dictionary_store(self) -> TickerDictionaryStore:
+        if self._ticker_dictionary_store is None:
+            self._ticker_dictionary_store = TickerDictionaryStore(self.db)
+        return self._ticker_dictionary_store
+    
+    def enable_packed_encoding(self, dtype: str = "float64"):
+        """
+        啟用壓縮格式寫入（僅限 values 為數值的資料項目）：
+        values 改存為 ticker 字典 id + 二進位數值陣列（values_blob）+ 有效值 bitmap（null_bitmap），
+        以去除每份文件中上萬個 ticker 字串鍵，讀取時以 np.frombuffer 直接解碼。
+        """
+        if not self.is_numeric_values:
+            raise ValueError(f"{self.collection.name} 不支援壓縮格式")
+        if dtype not in {"float64", "float32"}:
+            raise ValueError("dtype 必須是 'float64' 或 'float32'")
+        self.value_encoding = "packed"
+        self.packed_value_dtype = dtype
+    
+    def _select_ticker_dictionary(self, tickers: set) -> Tuple[str, Tuple[str, ...]]:
+        """
+        選擇當日文件使用的 ticker 字典：沿用目前字典（當日 ticker 皆在字典內，且字典未過度膨脹），否則建立新字典。
+        """
+        if self._current_ticker_dict is None:
+            latest_doc = self.collection.find_one({"encoding": PACKED_ENCODING}, sort=[("data_timestamp", -1)], projection={"ticker_dict_id": 1})
+            if latest_doc:
+                dict_id = latest_doc["ticker_dict_id"]
+                dictionary = self.ticker_dictionary_store.get(dict_id)
+                self._current_ticker_dict = (dict_id, dictionary, set(dictionary))
+        
+        if self._current_ticker_dict is not None:
+            dict_id, dictionary, dictionary_set = self._current_ticker_dict
+            if tickers <= dictionary_set and len(dictionary) <= len(tickers) * (1 + self.TICKER_DICT_MAX_SLACK):
+                return dict_id, dictionary
+        
+        dictionary = tuple(sorted(tickers))
+        dict_id = self.ticker_dictionary_store.save(dictionary)
+        self._current_ticker_dict = (dict_id, dictionary, set(dictionary))
+        return dict_id, dictionary
+    
+    def _encode_document(self, document: dict) -> dict:
+        """將 {ticker: value} 格式的文件轉換為壓縮格式（若未啟用則原樣返回）"""
+        if self.value_encoding != "packed" or not isinstance(document.get("values"), dict):
+            return document
+        
+        values = document["values"]
+        dict_id, dictionary = self._select_ticker_dictionary(set(values))
+        values_blob, null_bitmap = encode_values(values, dictionary, dtype=self.packed_value_dtype)
+        
+        encoded_document = {key: value for key, value in document.items() if key != "values"}
+        encoded_document.update({
+            "encoding": PACKED_ENCODING,
+            "ticker_dict_id": dict_id,
+            "value_dtype": self.packed_value_dtype,
+            "values_blob": values_blob,
+            "null_bitmap": null_bitmap,
+        })
+        return encoded_document
+    
+    def get_date_index(self, refresh: bool = False, start_timestamp: datetime = None, end_timestamp: datetime = None) -> pd.DatetimeIndex:
+        """
+        取得全部文件的 data_timestamp（排序後），以 distinct 於 data_timestamp 索引上取得（不讀取 values 等大型欄位）。
+        結果於程序內快取，本 DAO 寫入時同步加入新日期，並於 DATE_INDEX_MAX_AGE 後重新載入。
+        - refresh: 重新載入（指定 start_timestamp / end_timestamp 時僅重新載入該範圍並併入快取，可取得其他程序新寫入的日期）
+        """
+        with self._date_index_lock:
+            is_expired = (self._date_index_loaded_timestamp is None
+                          or datetime.now() - self._date_index_loaded_timestamp > self.DATE_INDEX_MAX_AGE)
+            is_range_refresh = refresh and (start_timestamp is not None or end_timestamp is not None)
+            if self._date_index_values is None or is_expired or (refresh and not is_range_refresh):
+                self._date_index_values = self._load_date_index_values({})
+                self._date_index_loaded_timestamp = datetime.now()
+            elif is_range_refresh:
+                range_query = {"data_timestamp": {**({"$gte": start_timestamp} if start_timestamp is not None else {}),
+                                                  **({"$lte": end_timestamp} if end_timestamp is not None else {})}}
+                is_in_range = np.ones(len(self._date_index_values), dtype=bool)
+                if start_timestamp is not None:
+                    is_in_range &= self._date_index_values >= np.datetime64(start_timestamp, "ns")
+                if end_timestamp is not None:
+                    is_in_range &= self._date_index_values <= np.datetime64(end_timestamp, "ns")
+                # 以範圍內的最新結果取代快取中的同範圍日期（含其他程序新增或刪除的日期）
+                self._date_index_values = np.union1d(self._date_index_values[~is_in_range], self._load_date_index_values(range_query))
+            return pd.DatetimeIndex(self._date_index_values, name="data_timestamp")
+    
+    def _load_date_index_values(self, query: dict) -> np.ndarray:
+        timestamp_list = [timestamp for timestamp in self.distinct("data_timestamp", query) if isinstance(timestamp, datetime)]
+        return np.unique(np.array(timestamp_list, dtype="datetime64[ns]"))
+    
+    def _add_to_date_index(self, documents: List[dict]):
+        """將寫入文件的 data_timestamp 加入日期索引快取（尚未載入時略過）"""
+        with self._date_index_lock:
+            if self._date_index_values is None:
+                return
+            timestamp_list = [document["data_timestamp"] for document in documents if isinstance(document.get("data_timestamp"), datetime)]
+            if timestamp_list:
+                self._date_index_values = np.union1d(self._date_index_values, np.array(timestamp_list, dtype="datetime64[ns]"))
+    
+    def _invalidate_date_index(self):
+        """清除日期索引快取（刪除文件後，下次取用時重新載入）"""
+        with self._date_index_lock:
+            self._date_index_values = None
+            self._date_index_loaded_timestamp = None
+    
+    def set_ticker_filter_thresholds(self, projection_max_tickers: int = None, aggregation_max_tickers: int = None):
+        """
+        設定指定 ticker 查詢的篩選策略門檻（覆寫類別預設的 PROJECTION_MAX_TICKERS / AGGREGATION_MAX_TICKERS，僅影響此 DAO）。
+        將 aggregation_max_tickers 設為不超過 projection_max_tickers 即停用 aggregation 策略（僅使用 projection / 本地切片）。
+        """
+        if projection_max_tickers is not None:
+            self.PROJECTION_MAX_TICKERS = projection_max_tickers
+        if aggregation_max_tickers is not None:
+            self.AGGREGATION_MAX_TICKERS = aggregation_max_tickers
+    
+    def enable_local_cache(self, cache_dir: str):
+        """
+        啟用本地欄式快取（僅限 values 為數值的資料項目）。
+        啟用後，查詢將優先讀取本地快取，並僅向資料庫補抓快取中尚未存在的日期，以及快取建立後被覆寫的日期。
+        """
+        if not self.is_numeric_values:
+            raise ValueError(f"{self.collection.name} 不支援本地快取")
+        self.local_cache = LocalItemCache(cache_dir, self.db.name, self.collection.name)
+        # 以 created_timestamp 索引判斷快取建立後被覆寫的日期
+        self.ensure_index([("created_timestamp", -1)], unique=False)
+    
+    def enable_versioning(self):
+        """
+        啟用版本化寫入：每次寫入的文件皆另存於 {collection}_versions（舊版本不會被覆寫），主 collection 僅保存最新版本。
+        版本 collection 以 (data_timestamp, created_timestamp) 建立索引（於首次寫入時建立），as-of 查詢僅需一次索引範圍掃描。
+        本方法不寫入資料庫（唯讀帳號亦可啟用以進行 as-of 查詢）；啟用前已寫入的歷史資料須另行執行 bootstrap_version_history。
+        """
+        self.version_collection = self.db[f"{self.collection.name}_versions"]
+    
+    def _ensure_version_index(self):
+        self.ensure_index([("data_timestamp", -1), ("created_timestamp", -1)], unique=True, collection=self.version_collection)
+    
+    def bootstrap_version_history(self, batch_size: int = 500):
+        """
+        將主 collection 現有的文件複製至版本 collection（已存在的版本則略過），
+        供啟用版本化之前寫入的歷史資料也能進行 as-of 查詢（維護作業，須具寫入權限，僅需於首次啟用時執行一次）。
+        未記錄 created_timestamp 的舊文件，以 _id（ObjectId）的建立時間作為版本時間。
+        """
+        if self.version_collection is None:
+            raise ValueError(f"{self.collection.name} 未啟用版本化寫入")
+        self._ensure_version_index()
+        
+        operations, copied_count = [], 0
+        for document in self.collection.find({}, batch_size=batch_size):
+            object_id = document.pop("_id")
+            if document.get("created_timestamp") is None:
+                if not hasattr(object_id, "generation_time"):
+                    continue
+                document["created_timestamp"] = object_id.generation_time.replace(tzinfo=None)
+            operations.append(UpdateOne(
+                {"data_timestamp": document["data_timestamp"], "created_timestamp": document["created_timestamp"]},
+                {"$setOnInsert": document},
+                upsert=True,
+            ))
+            if len(operations) >= batch_size:
+                copied_count += self.version_collection.bulk_write(operations, ordered=False).upserted_count
+                operations = []
+        if operations:
+            copied_count += self.version_collection.bulk_write(operations, ordered=False).upserted_count
+        
+        logging.info(f"[SAVE][{self.collection.name}][版本歷史][已複製 {copied_count} 筆文件]")
+    
+    def _insert_versioned(self, documents: List[dict], unique_key: str) -> list:
+        """
+        版本化寫入：全部文件寫入版本 collection，主 collection 依 unique_key 覆寫為最新版本（而非略過重複）。
+        """
+        if unique_key is None:
+            raise ValueError("版本化寫入須指定 unique_key")
+        
+        current_timestamp = datetime.now(timezone.utc)
+        # 移除 _id（主 collection 的覆寫不可帶入不同的 _id）
+        documents = [self._encode_document({"created_timestamp": current_timestamp, **{field: value for field, value in document.items() if field != "_id"}})
+                     for document in documents]
+        if not documents:
+            return []
+        
+        self._ensure_version_index()
+        try:
+            # 以複本寫入（pymongo 會於傳入的文件加上 _id）
+            inserted_ids = self.version_collection.insert_many([dict(document) for document in documents], ordered=False).inserted_ids
+        except BulkWriteError as e:
+            # 相同 (data_timestamp, created_timestamp) 的版本已存在（重複寫入同一版本），略過；其他錯誤則拋出
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+            logging.warning(f"[SAVE][{self.collection.name}][{len(e.details['writeErrors'])} 筆版本已存在，略過]")
+            inserted_ids = []
+        self.collection.bulk_write(
+            [ReplaceOne({unique_key: document[unique_key]}, document, upsert=True) for document in documents],
+            ordered=False,
+        )
+        return inserted_ids
 
     def insert_one(self, document, unique_key=None):
         """
@@ -22,30 +269,44 @@ class BaseDAO:
         if unique_key:
             # 為 unique_key 創建降序索引，若已存在則跳過
             self.ensure_index([(unique_key, -1)], unique=True)
+        
+        if self.version_collection is not None:
+            inserted_ids = self._insert_versioned([document], unique_key)
+            self._add_to_date_index([document])
+            return inserted_ids[0] if inserted_ids else None
 
         try:
             # 插入文檔
-            return self.collection.insert_one(document).inserted_id
+            inserted_id = self.collection.insert_one(self._encode_document(document)).inserted_id
+            self._add_to_date_index([document])
+            return inserted_id
         except DuplicateKeyError:
             logging.warning(f"Duplicate value for key '{unique_key}' with value '{document.get(unique_key)}'. Skipping insert.")
             return None
 
-    def ensure_index(self, keys, unique=True):
+    def ensure_index(self, keys, unique=True, collection=None):
         """
-        確保索引存在，根據名稱檢查是否需要創建索引。
+        確保索引存在，根據名稱檢查是否需要創建索引（結果於程序內快取，之後的寫入不再查詢 index_information）。
         - keys: 索引鍵值對列表，例如 [("field_name", 1)]
         - unique: 是否唯一索引（默認為 False）
+        - collection: 建立索引的 collection（默認為本 DAO 的 collection）
         """
+        collection = self.collection if collection is None else collection
         index_name = "_".join([f"{k}_{v}" for k, v in keys])  # 基於字段生成索引名稱
-        index_info = self.collection.index_information()
-
-        if index_name in index_info:
-            # logging.info(f"Index {index_name} already exists. Skipping creation.")
+        index_key = (id(collection.database.client), collection.full_name, index_name)
+        if index_key in _ENSURED_INDEX_SET:
             return
-
-        # 創建索引
-        self.collection.create_index(keys, unique=unique, name=index_name)
-        logging.info(f"Index {index_name} created successfully.")
+        
+        with _ENSURED_INDEX_LOCK:
+            if index_key in _ENSURED_INDEX_SET:
+                return
+            
+            index_info = collection.index_information()
+            if index_name not in index_info:
+                # 創建索引
+                collection.create_index(keys, unique=unique, name=index_name)
+                logging.info(f"Index {index_name} created successfully.")
+            _ENSURED_INDEX_SET.add(index_key)
 
     
     def insert_many(self, documents, unique_key=None):
@@ -57,24 +318,75 @@ class BaseDAO:
         if unique_key:
             # 為 unique_key 創建降序索引，若已存在則跳過
             self.ensure_index([(unique_key, -1)], unique=True)
+        
+        if self.version_collection is not None:
+            documents = [document for document in documents if unique_key and unique_key in document]
+            inserted_ids = self._insert_versioned(documents, unique_key)
+            self._add_to_date_index(documents)
+            return inserted_ids
 
         to_insert = []
         for document in documents:
             if unique_key and unique_key in document:
-                to_insert.append(document)
+                to_insert.append(self._encode_document(document))
 
         try:
             # 插入文檔
             if to_insert:
-                return self.collection.insert_many(to_insert, ordered=False).inserted_ids
+                inserted_ids = self.collection.insert_many(to_insert, ordered=False).inserted_ids
+                self._add_to_date_index(to_insert)
+                return inserted_ids
             else:
                 logging.warning("No documents were inserted due to duplicate keys.")
                 return []
         
         except BulkWriteError as e:
             logging.warning(f"Bulk write error: {e.details}. Skipping duplicates.")
+            # 未重複的文件仍已寫入（ordered=False），重複者的日期本已存在
+            self._add_to_date_index(to_insert)
             return []
 
+    def bulk_upsert(self, documents: List[dict], key: str = "data_timestamp", batch_size: int = 500) -> int:
+        """
+        以 bulk_write（UpdateOne, upsert=True）分批寫入，已存在相同 key 的文件將被覆寫（而非略過）。
+        - documents: 待寫入的文檔列表（須含 key 欄位）
+        - key: 判斷文件是否相同的欄位（將自動建立唯一索引）
+        - batch_size: 每批寫入的文件數
+        
+        Returns:
+            int: 新增與更新的文件數
+        """
+        self.ensure_index([(key, -1)], unique=True)
+        # 未指定 created_timestamp 時以寫入時間標記（本地快取依此判斷被覆寫的日期）
+        current_timestamp = datetime.now(timezone.utc)
+        documents = [document if document.get("created_timestamp") is not None else {**document, "created_timestamp": current_timestamp}
+                     for document in documents if key in document]
+        
+        written_count = 0
+        for i in range(0, len(documents), batch_size):
+            batch_documents = documents[i:i+batch_size]
+            # 版本化項目：每批寫入版本 collection，主 collection 覆寫為最新版本
+            if self.version_collection is not None:
+                self._insert_versioned(batch_documents, key)
+                written_count += len(batch_documents)
+                continue
+            
+            operations = [self._build_upsert_operation(self._encode_document(document), key) for document in batch_documents]
+            result = self.collection.bulk_write(operations, ordered=False)
+            written_count += result.upserted_count + result.modified_count
+        
+        self._add_to_date_index(documents)
+        logging.info(f"[SAVE][{self.collection.name}][bulk upsert {written_count} 筆文件]")
+        return written_count
+    
+    @staticmethod
+    def _build_upsert_operation(document: dict, key: str) -> UpdateOne:
+        document = {field: value for field, value in document.items() if field != "_id"}
+        # 兩種寫入格式的欄位互斥，覆寫時一併移除另一種格式的欄位
+        stale_field_list = ["values"] if "values_blob" in document else PACKED_FIELD_LIST
+        update = {"$set": document, "$unset": {field: "" for field in stale_field_list}}
+        return UpdateOne({key: document[key]}, update, upsert=True)
+    
     def find(self, query, projection=None, sort=None, limit=None):
         """
         查詢資料。
@@ -110,11 +422,16 @@ class BaseDAO:
     
     def update_one(self, query, update, upsert=False):
         """更新單筆資料"""
-        return self.collection.update_one(query, {"$set": update}, upsert=upsert)
+        result = self.collection.update_one(query, {"$set": update}, upsert=upsert)
+        if result.upserted_id is not None:
+            self._add_to_date_index([{**query, **update}])
+        return result
 
     def delete_one(self, query):
         """刪除單筆資料"""
-        return self.collection.delete_one(query)
+        result = self.collection.delete_one(query)
+        self._invalidate_date_index()  # 刪除後重新載入日期索引
+        return result
     
     def count_documents(self, query):
         """計算符合條件的資料數量"""
@@ -124,7 +441,7 @@ class BaseDAO:
         """供子類別覆寫，將原始資料轉換為指定格式"""
         return df
     
-    def get_item_df_by_datetime(self, start_timestamp:datetime, end_timestamp:datetime, query:dict={}, projection:dict={}) -> pd.DataFrame:
+    def get_item_df_by_datetime(self, start_timestamp:datetime, end_timestamp:datetime, query:dict={}, projection:dict={}, tickers:List[str]=None, as_of:datetime=None) -> pd.DataFrame:
         """
         Retrieves a DataFrame of items from the database based on the specified datetime range.
         Args:
@@ -132,6 +449,8 @@ class BaseDAO:
             end_timestamp (datetime): The end timestamp of the range.
             query (dict, optional): Additional query parameters to filter the items. Defaults to {}.
             projection (dict, optional): Additional projection parameters to specify the fields to include in the result. Defaults to {}.
+            tickers (List[str], optional): 指定 ticker，依 ticker 數自動選擇篩選策略. Defaults to None.
+            as_of (datetime, optional): 取出該時點（UTC）當下資料庫中的版本（須啟用版本化寫入）. Defaults to None.
         Returns:
             pd.DataFrame: A DataFrame containing the retrieved items.
         """
@@ -152,11 +471,14 @@ class BaseDAO:
         if projection:
             default_projection.update({"data_timestamp": 1})
             default_projection.update(projection)
+            # 壓縮格式文件不存在 values.{ticker} 欄位，須一併取出壓縮欄位，於本地篩選 ticker
+            if self.is_numeric_values:
+                default_projection.update({field: 1 for field in PACKED_FIELD_LIST})
         
         # 執行查詢並返回結果
-        return self._execute_query(default_query, default_projection, sort={"data_timestamp": -1}, limit=None)        
+        return self._execute_query(default_query, default_projection, sort={"data_timestamp": -1}, limit=None, tickers=tickers, as_of=as_of)        
     
-    def get_item_df_by_num(self, num:int=1, end_timestamp=None, query:dict=None, projection:dict=None) -> pd.DataFrame:
+    def get_item_df_by_num(self, num:int=1, end_timestamp=None, query:dict=None, projection:dict=None, tickers:List[str]=None, as_of:datetime=None) -> pd.DataFrame:
         query = query or {}
         projection = projection or {}
         
@@ -171,11 +493,221 @@ class BaseDAO:
         if projection:
             default_projection.update({"data_timestamp": 1})
             default_projection.update(projection)
+            # 壓縮格式文件不存在 values.{ticker} 欄位，須一併取出壓縮欄位，於本地篩選 ticker
+            if self.is_numeric_values:
+                default_projection.update({field: 1 for field in PACKED_FIELD_LIST})
         
         # 執行查詢並返回結果
-        return self._execute_query(query, default_projection, sort={"data_timestamp": -1}, limit=num)
+        return self._execute_query(query, default_projection, sort={"data_timestamp": -1}, limit=num, tickers=tickers, as_of=as_of)
     
-    def _execute_query(self, query: dict, projection: dict, sort: List[Tuple[str, int]] = None, limit: int = None) -> pd.DataFrame:
+    def _execute_query(self, query: dict, projection: dict, sort: List[Tuple[str, int]] = None, limit: int = None, tickers: List[str] = None, as_of: datetime = None) -> pd.DataFrame:
+        """
+        Executes a query, reading from the local cache first when it is enabled and the query is supported.
+        """
+        # as-of 查詢讀取版本 collection（本地快取僅保存最新版本）
+        if as_of is not None:
+            return self._fetch_as_of_item_df(query, projection, sort, limit, tickers, as_of)
+        
+        if self.local_cache is not None:
+            item_df = self._execute_cached_query(query, projection, limit, tickers)
+            if item_df is not None:
+                return item_df
+        
+        return self._fetch_item_df(query, projection, sort, limit, tickers)
+    
+    def _execute_cached_query(self, query: dict, projection: dict, limit: int = None, tickers: List[str] = None) -> Union[pd.DataFrame, None]:
+        """
+        自本地快取讀取資料，讀取前先向資料庫補抓快取中缺少的日期（較快取更早的區段，以及快取最新日之後的新資料）。
+        僅支援以 data_timestamp 篩選的查詢，若無法由快取完整回應則返回 None（改走資料庫查詢）。
+        """
+        # 僅支援 data_timestamp 範圍查詢（其他條件無法於本地快取中判斷）
+        if set(query.keys()) - {"data_timestamp"}:
+            return None
+        time_range = query.get("data_timestamp", {})
+        if set(time_range.keys()) - {"$gte", "$lte"}:
+            return None
+        
+        start_timestamp = time_range.get("$gte")
+        end_timestamp = time_range.get("$lte")
+        
+        # 未直接指定 ticker 時，自 projection 中取出（"values.AAPL" -> "AAPL"）
+        tickers = tickers or self._get_projection_tickers(projection)
+        
+        # 快取僅保存連續的已同步範圍 [synced_start, synced_end]（synced_end 為 None 時持續同步至最新日），依查詢範圍向兩端延伸
+        synced_start = self.local_cache.get_synced_start()
+        synced_end = self.local_cache.get_synced_end()
+        is_tracking_latest = synced_start is not None and synced_end is None
+        
+        # by_num 查詢無起始日，若快取尚未建立則直接查詢資料庫
+        if start_timestamp is None and synced_start is None:
+            return None
+        
+        # 於補抓前取得資料庫最新的 created_timestamp（補抓期間的新寫入留待下次查詢處理，不致遺漏）
+        latest_created_timestamp = self._get_latest_created_timestamp()
+        
+        if synced_start is None:
+            # 快取尚未建立：僅抓取查詢範圍（未指定結束日時抓取至最新日）
+            self.local_cache.write(self._fetch_item_df({"data_timestamp": time_range}, {"_id": 0}, sort={"data_timestamp": 1}))
+            self.local_cache.set_synced_start(start_timestamp)
+            self.local_cache.set_synced_end(end_timestamp)
+            synced_start, synced_end = start_timestamp, end_timestamp
+        else:
+            # 補抓較快取更早的區段
+            if start_timestamp is not None and start_timestamp < synced_start:
+                backfill_query = {"data_timestamp": {"$gte": start_timestamp, "$lt": synced_start}}
+                self.local_cache.write(self._fetch_item_df(backfill_query, {"_id": 0}, sort={"data_timestamp": 1}))
+                self.local_cache.set_synced_start(start_timestamp)
+            
+            # 補抓較快取更晚的區段（查詢未指定結束日時延伸至最新日，之後改以增量方式同步）
+            if synced_end is not None and (end_timestamp is None or end_timestamp > synced_end):
+                forward_range = {"$gt": synced_end}
+                if end_timestamp is not None:
+                    forward_range["$lte"] = end_timestamp
+                self.local_cache.write(self._fetch_item_df({"data_timestamp": forward_range}, {"_id": 0}, sort={"data_timestamp": 1}))
+                self.local_cache.set_synced_end(end_timestamp)
+        
+        # 持續同步至最新日的快取：補抓快取最新日之後的新資料（增量更新）
+        max_timestamp = self.local_cache.get_max_timestamp()
+        if is_tracking_latest and max_timestamp is not None:
+            self.local_cache.write(self._fetch_item_df({"data_timestamp": {"$gt": max_timestamp}}, {"_id": 0}, sort={"data_timestamp": 1}))
+        
+        # 重新載入上次同步後被覆寫（或新寫入）且位於原同步範圍內的歷史日期（如重新執行回補、split 或報酬率重算）
+        if max_timestamp is not None:
+            self._reload_rewritten_dates(synced_start, synced_end or max_timestamp)
+        
+        if latest_created_timestamp is not None:
+            self.local_cache.set_synced_created_timestamp(latest_created_timestamp)
+        
+        item_df = self.local_cache.read(start_timestamp, end_timestamp, tickers=tickers, num=limit)
+        
+        # by_num 查詢時若快取筆數不足，無法確認更早的資料是否存在，改走資料庫查詢
+        if limit is not None and len(item_df) < limit:
+            return None
+        
+        if item_df.empty:
+            logging.info(f"[INFO] 無數據匹配查詢條件: {query}")
+        return item_df
+    
+    def _get_latest_created_timestamp(self) -> Union[datetime, None]:
+        """取得資料庫中最新的 created_timestamp（以 created_timestamp 索引取得），若無則返回 None"""
+        latest_doc = self.collection.find_one({"created_timestamp": {"$exists": True}}, projection={"_id": 0, "created_timestamp": 1},
+                                              sort=[("created_timestamp", -1)])
+        return latest_doc["created_timestamp"] if latest_doc else None
+    
+    def _reload_rewritten_dates(self, synced_start: datetime, synced_end: datetime):
+        """
+        將上次同步後被覆寫（created_timestamp 較新）且已在快取範圍內的日期，自資料庫重新載入並覆蓋快取。
+        快取尚未記錄同步時間（舊版快取）時，僅記錄本次的同步時間。
+        """
+        synced_created_timestamp = self.local_cache.get_synced_created_timestamp()
+        if synced_created_timestamp is None:
+            return
+        
+        time_range = {"$lte": synced_end}
+        if synced_start is not None:
+            time_range["$gte"] = synced_start
+        rewritten_date_list = self.distinct("data_timestamp", {"created_timestamp": {"$gt": synced_created_timestamp}, "data_timestamp": time_range})
+        if rewritten_date_list:
+            logging.info(f"[CACHE][{self.collection.name}][重新載入 {len(rewritten_date_list)} 個被覆寫的日期]")
+            self.local_cache.write(self._fetch_item_df({"data_timestamp": {"$in": rewritten_date_list}}, {"_id": 0}, sort={"data_timestamp": 1}))
+    
+    @staticmethod
+    def _get_projection_tickers(projection: dict) -> Union[List[str], None]:
+        """自 projection 中取出指定的 ticker（"values.AAPL" -> "AAPL"），若未指定則返回 None"""
+        return [key.split(".", 1)[1] for key in (projection or {}) if key.startswith("values.")] or None
+    
+    def _plan_ticker_filter_strategy(self, tickers: List[str]) -> str:
+        """
+        依 ticker 數選擇篩選策略（門檻見 PROJECTION_MAX_TICKERS / AGGREGATION_MAX_TICKERS）。
+        
+        Returns:
+            str: "projection"、"aggregation" 或 "local_slice"
+        """
+        if len(tickers) <= self.PROJECTION_MAX_TICKERS:
+            strategy = "projection"
+        elif len(tickers) <= self.AGGREGATION_MAX_TICKERS:
+            strategy = "aggregation"
+        else:
+            strategy = "local_slice"
+        
+        logging.info(f"[QUERY][{self.collection.name}][ticker_filter={strategy}][ticker 數={len(tickers)}]")
+        return strategy
+    
+    def _build_ticker_filter_pipeline(self, query: dict, sort: List[Tuple[str, int]], limit: int, tickers: List[str]) -> List[dict]:
+        """
+        以 aggregation $project 於伺服器端篩選 values 中的 ticker（ticker 列表僅出現一次，不需逐一展開為 projection 鍵）。
+        """
+        pipeline = [{"$match": query}]
+        if sort:
+            pipeline.append({"$sort": dict(sort)})
+        if limit is not None:
+            pipeline.append({"$limit": limit})
+        pipeline.append({"$project": self._build_ticker_filter_project_stage(tickers)})
+        return pipeline
+    
+    def _build_ticker_filter_project_stage(self, tickers: List[str]) -> dict:
+        project_stage = {
+            "_id": 0,
+            "data_timestamp": 1,
+            "values": {"$arrayToObject": {"$filter": {
+                "input": {"$objectToArray": {"$ifNull": ["$values", {}]}},
+                "as": "kv",
+                "cond": {"$in": ["$$kv.k", list(tickers)]},
+            }}},
+        }
+        # 壓縮格式文件不存在 values 欄位，須一併取出壓縮欄位，於本地篩選 ticker
+        if self.is_numeric_values:
+            project_stage.update({field: 1 for field in PACKED_FIELD_LIST})
+        return project_stage
+    
+    def _build_ticker_projection(self, projection: dict, tickers: List[str]) -> dict:
+        """以 find projection 篩選 ticker（每個 ticker 一個 "values.{ticker}" 鍵）"""
+        projection = {**projection, "data_timestamp": 1, **{f"values.{ticker}": 1 for ticker in tickers}}
+        # 壓縮格式文件不存在 values.{ticker} 欄位，須一併取出壓縮欄位，於本地篩選 ticker
+        if self.is_numeric_values:
+            projection.update({field: 1 for field in PACKED_FIELD_LIST})
+        return projection
+    
+    def _fetch_as_of_item_df(self, query: dict, projection: dict, sort: List[Tuple[str, int]], limit: int, tickers: List[str], as_of: datetime) -> pd.DataFrame:
+        """
+        自版本 collection 取出 as_of 當下的資料：各 data_timestamp 取 created_timestamp <= as_of 的最新版本。
+        先以 (data_timestamp, created_timestamp) 索引範圍掃描，僅保留日期、版本時間與 _id 選出各日期的版本，
+        再以 _id 取出選中的文件（完整的 values 不經過 $sort / $group）。
+        """
+        if self.version_collection is None:
+            raise ValueError(f"{self.collection.name} 未啟用版本化寫入，無法進行 as-of 查詢")
+        
+        sort = sort or [("data_timestamp", -1)]
+        selection_pipeline = [
+            {"$match": {**query, "created_timestamp": {"$lte": as_of}}},
+            {"$sort": {"data_timestamp": -1, "created_timestamp": -1}},
+            {"$project": {"data_timestamp": 1, "created_timestamp": 1}},
+            {"$group": {"_id": "$data_timestamp", "version_id": {"$first": "$_id"}}},
+            {"$sort": {"_id": dict(sort).get("data_timestamp", -1)}},
+        ]
+        if limit is not None:
+            selection_pipeline.append({"$limit": limit})
+        version_id_list = [document["version_id"] for document in self.version_collection.aggregate(selection_pipeline)]
+        
+        strategy = self._plan_ticker_filter_strategy(tickers) if tickers else None
+        if strategy == "projection":
+            project_stage = self._build_ticker_projection(projection, tickers)
+        elif strategy == "aggregation":
+            project_stage = self._build_ticker_filter_project_stage(tickers)
+        else:
+            project_stage = projection
+        
+        pipeline = [
+            {"$match": {"_id": {"$in": version_id_list}}},
+            {"$sort": dict(sort)},
+        ]
+        if project_stage:
+            pipeline.append({"$project": project_stage})
+        
+        cursor = self.version_collection.aggregate(pipeline, batchSize=500)
+        return self._cursor_to_item_df(query, cursor, limit, tickers or self._get_projection_tickers(projection))
+    
+    def _fetch_item_df(self, query: dict, projection: dict, sort: List[Tuple[str, int]] = None, limit: int = None, tickers: List[str] = None) -> pd.DataFrame:
         """
         Executes a MongoDB query and transforms the results into a DataFrame.
 
@@ -184,25 +716,51 @@ class BaseDAO:
             projection (dict): MongoDB projection fields.
             sort (list, optional): Sorting order for the query. Defaults to None.
             limit (int, optional): Maximum number of documents to retrieve. Defaults to None.
+            tickers (List[str], optional): 指定 ticker，依 ticker 數選擇 projection、aggregation 或本地切片. Defaults to None.
 
         Returns:
             pd.DataFrame: Transformed DataFrame.
         """
-        # 構建查詢參數，僅在 limit 有效時傳遞
-        find_params = {
-            "filter": query,
-            "projection": projection,
-            "batch_size": 500
-        }
+        strategy = self._plan_ticker_filter_strategy(tickers) if tickers else None
+        if strategy == "projection":
+            projection = self._build_ticker_projection(projection, tickers)
+        
+        if strategy == "aggregation":
+            pipeline = self._build_ticker_filter_pipeline(query, sort, limit, tickers)
+            cursor = self.collection.aggregate(pipeline, batchSize=500)
+        else:
+            # 構建查詢參數，僅在 limit 有效時傳遞
+            find_params = {
+                "filter": query,
+                "projection": projection,
+                "batch_size": 500
+            }
+            
+            if sort:
+                find_params["sort"] = sort
+            if limit is not None:
+                find_params["limit"] = limit
+            cursor = self.collection.find(**find_params)
+        
+        return self._cursor_to_item_df(query, cursor, limit, tickers or self._get_projection_tickers(projection))
+    
+    def _cursor_to_item_df(self, query: dict, cursor, limit: int = None, tickers: List[str] = None) -> pd.DataFrame:
+        """將查詢結果（find 或 aggregate cursor）轉換為 DataFrame"""
+        # 數值類資料：逐筆串流解碼至預先配置的矩陣（不建立中介 list / DataFrame）
+        if self.is_numeric_values:
+            item_df = self._decode_numeric_cursor(cursor, limit, tickers)
+            if item_df.empty:
+                logging.info(f"[INFO] 無數據匹配查詢條件: {query}")
+            return item_df
         
-        if sort:
-            find_params["sort"] = sort
-        if limit is not None:
-            find_params["limit"] = limit
-
         # 執行查詢
-        query_result_list = list(self.collection.find(**find_params))
-
+        item_df = self._documents_to_item_df(list(cursor), tickers)
+        if item_df.empty:
+            logging.info(f"[INFO] 無數據匹配查詢條件: {query}")
+        return item_df
+    
+    def _documents_to_item_df(self, query_result_list: List[dict], tickers: List[str] = None) -> pd.DataFrame:
+        """將查詢結果文件（values 為 dict 格式）以 DataFrame 轉換（values 可含非數值）"""
         if query_result_list:
             # 將查詢結果轉換為 DataFrame
             raw_df = pd.DataFrame(query_result_list).set_index("data_timestamp")
@@ -214,10 +772,41 @@ class BaseDAO:
             # 避免資料可能存在空值（可能原始資料存在錯誤）
             if np.nan in item_df.columns:
                 item_df = item_df.drop(np.nan, axis=1)
+            
+            # 取出完整文件時，於本地切片指定的 ticker
+            if tickers:
+                item_df = item_df[item_df.columns.intersection(tickers)]
 
             # 排序並返回
             return item_df.sort_index(axis=0).sort_index(axis=1)
 
         # 若無資料，返回空 DataFrame
-        logging.info(f"[INFO] 無數據匹配查詢條件: {query}")
         return pd.DataFrame()
+    
+    def _decode_numeric_cursor(self, cursor, limit: int = None, tickers: List[str] = None) -> pd.DataFrame:
+        """
+        將查詢結果逐筆寫入 float64 矩陣，並依 ticker 索引定位欄位（指定 tickers 時欄位固定，其餘 ticker 於本地略過）。
+        矩陣以 limit（未指定時為 NUMERIC_DECODE_INITIAL_ROWS）預先配置，筆數超過時由解碼器自動擴充（不需另行計算筆數）。
+        文件含非數值的 values（無法轉為 float64）時，該筆及之後的 dict 格式文件改以 DataFrame 路徑轉換（保留原始值）。
+        """
+        decoder = NumericMatrixDecoder(limit or self.NUMERIC_DECODE_INITIAL_ROWS, tickers=tickers, ticker_dictionary_store=self.ticker_dictionary_store)
+        fallback_document_list = []
+        for document in cursor:
+            if fallback_document_list and "values_blob" not in document:
+                fallback_document_list.append(document)
+                continue
+            try:
+                decoder.add_document(document)
+            except (ValueError, TypeError) as e:
+                logging.warning(f"[QUERY][{self.collection.name}][{document.get('data_timestamp')}][values 含非數值，改以 DataFrame 轉換: {e}]")
+                fallback_document_list.append(document)
+        
+        item_df_list = [decoder.to_frame()] if decoder.timestamps else []
+        if fallback_document_list:
+            item_df_list.append(self._documents_to_item_df(fallback_document_list, tickers))
+        if not item_df_list:
+            return pd.DataFrame()
+        if len(item_df_list) == 1:
+            return item_df_list[0]
+        return pd.concat(item_df_list).sort_index(axis=0).sort_index(axis=1)
+
@@ -0,0 +1,69 @@
+from pymongo import MongoClient
+
+import logging
+import threading
+from typing import Dict
+
+class MongoClientRegistry:
+    """
+    行程內共用的 MongoClient 註冊表（以 URI 為鍵）。
+    MongoClient 本身即為執行緒安全的連線池，同一 URI 的所有 DAO 應共用同一個 client，
+    避免每個 collection 各自建立連線池、監控執行緒與 SRV/TLS 握手。
+    """
+    _clients: Dict[str, MongoClient] = {}
+    _ref_counts: Dict[str, int] = {}
+    _lock = threading.Lock()
+
+    # 未指定時的預設連線池上限（pymongo 預設亦為 100）
+    DEFAULT_MAX_POOL_SIZE = 100
+
+    @classmethod
+    def get_client(cls, uri: str, max_pool_size: int = None) -> MongoClient:
+        """
+        取得（或建立）指定 URI 的共用 client，不增加引用計數。
+        - uri: MongoDB 連線字串
+        - max_pool_size: 連線池上限，僅在首次建立 client 時生效
+        """
+        with cls._lock:
+            client = cls._clients.get(uri)
+            if client is None:
+                pool_size = max_pool_size or cls.DEFAULT_MAX_POOL_SIZE
+                client = MongoClient(uri, maxPoolSize=pool_size)
+                cls._clients[uri] = client
+                cls._ref_counts.setdefault(uri, 0)
+                logging.info(f"[MongoClientRegistry] 建立共用連線池（maxPoolSize={pool_size}）")
+
+            elif max_pool_size and client.options.pool_options.max_pool_size != max_pool_size:
+                logging.warning(f"[MongoClientRegistry] client 已存在，忽略新的 maxPoolSize={max_pool_size}")
+
+            return client
+
+    @classmethod
+    def acquire(cls, uri: str, max_pool_size: int = None) -> MongoClient:
+        """取得共用 client 並增加引用計數，須與 release 成對呼叫"""
+        client = cls.get_client(uri, max_pool_size)
+        with cls._lock:
+            cls._ref_counts[uri] = cls._ref_counts.get(uri, 0) + 1
+        return client
+
+    @classmethod
+    def release(cls, uri: str) -> None:
+        """減少引用計數，歸零時關閉並移除該 client"""
+        with cls._lock:
+            if uri not in cls._clients:
+                return
+
+            cls._ref_counts[uri] = max(cls._ref_counts.get(uri, 0) - 1, 0)
+            if cls._ref_counts[uri] == 0:
+                cls._clients.pop(uri).close()
+                cls._ref_counts.pop(uri, None)
+                logging.info("[MongoClientRegistry] 共用連線池已關閉")
+
+    @classmethod
+    def close_all(cls) -> None:
+        """強制關閉所有共用 client（例如 worker 結束前）"""
+        with cls._lock:
+            for client in cls._clients.values():
+                client.close()
+            cls._clients.clear()
+            cls._ref_counts.clear()
@@ -0,0 +1,161 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import List
+
+import pandas as pd
+
+from alphahelix_database_tools.utils.folder_ops import make_folder
+
+class LocalItemCache:
+    """
+    單一資料項目（collection）的本地欄式快取。
+    以 date-major 寬表（data_timestamp x ticker）存放，依年份切分為 Parquet 檔（{year}.parquet），
+    並以 _meta.json 記錄已完整同步的日期範圍與最新的 created_timestamp，供 BaseDAO 判斷僅需向資料庫補抓哪些日期（含被覆寫的歷史日期）。
+    """
+    META_FILE_NAME = "_meta.json"
+
+    def __init__(self, cache_dir: str, db_name: str, collection_name: str):
+        try:
+            import pyarrow.parquet  # noqa: F401（Parquet 讀寫依賴 pyarrow）
+        except ImportError as e:
+            raise ImportError("本地快取需安裝 pyarrow（pip install pyarrow）") from e
+
+        self.folder_path = os.path.join(cache_dir, db_name, collection_name)
+        self._lock = threading.RLock()
+        make_folder(self.folder_path)
+
+    def _get_year_file_path(self, year: int) -> str:
+        return os.path.join(self.folder_path, f"{year}.parquet")
+
+    def _get_year_list(self) -> List[int]:
+        return sorted(int(file_name.split(".")[0]) for file_name in os.listdir(self.folder_path)
+                      if file_name.endswith(".parquet"))
+
+    def _load_meta(self) -> dict:
+        meta_file_path = os.path.join(self.folder_path, self.META_FILE_NAME)
+        if not os.path.exists(meta_file_path):
+            return {}
+        with open(meta_file_path, "r") as f:
+            return json.load(f)
+
+    def _save_meta(self, meta: dict) -> None:
+        # 先寫入暫存檔再以 os.replace 取代（原子操作），避免程序中斷或並行讀取時讀到不完整的 _meta.json
+        meta_file_path = os.path.join(self.folder_path, self.META_FILE_NAME)
+        temp_file_path = f"{meta_file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(temp_file_path, meta_file_path)
+
+    def get_synced_start(self) -> datetime:
+        """取得已完整同步的起始日（此日之後的資料庫文件皆已存在於快取），若快取為空則返回 None"""
+        synced_start = self._load_meta().get("synced_start")
+        return datetime.fromisoformat(synced_start) if synced_start else None
+
+    def set_synced_start(self, timestamp: datetime) -> None:
+        with self._lock:
+            meta = self._load_meta()
+            meta["synced_start"] = timestamp.isoformat()
+            self._save_meta(meta)
+
+    def get_synced_end(self) -> datetime:
+        """取得已完整同步的結束日，若為 None 則快取持續同步至資料庫最新日（以增量方式補抓新資料）"""
+        synced_end = self._load_meta().get("synced_end")
+        return datetime.fromisoformat(synced_end) if synced_end else None
+
+    def set_synced_end(self, timestamp: datetime = None) -> None:
+        """設定已完整同步的結束日（None 表示同步至資料庫最新日）"""
+        with self._lock:
+            meta = self._load_meta()
+            if timestamp is None:
+                meta.pop("synced_end", None)
+            else:
+                meta["synced_end"] = timestamp.isoformat()
+            self._save_meta(meta)
+
+    def get_synced_created_timestamp(self) -> datetime:
+        """取得上次同步時資料庫中最新的 created_timestamp（之後寫入的文件尚未反映於快取），若未記錄則返回 None"""
+        synced_created_timestamp = self._load_meta().get("synced_created_timestamp")
+        return datetime.fromisoformat(synced_created_timestamp) if synced_created_timestamp else None
+
+    def set_synced_created_timestamp(self, timestamp: datetime) -> None:
+        with self._lock:
+            meta = self._load_meta()
+            meta["synced_created_timestamp"] = timestamp.isoformat()
+            self._save_meta(meta)
+
+    def get_max_timestamp(self) -> datetime:
+        """取得快取中最新的 data_timestamp，若快取為空則返回 None"""
+        year_list = self._get_year_list()
+        if not year_list:
+            return None
+        # 僅讀取 index（不讀取任何 ticker 欄位）
+        index = pd.read_parquet(self._get_year_file_path(year_list[-1]), columns=[]).index
+        return index.max().to_pydatetime() if len(index) else None
+
+    def read(self, start_timestamp: datetime = None, end_timestamp: datetime = None, tickers: List[str] = None, num: int = None) -> pd.DataFrame:
+        """
+        讀取快取資料。
+        Args:
+            start_timestamp (datetime, optional): 開始日期（含）。
+            end_timestamp (datetime, optional): 結束日期（含）。
+            tickers (List[str], optional): 指定欄位，僅讀取存在於快取中的 ticker。
+            num (int, optional): 僅取最近 N 筆（自最新年份往前讀取，讀滿即停止）。
+        Returns:
+            pd.DataFrame: 已排序的 DataFrame，不含整欄皆為空值的 ticker（與資料庫 projection 行為一致）。
+        """
+        import pyarrow.parquet as pq
+
+        year_list = self._get_year_list()
+        if start_timestamp is not None:
+            year_list = [year for year in year_list if year >= start_timestamp.year]
+        if end_timestamp is not None:
+            year_list = [year for year in year_list if year <= end_timestamp.year]
+
+        df_list, row_count = [], 0
+        for year in reversed(year_list):
+            file_path = self._get_year_file_path(year)
+            columns = None
+            if tickers is not None:
+                schema_names = set(pq.read_schema(file_path).names)
+                columns = [ticker for ticker in tickers if ticker in schema_names]
+            
+            year_df = pd.read_parquet(file_path, columns=columns).loc[start_timestamp:end_timestamp]
+            df_list.append(year_df)
+            row_count += len(year_df)
+            if num is not None and row_count >= num:
+                break
+
+        if not df_list:
+            return pd.DataFrame()
+
+        item_df = pd.concat(df_list).sort_index()
+        if num is not None:
+            item_df = item_df.iloc[-num:]
+        return item_df.dropna(axis=1, how="all").sort_index(axis=1)
+
+    def write(self, item_df: pd.DataFrame) -> None:
+        """將資料依年份併入既有的 Parquet 檔（相同日期以新資料覆蓋）"""
+        if item_df.empty:
+            return
+
+        item_df = item_df.copy()
+        item_df.index = pd.DatetimeIndex(item_df.index, name="data_timestamp")
+        item_df.columns = item_df.columns.astype(str)
+
+        with self._lock:
+            for year, year_df in item_df.groupby(item_df.index.year):
+                file_path = self._get_year_file_path(year)
+                if os.path.exists(file_path):
+                    year_df = pd.concat([pd.read_parquet(file_path), year_df])
+                    year_df = year_df[~year_df.index.duplicated(keep="last")]
+                year_df.sort_index(axis=0).sort_index(axis=1).to_parquet(file_path)
+                logging.info(f"[CACHE][{self.folder_path}][{year}][已寫入 {len(year_df)} 筆資料]")
+
+    def clear(self) -> None:
+        """清除此資料項目的所有快取檔案"""
+        with self._lock:
+            for file_name in os.listdir(self.folder_path):
+                os.remove(os.path.join(self.folder_path, file_name))
@@ -1,6 +1,8 @@
 from .base_data import BaseDAO
 
 class PriceVolumeBaseDAO(BaseDAO):
+    is_numeric_values = True
+    
     def __init__(self, collection_name: str, uri: str):
         db_name = "PriceVolume"
         super().__init__(db_name, collection_name, uri)
@@ -4,6 +4,7 @@ import pandas as pd
 
 from alphahelix_database_tools.utils.datetime_utils import str2datetime, datetime2str
 from .base_data import BaseDAO
+from .trading_calendar import TradingCalendar
 
 class GicsMappingDAO(BaseDAO):
     """
@@ -39,6 +40,10 @@ class GicsCodeDAO(BaseDAO):
             4: "gics_sub_industry",
         }
     
+    def close(self):
+        self.mapping_dao.close()
+        super().close()
+    
     def fetch_gics_names_by_level(self, level):
         return sorted(list(self.mapping_dao.fetch_name_to_code(level).keys()))
     
@@ -104,10 +109,51 @@ class GicsCodeDAO(BaseDAO):
         return sorted(ticker_list)
         
 class MarketStatusDAO(BaseDAO):
+    # 交易日曆的快取時效（供其他程序寫入新資料後自動重新載入）
+    CALENDAR_MAX_AGE = timedelta(hours=12)
+    
     def __init__(self, uri):
         db_name = "Reference"
         collection_name = "market_status"
         super().__init__(db_name, collection_name, uri)
+        self._trade_calendar = None
+        self._trade_calendar_loaded_timestamp = None
+    
+    def get_trade_calendar(self, refresh: bool = False) -> TradingCalendar:
+        """
+        取得記憶體內的交易日曆（首次呼叫時載入全部 market_status 資料，之後重複使用）。
+        """
+        is_expired = (self._trade_calendar_loaded_timestamp is None
+                      or datetime.now() - self._trade_calendar_loaded_timestamp > self.CALENDAR_MAX_AGE)
+        
+        if refresh or self._trade_calendar is None or is_expired:
+            # market_status 每日一筆（1: 交易日, 0: 六日休市, -1: 非六日休市），全部載入僅約數千筆小型文件
+            query_result_list = self.find(query={}, projection={"_id": 0, "data_timestamp": 1, "values": 1}, sort=[("data_timestamp", 1)])
+            if not query_result_list:
+                raise ValueError("market_status 無任何資料，無法建立交易日曆")
+            
+            trade_date_list = [item["data_timestamp"] for item in query_result_list if item["values"] == 1]
+            self._trade_calendar = TradingCalendar(trade_date_list,
+                                                   start_timestamp=query_result_list[0]["data_timestamp"],
+                                                   end_timestamp=query_result_list[-1]["data_timestamp"])
+            self._trade_calendar_loaded_timestamp = datetime.now()
+        
+        return self._trade_calendar
+    
+    def insert_one(self, document, unique_key=None):
+        inserted_id = super().insert_one(document, unique_key)
+        self._trade_calendar = None  # 寫入後重新載入交易日曆
+        return inserted_id
+    
+    def insert_many(self, documents, unique_key=None):
+        inserted_ids = super().insert_many(documents, unique_key)
+        self._trade_calendar = None  # 寫入後重新載入交易日曆
+        return inserted_ids
+    
+    def bulk_upsert(self, documents, key="data_timestamp", batch_size=500):
+        written_count = super().bulk_upsert(documents, key, batch_size)
+        self._trade_calendar = None  # 寫入後重新載入交易日曆
+        return written_count
         
     def get_trade_date_list(self, start_timestamp: datetime, end_timestamp: datetime) -> List[datetime]:
         """
@@ -124,11 +170,7 @@ class MarketStatusDAO(BaseDAO):
         if not isinstance(start_timestamp, datetime) or not isinstance(end_timestamp, datetime):
             raise ValueError("start_timestamp 和 end_timestamp 必須是 datetime 類型")
 
-        # 獲取交易狀態數據
-        query_result_list = list(self.find(query={"data_timestamp": {"$gte": start_timestamp, "$lte": end_timestamp}, "values": 1},
-                                           sort=[("data_timestamp", 1)]))
-        
-        return [item["data_timestamp"] for item in query_result_list]
+        return self.get_trade_calendar().get_trade_date_list(start_timestamp, end_timestamp)
     
     # 取得距離指定日期最近的交易日，計算方式可選往前（last）或往後（next），預設為往前（last）
     # cal_self可選擇給定的日期本身若為交易日是否納入計算，預設為True
@@ -136,45 +178,83 @@ class MarketStatusDAO(BaseDAO):
         if isinstance(timestamp, str):
             timestamp = str2datetime(timestamp)
         
-        if direction not in {"last", "next"}:
-            raise ValueError("direction 必須是 'last' 或 'next'")
-        
-        start_timestamp = timestamp - timedelta(days=10)
-        end_timestamp = timestamp + timedelta(days=10)
-        
-        # 取出指定日期前後10日的資料
-        market_status_series = self.get_item_df_by_datetime(start_timestamp, end_timestamp).squeeze()
-        
-        # 若資料為空，直接返回異常
-        if market_status_series.empty:
-            raise ValueError(f"在範圍 {start_timestamp} ~ {end_timestamp} 未找到任何交易日")
-        
-        # 設定初始值和方向
-        current_date = timestamp
-        step = -1 if direction == "last" else 1
+        return self.get_trade_calendar().get_closest_trade_date(timestamp, direction, cal_self)
+
+class BackfillCheckpointDAO(BaseDAO):
+    """
+    回補（backfill）進度的檢查點：每個 (job, item) 一份文件，記錄本次回補範圍的起始日與最後完成的日期。
+    中斷後重新執行時，可自檢查點的下一日接續，不需重新下載已寫入的日期。
+    """
+    def __init__(self, uri):
+        db_name = "Reference"
+        collection_name = "backfill_checkpoint"
+        super().__init__(db_name, collection_name, uri)
 
-        # 檢查當前日期是否應該納入計算
-        if not cal_self or market_status_series.get(current_date, 0) != 1:
-            current_date += timedelta(days=step)
+    def get_checkpoint(self, job: str, item: str) -> Union[dict, None]:
+        """
+        取得檢查點：{"range_start_timestamp": 回補範圍起始日, "last_completed_timestamp": 最後完成的日期}，不存在則返回 None。
+        """
+        return self.find_one({"job": job, "item": item}, projection={"_id": 0, "range_start_timestamp": 1, "last_completed_timestamp": 1})
 
-        # 循環查找最近的交易日
-        while True:
-            if current_date not in market_status_series.index:
-                raise ValueError(f"無法在 {start_timestamp} ~ {end_timestamp} 找到有效的交易日")
+    def save_checkpoint(self, job: str, item_list: List[str], range_start_timestamp: datetime, last_completed_timestamp: datetime):
+        """
+        更新各 item 的檢查點（[range_start_timestamp, last_completed_timestamp] 已全部寫入）。
+        若與既有檢查點的範圍重疊或相連，則合併為同一範圍。
+        """
+        self.ensure_index([("job", 1), ("item", 1)], unique=True)
+        for item in item_list:
+            item_range_start_timestamp, item_last_completed_timestamp = range_start_timestamp, last_completed_timestamp
+            checkpoint = self.get_checkpoint(job, item)
+            if (checkpoint and checkpoint["range_start_timestamp"] <= last_completed_timestamp + timedelta(days=1)
+                and range_start_timestamp <= checkpoint["last_completed_timestamp"] + timedelta(days=1)):
+                item_range_start_timestamp = min(range_start_timestamp, checkpoint["range_start_timestamp"])
+                item_last_completed_timestamp = max(last_completed_timestamp, checkpoint["last_completed_timestamp"])
 
-            if market_status_series[current_date] == 1:
-                return current_date
+            self.update_one({"job": job, "item": item},
+                            {"range_start_timestamp": item_range_start_timestamp,
+                             "last_completed_timestamp": item_last_completed_timestamp,
+                             "updated_timestamp": datetime.now()},
+                            upsert=True)
+
+    def get_resume_timestamp(self, job: str, item_list: List[str], start_timestamp: datetime) -> datetime:
+        """
+        依檢查點計算實際的起始日：若所有 item 的檢查點皆涵蓋 start_timestamp，則自其中最早完成日的下一日接續，否則自 start_timestamp 開始。
+        """
+        resume_timestamp_list = []
+        for item in item_list:
+            checkpoint = self.get_checkpoint(job, item)
+            if (not checkpoint or checkpoint["range_start_timestamp"] > start_timestamp
+                or checkpoint["last_completed_timestamp"] < start_timestamp - timedelta(days=1)):
+                return start_timestamp
+            resume_timestamp_list.append(checkpoint["last_completed_timestamp"] + timedelta(days=1))
+        return min(resume_timestamp_list, default=start_timestamp)
 
-            current_date += timedelta(days=step)
-            
 class ErrorReportDAO(BaseDAO):
     def __init__(self, uri):
         db_name = "Reference"
         collection_name = "error_report"
         super().__init__(db_name, collection_name, uri)
-    
+        # 各資料項目已檢測至的日期（每個 item 一份文件），供增量檢測使用
+        self.checkpoint_collection = self.db["validation_checkpoint"]
+
     def get_latest_error_report(self):
         return self.find_one({}, sort=[("created_timestamp", -1)])
+
+    def get_validation_checkpoint(self, item_list: List[str]) -> dict:
+        """取得各 item 最後檢測的 data_timestamp（{item: datetime}，未曾檢測者不列入）"""
+        return {
+            doc["item"]: doc["last_validated_timestamp"]
+            for doc in self.checkpoint_collection.find({"item": {"$in": item_list}}, {"_id": 0, "item": 1, "last_validated_timestamp": 1})
+        }
+
+    def save_validation_checkpoint(self, item_timestamp_dict: dict):
+        """更新各 item 最後檢測的 data_timestamp（{item: datetime}）"""
+        self.ensure_index([("item", 1)], unique=True, collection=self.checkpoint_collection)
+        updated_timestamp = datetime.now()
+        for item, last_validated_timestamp in item_timestamp_dict.items():
+            self.checkpoint_collection.update_one({"item": item},
+                                                  {"$set": {"last_validated_timestamp": last_validated_timestamp, "updated_timestamp": updated_timestamp}},
+                                                  upsert=True)
     
     # def get_error_reports(self, start_timestamp, end_timestamp):
     #     query_doc_list = list(self.find(query={"created_timestamp": {"$gte": start_timestamp, "$lte": end_timestamp}}))
@@ -0,0 +1,154 @@
+from pymongo import ReplaceOne, UpdateOne
+
+from datetime import datetime, timedelta, timezone
+import logging
+from typing import List, Tuple
+import numpy as np
+import pandas as pd
+
+from .base_data import BaseDAO
+
+class TickerMajorDAO(BaseDAO):
+    """
+    Ticker-major（長窄）版面：每個 ticker 每年一份文件，與 date-major collection 並存。
+    文件格式：{"ticker": "AAPL", "year": 2024, "data_timestamps": [...], "values": [...]}（兩陣列一一對應、日期升冪）
+    適用於少數 ticker 的長期歷史查詢（僅需讀取 ticker 數 x 年數份文件，且可利用 (ticker, year) 索引）。
+    """
+    # 同步狀態的快取時效（查詢規劃時不需每次讀取資料庫；其他程序更新版面後於此時效內生效）
+    SYNC_STATUS_MAX_AGE = timedelta(minutes=5)
+
+    def __init__(self, collection_name: str, uri: str):
+        db_name = "PriceVolumeByTicker"
+        super().__init__(db_name, collection_name, uri)
+        # 記錄此版面已與 date-major collection 同步的日期範圍
+        self.sync_status_collection = self.db["layout_sync_status"]
+        self._sync_status = None
+        self._sync_status_loaded_timestamp = None
+
+    def _get_sync_status(self, refresh: bool = False) -> dict:
+        is_expired = (self._sync_status_loaded_timestamp is None
+                      or datetime.now() - self._sync_status_loaded_timestamp > self.SYNC_STATUS_MAX_AGE)
+        if refresh or self._sync_status is None or is_expired:
+            self._sync_status = self.sync_status_collection.find_one({"item": self.collection.name}) or {}
+            self._sync_status_loaded_timestamp = datetime.now()
+        return self._sync_status
+
+    def get_synced_range(self, refresh: bool = False) -> Tuple[datetime, datetime]:
+        """
+        取得已同步的日期範圍 (start, end)，若尚未建立則返回 (None, None)
+        - refresh: 重新讀取同步狀態（寫入前使用；查詢規劃則使用快取）
+        """
+        status = self._get_sync_status(refresh)
+        if not status:
+            return None, None
+        return status["start_timestamp"], status["end_timestamp"]
+
+    def is_synced(self, refresh: bool = False) -> bool:
+        """版面是否與 date-major collection 一致（同步失敗後為 False，須重建後才可供查詢）"""
+        return self._get_sync_status(refresh).get("is_synced", True)
+
+    def _set_synced_range(self, start_timestamp: datetime, end_timestamp: datetime, is_synced: bool = None):
+        update = {"start_timestamp": start_timestamp, "end_timestamp": end_timestamp, "updated_timestamp": datetime.now(timezone.utc)}
+        if is_synced is not None:
+            update["is_synced"] = is_synced
+        self.sync_status_collection.update_one({"item": self.collection.name}, {"$set": update}, upsert=True)
+        self._sync_status = None  # 寫入後重新讀取同步狀態
+
+    def mark_unsynced(self):
+        """標記版面與 date-major collection 不一致（同步失敗時），查詢將改讀 date-major 版面直到重建完成"""
+        self.sync_status_collection.update_one(
+            {"item": self.collection.name},
+            {"$set": {"is_synced": False, "updated_timestamp": datetime.now(timezone.utc)}},
+        )
+        self._sync_status = None
+
+    @staticmethod
+    def _iter_ticker_year_arrays(item_df: pd.DataFrame):
+        """將 date-major DataFrame 拆解為 (ticker, year, data_timestamps, values)，僅保留非空值"""
+        item_df = item_df.sort_index()
+        year_array = item_df.index.year
+        for year in np.unique(year_array):
+            year_df = item_df[year_array == year]
+            timestamps = year_df.index.to_pydatetime()
+            for ticker in year_df.columns:
+                values = year_df[ticker].to_numpy(dtype=np.float64)
+                valid_mask = ~np.isnan(values)
+                if valid_mask.any():
+                    yield ticker, int(year), list(timestamps[valid_mask]), values[valid_mask].tolist()
+
+    def rebuild_from_item_df(self, item_df: pd.DataFrame):
+        """
+        以完整年份的 date-major 資料重建對應的 ticker-year 文件（覆寫），用於初次建立或回補。
+        - item_df: 須涵蓋所含年份的全部日期，否則該年文件將僅保留傳入的日期
+        """
+        if item_df.empty:
+            return
+
+        self.ensure_index([("ticker", 1), ("year", 1)], unique=True)
+        created_timestamp = datetime.now(timezone.utc)
+
+        operations = [
+            ReplaceOne({"ticker": ticker, "year": year},
+                       {"ticker": ticker, "year": year, "data_timestamps": timestamps, "values": values, "created_timestamp": created_timestamp},
+                       upsert=True)
+            for ticker, year, timestamps, values in self._iter_ticker_year_arrays(item_df)
+        ]
+        self._bulk_write_in_batches(operations)
+
+        start_timestamp, end_timestamp = self.get_synced_range(refresh=True)
+        item_start, item_end = item_df.index.min().to_pydatetime(), item_df.index.max().to_pydatetime()
+        self._set_synced_range(min(start_timestamp or item_start, item_start), max(end_timestamp or item_end, item_end))
+        logging.info(f"[SAVE][{self.collection.name}][ticker-major][重建 {len(operations)} 份 ticker-year 文件]")
+
+    def append_from_item_df(self, item_df: pd.DataFrame):
+        """
+        將晚於已同步範圍的新日期資料，附加至對應的 ticker-year 文件（每日增量更新）。
+        """
+        start_timestamp, end_timestamp = self.get_synced_range(refresh=True)
+        if end_timestamp is None:
+            raise ValueError(f"{self.collection.name} 的 ticker-major 版面尚未建立，請先執行 rebuild_from_item_df")
+
+        item_df = item_df[item_df.index > end_timestamp]
+        if item_df.empty:
+            return
+
+        operations = [
+            UpdateOne({"ticker": ticker, "year": year},
+                      {"$push": {"data_timestamps": {"$each": timestamps}, "values": {"$each": values}},
+                       "$setOnInsert": {"created_timestamp": datetime.now(timezone.utc)}},
+                      upsert=True)
+            for ticker, year, timestamps, values in self._iter_ticker_year_arrays(item_df)
+        ]
+        self._bulk_write_in_batches(operations)
+        self._set_synced_range(start_timestamp, item_df.index.max().to_pydatetime())
+        logging.info(f"[SAVE][{self.collection.name}][ticker-major][附加 {len(item_df)} 日資料]")
+
+    def _bulk_write_in_batches(self, operations: list, batch_size: int = 1000):
+        for i in range(0, len(operations), batch_size):
+            self.collection.bulk_write(operations[i:i+batch_size], ordered=False)
+
+    def get_item_df_by_tickers(self, tickers: List[str], start_timestamp: datetime, end_timestamp: datetime) -> pd.DataFrame:
+        """
+        取出指定 tickers 於日期範圍內的資料（僅讀取 ticker 數 x 年數份文件）。
+        Returns:
+            pd.DataFrame: 與 date-major 查詢相同格式（index 為 data_timestamp，columns 為 ticker）。
+        """
+        query = {
+            "ticker": {"$in": list(tickers)},
+            "year": {"$gte": start_timestamp.year, "$lte": end_timestamp.year},
+        }
+        projection = {"_id": 0, "ticker": 1, "data_timestamps": 1, "values": 1}
+
+        series_dict = {}
+        for document in self.collection.find(query, projection):
+            series = pd.Series(np.asarray(document["values"], dtype=np.float64), index=pd.DatetimeIndex(document["data_timestamps"]))
+            series_dict.setdefault(document["ticker"], []).append(series)
+
+        if not series_dict:
+            logging.info(f"[INFO] 無數據匹配查詢條件: {query}")
+            return pd.DataFrame()
+
+        item_df = pd.DataFrame({ticker: pd.concat(series_list) for ticker, series_list in series_dict.items()})
+        item_df.index.name = "data_timestamp"
+        item_df = item_df.sort_index().loc[start_timestamp:end_timestamp].dropna(axis=1, how="all")
+        return item_df.sort_index(axis=0).sort_index(axis=1)
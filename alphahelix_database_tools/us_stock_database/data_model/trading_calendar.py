@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import List, Union
+import numpy as np
+import pandas as pd
+
+from alphahelix_database_tools.utils.datetime_utils import datetime2datetime64
+
+class TradingCalendar:
+    """
+    記憶體內的交易日曆：保存排序後的交易日陣列，所有查詢皆以 np.searchsorted 完成（不需存取資料庫）。
+    由 MarketStatusDAO 載入一次並快取，資料更新時重新載入。
+    """
+    def __init__(self, trade_dates: List[datetime], start_timestamp: datetime, end_timestamp: datetime):
+        """
+        - trade_dates: 交易日列表
+        - start_timestamp / end_timestamp: 日曆涵蓋範圍（market_status 資料的最早／最晚日期，含非交易日）
+        """
+        self.trade_dates = pd.DatetimeIndex(sorted(set(trade_dates)))
+        self._trade_date_values = self.trade_dates.values
+        self.start_timestamp = start_timestamp
+        self.end_timestamp = end_timestamp
+
+    def _to_datetime(self, position: int) -> datetime:
+        return self.trade_dates[position].to_pydatetime()
+
+    def is_trade_date(self, timestamp: Union[datetime, str]) -> bool:
+        value = datetime2datetime64(timestamp)
+        position = np.searchsorted(self._trade_date_values, value, side="left")
+        return bool(position < len(self._trade_date_values) and self._trade_date_values[position] == value)
+
+    def get_trade_date_list(self, start_timestamp: Union[datetime, str], end_timestamp: Union[datetime, str]) -> List[datetime]:
+        """取得 [start_timestamp, end_timestamp] 範圍內的交易日列表"""
+        start_position = np.searchsorted(self._trade_date_values, datetime2datetime64(start_timestamp), side="left")
+        end_position = np.searchsorted(self._trade_date_values, datetime2datetime64(end_timestamp), side="right")
+        return list(self.trade_dates[start_position:end_position].to_pydatetime())
+
+    def get_closest_trade_date(self, timestamp: Union[datetime, str], direction: str = "last", cal_self: bool = True) -> datetime:
+        """
+        取得距離指定日期最近的交易日，計算方式可選往前（last）或往後（next）。
+        cal_self 為 True 時，若指定日期本身為交易日則直接返回。
+        """
+        if direction not in {"last", "next"}:
+            raise ValueError("direction 必須是 'last' 或 'next'")
+
+        value = datetime2datetime64(timestamp)
+        if direction == "last":
+            position = np.searchsorted(self._trade_date_values, value, side="right" if cal_self else "left") - 1
+        else:
+            position = np.searchsorted(self._trade_date_values, value, side="left" if cal_self else "right")
+
+        if position < 0 or position >= len(self._trade_date_values):
+            raise ValueError(f"無法在交易日曆範圍 {self.start_timestamp} ~ {self.end_timestamp} 找到有效的交易日")
+
+        return self._to_datetime(position)
+
+    def shift_trade_date(self, timestamp: Union[datetime, str], n: int) -> datetime:
+        """
+        依交易日平移：n > 0 取指定日期之後第 n 個交易日，n < 0 取之前第 |n| 個交易日（皆不含指定日期本身），
+        n = 0 則取最近的交易日（往前，含指定日期本身）。
+        """
+        if n == 0:
+            return self.get_closest_trade_date(timestamp, direction="last", cal_self=True)
+
+        value = datetime2datetime64(timestamp)
+        if n > 0:
+            position = np.searchsorted(self._trade_date_values, value, side="right") + n - 1
+        else:
+            position = np.searchsorted(self._trade_date_values, value, side="left") + n
+
+        if position < 0 or position >= len(self._trade_date_values):
+            raise ValueError(f"平移 {n} 個交易日後超出交易日曆範圍 {self.start_timestamp} ~ {self.end_timestamp}")
+        return self._to_datetime(position)
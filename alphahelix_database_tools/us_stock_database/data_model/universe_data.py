@@ -1,12 +1,91 @@
 from .base_data import BaseDAO
+from .universe_membership import UniverseMembership
+import threading
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta
+from typing import List, Tuple
 
 class UniverseDAO(BaseDAO):
+    # 成分股快取的時效（供其他程序寫入新資料後自動重新載入）
+    MEMBERSHIP_MAX_AGE = timedelta(hours=12)
+    
     def __init__(self, collection_name: str, uri: str):
         self.db_name = "Universe"
         super().__init__(self.db_name, collection_name, uri)
+        self._membership_lock = threading.RLock()
+        self._reset_membership()
+    
+    def _reset_membership(self):
+        """清除已載入的成分股快取（寫入新資料後呼叫）"""
+        with self._membership_lock:
+            self._universe_documents = {}  # data_timestamp -> ticker list
+            self._loaded_ranges: List[Tuple[datetime, datetime]] = []  # 已完整載入的日期範圍（已排序、合併）
+            self._membership = None
+            self._membership_loaded_timestamp = datetime.now()
+    
+    def _get_missing_ranges(self, start_timestamp: datetime, end_timestamp: datetime) -> List[Tuple[datetime, datetime]]:
+        """取得 [start_timestamp, end_timestamp] 中尚未載入的日期範圍"""
+        missing_ranges, cursor_timestamp = [], start_timestamp
+        for loaded_start, loaded_end in self._loaded_ranges:
+            if loaded_end < cursor_timestamp:
+                continue
+            if loaded_start > end_timestamp:
+                break
+            if loaded_start > cursor_timestamp:
+                missing_ranges.append((cursor_timestamp, loaded_start))
+            cursor_timestamp = max(cursor_timestamp, loaded_end)
+            if cursor_timestamp >= end_timestamp:
+                return missing_ranges
+        missing_ranges.append((cursor_timestamp, end_timestamp))
+        return missing_ranges
+    
+    def _add_loaded_range(self, start_timestamp: datetime, end_timestamp: datetime):
+        merged_ranges = []
+        for loaded_start, loaded_end in sorted(self._loaded_ranges + [(start_timestamp, end_timestamp)]):
+            if merged_ranges and loaded_start <= merged_ranges[-1][1]:
+                merged_ranges[-1] = (merged_ranges[-1][0], max(merged_ranges[-1][1], loaded_end))
+            else:
+                merged_ranges.append((loaded_start, loaded_end))
+        self._loaded_ranges = merged_ranges
+    
+    def get_membership(self, start_timestamp: datetime, end_timestamp: datetime) -> UniverseMembership:
+        """
+        取得涵蓋 [start_timestamp, end_timestamp] 的成分股結構，僅向資料庫補抓尚未載入的日期範圍。
+        返回的結構可能包含範圍以外的已載入日期，查詢時須指定日期。
+        """
+        with self._membership_lock:
+            if datetime.now() - self._membership_loaded_timestamp > self.MEMBERSHIP_MAX_AGE:
+                self._reset_membership()
+            
+            missing_ranges = self._get_missing_ranges(start_timestamp, end_timestamp)
+            for missing_start, missing_end in missing_ranges:
+                query_result_list = self.find(
+                    query={"data_timestamp": {"$gte": missing_start, "$lte": missing_end}},
+                    projection={"data_timestamp": 1, "values": 1, "_id": 0},
+                )
+                for item in query_result_list:
+                    self._universe_documents[item["data_timestamp"]] = item.get("values") or []
+                self._add_loaded_range(missing_start, missing_end)
+            
+            if missing_ranges or self._membership is None:
+                self._membership = UniverseMembership(list(self._universe_documents.keys()), list(self._universe_documents.values()))
+            return self._membership
+    
+    def insert_one(self, document, unique_key=None):
+        inserted_id = super().insert_one(document, unique_key)
+        self._reset_membership()  # 寫入後重新載入成分股
+        return inserted_id
+    
+    def insert_many(self, documents, unique_key=None):
+        inserted_ids = super().insert_many(documents, unique_key)
+        self._reset_membership()  # 寫入後重新載入成分股
+        return inserted_ids
+    
+    def bulk_upsert(self, documents, key="data_timestamp", batch_size=500):
+        written_count = super().bulk_upsert(documents, key, batch_size)
+        self._reset_membership()  # 寫入後重新載入成分股
+        return written_count
     
     def _remove_delist_ticker(self, ticker_list):
         """
@@ -20,18 +99,18 @@ class UniverseDAO(BaseDAO):
         if ticker_df.empty:
             raise ValueError("ticker_df 為空，無法轉換")
 
-        # 使用 stack 将 DataFrame 转换为长格式，忽略 NaN
-        stacked_df = ticker_df.stack().reset_index()
-        stacked_df.columns = ['data_timestamp', 'dummy_column', 'ticker']
+        # 取出所有非空的 (日期, ticker) 配對，並以 factorize 編碼 ticker
+        ticker_array = ticker_df.to_numpy(dtype=object)
+        rows, columns = np.nonzero(pd.notna(ticker_array))
+        codes, tickers = pd.factorize(ticker_array[rows, columns], sort=True)
         
-        # 删除无意义的 dummy_column 和 NaN 的 ticker
-        stacked_df = stacked_df.drop(['dummy_column'], axis=1).dropna(subset=['ticker'])
-        
-        # 使用 crosstab 创建布尔矩阵
-        universe_df = pd.crosstab(
-            stacked_df['data_timestamp'],
-            stacked_df['ticker']
-        ).astype(bool)
+        # 直接填入布林矩陣（不含任何 ticker 的日期將被排除）
+        matrix = np.zeros((len(ticker_df), len(tickers)), dtype=bool)
+        matrix[rows, codes] = True
+        has_member = matrix.any(axis=1)
+        universe_df = pd.DataFrame(matrix[has_member],
+                                   index=ticker_df.index[has_member].rename("data_timestamp"),
+                                   columns=pd.Index(tickers, name="ticker"))
 
         # 若需要排除已下市的 ticker
         if exclude_delist:
@@ -56,28 +135,21 @@ class UniverseDAO(BaseDAO):
         if not ((start_timestamp and end_timestamp) or num):
             raise ValueError("必須指定 start_timestamp 和 end_timestamp，或指定 num")
 
-        # 組裝查詢條件
-        query = {}
-        if start_timestamp and end_timestamp:
-            query["data_timestamp"] = {"$gte": start_timestamp, "$lte": end_timestamp}
-        elif num is not None and end_timestamp is not None:
-            query["data_timestamp"] = {"$lte": end_timestamp}
-        
-        # 執行查詢
-        result = self.find(
-            query=query, 
-            projection={"values": 1, "_id": 0}, 
-            sort=[("data_timestamp", -1)], 
-            limit=num
-        )
-
-        # 提取並展開所有 values，去重並排序
-        tickers = set()
-        for item in result:
-            # 確保 item["values"] 是列表，並展開到集合中
-            tickers.update(item.get("values", []))
+        if not (start_timestamp and end_timestamp):
+            # 僅查詢最近 num 份文件的日期（不取 values），再由快取的成分股結構取出對應範圍
+            query = {"data_timestamp": {"$lte": end_timestamp}} if end_timestamp is not None else {}
+            result = self.find(
+                query=query,
+                projection={"data_timestamp": 1, "_id": 0},
+                sort=[("data_timestamp", -1)],
+                limit=num
+            )
+            if not result:
+                return []
+            start_timestamp, end_timestamp = result[-1]["data_timestamp"], result[0]["data_timestamp"]
         
-        return sorted(tickers)
+        membership = self.get_membership(start_timestamp, end_timestamp)
+        return membership.union_over(start_timestamp, end_timestamp)
 
 class UnivSPX500DAO(UniverseDAO):
     def __init__(self, uri):
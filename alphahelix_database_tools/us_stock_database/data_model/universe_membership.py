@@ -0,0 +1,94 @@
+from datetime import datetime
+from typing import List, Union
+import numpy as np
+import pandas as pd
+
+from alphahelix_database_tools.utils.datetime_utils import datetime2datetime64
+
+class UniverseMembership:
+    """
+    Universe 成分股的緊湊表示：排序後的 ticker 索引 + 以日期為列的稀疏 CSR 結構（indptr / indices）。
+    第 i 個日期的成分股為 tickers[indices[indptr[i]:indptr[i+1]]]，查詢皆以 np.searchsorted 與陣列切片完成。
+    """
+    def __init__(self, timestamps: List[datetime], ticker_lists: List[List[str]]):
+        """
+        - timestamps: 各份 universe 文件的日期
+        - ticker_lists: 與 timestamps 一一對應的成分股列表
+        """
+        row_order = np.argsort(pd.DatetimeIndex(timestamps).values, kind="stable")
+        self.timestamps = pd.DatetimeIndex(timestamps)[row_order]
+        self._timestamp_values = self.timestamps.values
+        ticker_lists = [ticker_lists[i] for i in row_order]
+
+        # 以 factorize 一次完成所有 ticker 的編碼（編碼順序即 ticker 排序）
+        row_lengths = np.fromiter((len(ticker_list) for ticker_list in ticker_lists), dtype=np.int64, count=len(ticker_lists))
+        flat_tickers = np.fromiter((ticker for ticker_list in ticker_lists for ticker in ticker_list), dtype=object, count=int(row_lengths.sum()))
+        codes, uniques = pd.factorize(flat_tickers, sort=True)
+
+        self.tickers = np.asarray(uniques, dtype=object)
+        self.indptr = np.concatenate([[0], np.cumsum(row_lengths)])
+        self.indices = codes.astype(np.int32)
+
+    def _get_row(self, timestamp: Union[datetime, str]) -> int:
+        """取得指定日期當下有效的列（該日或之前最近一份文件），若早於所有文件則返回 -1"""
+        return int(np.searchsorted(self._timestamp_values, datetime2datetime64(timestamp), side="right")) - 1
+
+    def members_on(self, timestamp: Union[datetime, str]) -> List[str]:
+        """
+        取得指定日期的成分股（point-in-time：採用該日或之前最近一份 universe 文件）。
+        """
+        row = self._get_row(timestamp)
+        if row < 0:
+            return []
+        return sorted(set(self.tickers[self.indices[self.indptr[row]:self.indptr[row+1]]]))
+
+    def union_over(self, start_timestamp: Union[datetime, str], end_timestamp: Union[datetime, str]) -> List[str]:
+        """
+        取得 [start_timestamp, end_timestamp] 範圍內所有文件的成分股聯集。
+        """
+        start_row = np.searchsorted(self._timestamp_values, datetime2datetime64(start_timestamp), side="left")
+        end_row = np.searchsorted(self._timestamp_values, datetime2datetime64(end_timestamp), side="right")
+        codes = np.unique(self.indices[self.indptr[start_row]:self.indptr[end_row]])
+        return self.tickers[codes].tolist()
+
+    def mask_for(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        依 df 的 index（日期）與 columns（ticker），返回同形狀的布林遮罩：該日該 ticker 是否為成分股（point-in-time）。
+        不在 universe 中的 ticker 與早於第一份文件的日期皆為 False。
+        """
+        mask = np.zeros(df.shape, dtype=bool)
+        if df.empty or len(self.timestamps) == 0:
+            return pd.DataFrame(mask, index=df.index, columns=df.columns)
+
+        rows = np.searchsorted(self._timestamp_values, pd.DatetimeIndex(df.index).as_unit("ns").values, side="right") - 1
+        # ticker 編碼 -> df 欄位位置（不在 df 中者為 -1）
+        column_positions = np.full(len(self.tickers), -1, dtype=np.int64)
+        ticker_codes = pd.Index(self.tickers).get_indexer(df.columns)
+        column_positions[ticker_codes[ticker_codes >= 0]] = np.nonzero(ticker_codes >= 0)[0]
+
+        # 依各列的 CSR 區段展開為 (df 列位置, 欄位位置) 配對
+        valid_rows = np.nonzero(rows >= 0)[0]
+        starts, ends = self.indptr[rows[valid_rows]], self.indptr[rows[valid_rows] + 1]
+        lengths = ends - starts
+        row_positions = np.repeat(valid_rows, lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        columns = column_positions[self.indices[np.repeat(starts, lengths) + offsets]]
+
+        is_in_df = columns >= 0
+        mask[row_positions[is_in_df], columns[is_in_df]] = True
+        return pd.DataFrame(mask, index=df.index, columns=df.columns)
+
+    def to_frame(self, start_timestamp: Union[datetime, str] = None, end_timestamp: Union[datetime, str] = None) -> pd.DataFrame:
+        """
+        輸出布林矩陣（index 為 data_timestamp，columns 為範圍內出現過的 ticker）。
+        """
+        start_row = 0 if start_timestamp is None else np.searchsorted(self._timestamp_values, datetime2datetime64(start_timestamp), side="left")
+        end_row = len(self.timestamps) if end_timestamp is None else np.searchsorted(self._timestamp_values, datetime2datetime64(end_timestamp), side="right")
+
+        indices = self.indices[self.indptr[start_row]:self.indptr[end_row]]
+        codes, column_indices = np.unique(indices, return_inverse=True)
+        row_indices = np.repeat(np.arange(end_row - start_row), np.diff(self.indptr[start_row:end_row+1]))
+
+        matrix = np.zeros((end_row - start_row, len(codes)), dtype=bool)
+        matrix[row_indices, column_indices] = True
+        return pd.DataFrame(matrix, index=self.timestamps[start_row:end_row].rename("data_timestamp"), columns=pd.Index(self.tickers[codes], name="ticker"))
@@ -0,0 +1,68 @@
+from bson.binary import Binary
+
+import hashlib
+import threading
+from typing import Dict, Tuple
+import numpy as np
+
+# 壓縮格式文件的欄位：{"encoding", "ticker_dict_id", "value_dtype", "values_blob", "null_bitmap"}
+PACKED_ENCODING = "packed_v1"
+PACKED_FIELD_LIST = ["encoding", "ticker_dict_id", "value_dtype", "values_blob", "null_bitmap"]
+
+def encode_values(values: dict, tickers: Tuple[str, ...], dtype: str = "float64") -> Tuple[Binary, Binary]:
+    """
+    依 ticker 字典的順序，將 {ticker: value} 壓縮為連續的二進位數值陣列與有效值 bitmap。
+    - values: 當日資料（須為 tickers 的子集）
+    - tickers: ticker 字典（決定數值陣列的排列順序）
+    - dtype: 數值型別（"float64" 或 "float32"）
+    """
+    value_array = np.full(len(tickers), np.nan, dtype=dtype)
+    valid_mask = np.zeros(len(tickers), dtype=bool)
+    ticker_index = {ticker: i for i, ticker in enumerate(tickers)}
+
+    for ticker, value in values.items():
+        if value is None:
+            continue
+        i = ticker_index[ticker]
+        value_array[i] = value
+        valid_mask[i] = True
+
+    return Binary(value_array.tobytes()), Binary(np.packbits(valid_mask).tobytes())
+
+def decode_values(values_blob: bytes, null_bitmap: bytes, dtype: str, length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    解碼為 (數值陣列, 有效值遮罩)；數值陣列直接以 np.frombuffer 檢視原始 buffer（不複製）。
+    """
+    value_array = np.frombuffer(values_blob, dtype=np.dtype(dtype), count=length)
+    valid_mask = np.unpackbits(np.frombuffer(null_bitmap, dtype=np.uint8), count=length).astype(bool)
+    return value_array, valid_mask
+
+class TickerDictionaryStore:
+    """
+    ticker 字典的存取（與資料同一 DB 的 ticker_dictionary collection），字典以內容雜湊為 _id，可跨日、跨項目共用。
+    """
+    def __init__(self, db):
+        self.collection = db["ticker_dictionary"]
+        self._dictionaries: Dict[str, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_dictionary_id(tickers: Tuple[str, ...]) -> str:
+        return hashlib.sha1("\n".join(tickers).encode("utf-8")).hexdigest()
+
+    def get(self, dict_id: str) -> Tuple[str, ...]:
+        with self._lock:
+            if dict_id not in self._dictionaries:
+                document = self.collection.find_one({"_id": dict_id})
+                if document is None:
+                    raise ValueError(f"ticker 字典不存在: {dict_id}")
+                self._dictionaries[dict_id] = tuple(document["tickers"])
+            return self._dictionaries[dict_id]
+
+    def save(self, tickers: Tuple[str, ...]) -> str:
+        dict_id = self.get_dictionary_id(tickers)
+        with self._lock:
+            if dict_id not in self._dictionaries:
+                self.collection.update_one({"_id": dict_id}, {"$setOnInsert": {"tickers": list(tickers)}}, upsert=True)
+                self._dictionaries[dict_id] = tickers
+        return dict_id
@@ -0,0 +1,113 @@
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .value_codec import decode_values
+
+class NumericMatrixDecoder:
+    """
+    將 date-major 文件（{"data_timestamp": ..., "values": {ticker: value}}）逐筆解碼至預先配置的 float64 矩陣。
+    以 ticker -> 欄位位置的索引定位每個值，取代 list(cursor) -> DataFrame -> DataFrame(values) 的多次中介轉換。
+    亦支援壓縮格式文件（ticker 字典 + 二進位數值陣列），兩種格式可混合出現。
+    """
+    def __init__(self, row_count: int, tickers: List[str] = None, ticker_dictionary_store=None):
+        """
+        - row_count: 預期文件數（用於預先配置矩陣，實際筆數超過時自動擴充）
+        - tickers: 指定欄位（已知 ticker 時欄位固定，不在其中的 ticker 將被忽略）
+        - ticker_dictionary_store: 壓縮格式文件的 ticker 字典來源（TickerDictionaryStore）
+        """
+        self.ticker_dictionary_store = ticker_dictionary_store
+        # ticker 字典 id -> 欄位位置（同一字典僅需計算一次）
+        self._dictionary_positions: Dict[str, np.ndarray] = {}
+        self.is_fixed_columns = tickers is not None
+        self.ticker_index: Dict[str, int] = {ticker: i for i, ticker in enumerate(sorted(set(tickers or [])))}
+        self.matrix = np.full((max(row_count, 1), max(len(self.ticker_index), 1)), np.nan, dtype=np.float64)
+        # 固定欄位時，記錄實際出現過的 ticker（未出現者不輸出，與資料庫 projection 行為一致）
+        self._is_column_seen = np.zeros(len(self.ticker_index), dtype=bool)
+        self.timestamps: List[datetime] = []
+
+        # 連續文件的 ticker 排列經常相同，保留上一筆的欄位位置以省去重複查找
+        self._last_keys = None
+        self._last_positions = None
+
+    def _ensure_capacity(self, row_count: int, column_count: int) -> None:
+        cur_row_count, cur_column_count = self.matrix.shape
+        if row_count <= cur_row_count and column_count <= cur_column_count:
+            return
+
+        # 以倍數擴充，避免頻繁重新配置
+        new_shape = (max(row_count, cur_row_count * 2) if row_count > cur_row_count else cur_row_count,
+                     max(column_count, cur_column_count * 2) if column_count > cur_column_count else cur_column_count)
+        new_matrix = np.full(new_shape, np.nan, dtype=np.float64)
+        new_matrix[:cur_row_count, :cur_column_count] = self.matrix
+        self.matrix = new_matrix
+
+    def _get_positions(self, keys: tuple) -> np.ndarray:
+        if keys == self._last_keys:
+            return self._last_positions
+
+        if self.is_fixed_columns:
+            positions = np.fromiter((self.ticker_index.get(key, -1) for key in keys), dtype=np.int64, count=len(keys))
+        else:
+            ticker_index = self.ticker_index
+            positions = np.fromiter((ticker_index.setdefault(key, len(ticker_index)) for key in keys), dtype=np.int64, count=len(keys))
+
+        self._last_keys, self._last_positions = keys, positions
+        return positions
+
+    def add_row(self, timestamp: datetime, keys: tuple, values: np.ndarray, positions: np.ndarray = None) -> None:
+        """寫入一筆文件（keys 與 values 須一一對應，若已知欄位位置可直接傳入 positions）"""
+        row = len(self.timestamps)
+        self.timestamps.append(timestamp)
+        if positions is None:
+            positions = self._get_positions(keys)
+        self._ensure_capacity(row + 1, len(self.ticker_index))
+
+        if self.is_fixed_columns:
+            valid_mask = positions >= 0
+            positions, values = positions[valid_mask], values[valid_mask]
+            self._is_column_seen[positions] = True
+        self.matrix[row, positions] = values
+
+    def add_packed_document(self, document: dict) -> None:
+        dict_id = document["ticker_dict_id"]
+        dictionary = self.ticker_dictionary_store.get(dict_id)
+        if dict_id not in self._dictionary_positions:
+            self._dictionary_positions[dict_id] = self._get_positions(dictionary)
+        positions = self._dictionary_positions[dict_id]
+        
+        values, valid_mask = decode_values(document["values_blob"], document["null_bitmap"], document["value_dtype"], len(dictionary))
+        self.add_row(document["data_timestamp"], dictionary, values[valid_mask], positions=positions[valid_mask])
+
+    def add_document(self, document: dict) -> None:
+        if "values_blob" in document:
+            self.add_packed_document(document)
+            return
+        
+        values_dict = document.get("values") or {}
+        # None 會被轉換為 NaN
+        self.add_row(document["data_timestamp"], tuple(values_dict), np.array(list(values_dict.values()), dtype=np.float64))
+
+    def to_frame(self) -> pd.DataFrame:
+        """輸出依日期與 ticker 排序的 DataFrame"""
+        row_count, column_count = len(self.timestamps), len(self.ticker_index)
+        matrix = self.matrix[:row_count, :column_count]
+        tickers = np.array(list(self.ticker_index.keys()), dtype=object)
+        timestamps = pd.DatetimeIndex(self.timestamps, name="data_timestamp")
+
+        row_order = np.argsort(timestamps.values, kind="stable")
+        column_order = np.argsort(tickers, kind="stable")
+        # 資料庫查詢多為日期降冪，反轉即可取得升冪（僅為 view，不需複製）
+        if (row_order == np.arange(row_count)[::-1]).all():
+            matrix, timestamps = matrix[::-1], timestamps[::-1]
+        elif not (row_order == np.arange(row_count)).all():
+            matrix, timestamps = matrix[row_order], timestamps[row_order]
+
+        if self.is_fixed_columns and not self._is_column_seen.all():
+            matrix, tickers = matrix[:, self._is_column_seen], tickers[self._is_column_seen]
+        elif not (column_order == np.arange(column_count)).all():
+            matrix, tickers = matrix[:, column_order], tickers[column_order]
+
+        return pd.DataFrame(matrix, index=timestamps, columns=pd.Index(tickers))
@@ -1,8 +1,10 @@
 from datetime import datetime, timedelta, timezone
+import numpy as np
 
 from alphahelix_database_tools.us_stock_database.data_manager import UsStockDataManager
 from alphahelix_database_tools.data_scrapers.polygon_tools import *
 from alphahelix_database_tools.utils.datetime_utils import TODAY_DATE_STR, str2datetime, datetime2str
+from alphahelix_database_tools.utils.format_utils import item_df_to_document_list
 
 from dotenv import load_dotenv #type: ignore
 
@@ -10,15 +12,29 @@ from dotenv import load_dotenv #type: ignore
 load_dotenv()
 
 class UsStockDataUpdater(UsStockDataManager):
-    def __init__(self, username, password):
-        super().__init__(username, password)  # 调用父类的初始化方法
+    # 分段回補時每段的日數（每段下載後立即寫入並更新檢查點）
+    BACKFILL_CHUNK_DAYS = 30
+    
+    def __init__(self, username, password, max_pool_size: int = None, packed_item_list=None, packed_value_dtype="float64", versioned_item_list=None):
+        super().__init__(username, password, max_pool_size=max_pool_size,
+                         packed_item_list=packed_item_list, packed_value_dtype=packed_value_dtype,
+                         versioned_item_list=versioned_item_list)  # 调用父类的初始化方法
         self._load_api_keys()
     
     # 並取用環境變數（用於本地測試)，若部署至雲端伺服器則使用雲端的環境變數
     def _load_api_keys(self):
         self.polygon_API_key = os.getenv('polygon_API_key')
+        # polygon flat file（每日彙總 CSV.gz）的本地資料夾（由下載流程放置）
+        self.polygon_flat_file_folder_path = os.getenv('polygon_flat_file_folder_path')
     
-    def update_stock_OHLCV_data(self, start_timestamp=None, end_timestamp=None, adjust=False, source="polygon"):
+    def update_stock_OHLCV_data(self, start_timestamp=None, end_timestamp=None, adjust=False, source="polygon", resume=True, chunk_days=None, flat_file_folder_path=None):
+        """
+        更新 OHLCV 資料：依日期分段下載，每段下載後立即寫入並更新檢查點（中斷後重新執行時自檢查點接續）。
+        - source: polygon（REST API，逐日呼叫）/ polygon_flat_file（讀取本地的每日彙總 CSV.gz，僅讀取交易日，適用於大範圍回補）
+        - resume: 是否自檢查點接續（False 時重新下載整個範圍）
+        - chunk_days: 每段的日數（預設為 BACKFILL_CHUNK_DAYS）
+        - flat_file_folder_path: flat file 資料夾（預設為環境變數 polygon_flat_file_folder_path）
+        """
         if start_timestamp == None:
             start_timestamp = self.get_latest_data_date(item="open")
             start_timestamp = start_timestamp + timedelta(days=1)
@@ -26,6 +42,9 @@ class UsStockDataUpdater(UsStockDataManager):
         if end_timestamp == None:
             end_timestamp = TODAY_DATE_STR
         
+        start_timestamp = self._parse_datetime(start_timestamp)
+        end_timestamp = self._parse_datetime(end_timestamp)
+        
         # 若資料已更新至最新日期，則不需進行更新
         current_timestamp = datetime.now()
         if current_timestamp - start_timestamp < timedelta(days=1):
@@ -35,26 +54,180 @@ class UsStockDataUpdater(UsStockDataManager):
         logging.info(f"[SAVE][OHLCV][{datetime2str(start_timestamp)} ~ {datetime2str(end_timestamp)}]")
         
         if source == "polygon":
-            data_dict = save_stock_OHLCV_from_Polygon(self.polygon_API_key, start_timestamp, end_timestamp, adjust)
+            trade_calendar = self._get_scraper_trade_calendar()
+            fetch_function = lambda chunk_start, chunk_end: save_stock_OHLCV_from_Polygon(self.polygon_API_key, chunk_start, chunk_end, adjust, trade_calendar=trade_calendar)
+        elif source == "polygon_flat_file":
+            if adjust:
+                raise ValueError("[SAVE][OHLCV][polygon flat file 僅提供未調整價格]")
+            flat_file_folder_path = flat_file_folder_path or self.polygon_flat_file_folder_path
+            if not flat_file_folder_path or not os.path.isdir(flat_file_folder_path):
+                raise ValueError(f"[SAVE][OHLCV][flat file 資料夾不存在: {flat_file_folder_path}]")
+            # 資料夾僅掃描一次，各區段僅讀取交易日的檔案
+            file_path_dict = get_polygon_flat_file_path_dict(flat_file_folder_path)
+            fetch_function = lambda chunk_start, chunk_end: save_stock_OHLCV_from_Polygon_flat_file(
+                flat_file_folder_path, self._get_expected_trade_date_list(chunk_start, chunk_end), file_path_dict=file_path_dict)
         else:
             raise ValueError(f"[SAVE][OHLCV][ERROR: Unsupport Source]: {source}")
         
         item_list = ["open", "high", "low", "close", "volume"] # "avg_price", "transaction_num"
-        for item in item_list:
-            item_dao = self._get_dao_instance(item)
-            item_data_dict = data_dict.get(item, {})
+        self._run_chunked_backfill("OHLCV", item_list, start_timestamp, end_timestamp, fetch_function, resume=resume, chunk_days=chunk_days)
+        self.clear_adjusted_item_cache()
+        
+        # 若 ticker-major 版面已建立，同步寫入範圍（已同步範圍內被覆寫的年份重建，之後的新資料附加）
+        self._sync_ticker_major_layout(item_list, start_timestamp, end_timestamp)
+    
+    def _get_scraper_trade_calendar(self):
+        """
+        取得供爬蟲規劃請求日期的交易日曆（market_status 無資料時返回 None，改為逐日請求）
+        """
+        try:
+            return self.get_trade_calendar()
+        except ValueError as e:
+            logging.warning(f"[SAVE][trade_calendar][{e}，改為逐日請求]")
+            return None
+    
+    def _run_chunked_backfill(self, job, item_list, start_timestamp, end_timestamp, fetch_function, resume=True, chunk_days=None):
+        """
+        分段回補：將 [start_timestamp, end_timestamp] 切為每 chunk_days 日一段，逐段下載、寫入資料庫並更新檢查點，
+        記憶體用量僅與單一區段有關。
+        - job: 檢查點的工作名稱
+        - fetch_function: fetch_function(chunk_start, chunk_end) -> {item: {date_str: values}}
+        
+        若區段中有交易日缺少資料（如 Polygon 尚未釋出當日收盤資料），檢查點僅推進至缺漏日的前一日並停止回補。
+        """
+        checkpoint_dao = self._get_dao_instance("backfill_checkpoint")
+        chunk_days = chunk_days or self.BACKFILL_CHUNK_DAYS
+        
+        chunk_start = start_timestamp
+        if resume:
+            chunk_start = checkpoint_dao.get_resume_timestamp(job, item_list, start_timestamp)
+            if chunk_start > end_timestamp:
+                logging.info(f"[SAVE][{job}][檢查點已涵蓋至 {datetime2str(end_timestamp)}，不需進行更新]")
+                return
+            if chunk_start > start_timestamp:
+                logging.info(f"[SAVE][{job}][自檢查點接續：{datetime2str(chunk_start)} ~ {datetime2str(end_timestamp)}]")
+        
+        while chunk_start <= end_timestamp:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_timestamp)
+            data_dict = fetch_function(chunk_start, chunk_end)
             
-            # Process and transform the data
-            item_data_list = [
-                {
-                    "data_timestamp": str2datetime(date),
-                    "created_timestamp": datetime.now(timezone.utc),
-                    "values": values,
-                }
-                for date, values in item_data_dict.items()
-            ]
-            item_dao.insert_many(item_data_list, unique_key="data_timestamp")
+            created_timestamp = datetime.now(timezone.utc)
+            for item in item_list:
+                item_data_list = [
+                    {
+                        "data_timestamp": str2datetime(date),
+                        "created_timestamp": created_timestamp,
+                        "values": values,
+                    }
+                    for date, values in data_dict.get(item, {}).items()
+                ]
+                self._get_dao_instance(item).bulk_upsert(item_data_list, key="data_timestamp")
+            
+            # 檢查點僅推進至第一個缺漏交易日的前一日
+            missing_date_list = self._get_missing_trade_date_list(data_dict, item_list, chunk_start, chunk_end)
+            completed_timestamp = missing_date_list[0] - timedelta(days=1) if missing_date_list else chunk_end
+            if completed_timestamp >= chunk_start:
+                checkpoint_dao.save_checkpoint(job, item_list, start_timestamp, completed_timestamp)
             
+            if missing_date_list:
+                logging.warning(f"[SAVE][{job}][{datetime2str(missing_date_list[0])} 資料缺漏，回補停止於 {datetime2str(completed_timestamp)}]")
+                return
+            
+            logging.info(f"[SAVE][{job}][{datetime2str(chunk_start)} ~ {datetime2str(chunk_end)} 已完成]")
+            chunk_start = chunk_end + timedelta(days=1)
+    
+    def _get_missing_trade_date_list(self, data_dict, item_list, start_timestamp, end_timestamp):
+        """
+        取得區段內缺少資料的交易日（交易日曆未涵蓋的日期以週一至週五視為交易日）。
+        """
+        expected_date_list = self._get_expected_trade_date_list(start_timestamp, end_timestamp)
+        return [date for date in expected_date_list
+                if any(datetime2str(date) not in data_dict.get(item, {}) for item in item_list)]
+    
+    def _get_expected_trade_date_list(self, start_timestamp, end_timestamp):
+        """
+        取得區段內的交易日（交易日曆未涵蓋的日期以週一至週五視為交易日）。
+        """
+        try:
+            trade_calendar = self.get_trade_calendar()
+            expected_date_list = trade_calendar.get_trade_date_list(start_timestamp, min(end_timestamp, trade_calendar.end_timestamp))
+            uncovered_start_timestamp = max(start_timestamp, trade_calendar.end_timestamp + timedelta(days=1))
+        except ValueError:
+            expected_date_list, uncovered_start_timestamp = [], start_timestamp
+        
+        if uncovered_start_timestamp <= end_timestamp:
+            expected_date_list += list(pd.bdate_range(uncovered_start_timestamp, end_timestamp).to_pydatetime())
+        return expected_date_list
+    
+    def update_stock_ticker_major_layout(self, item, start_timestamp=None, end_timestamp=None):
+        """
+        將 date-major 資料同步至 ticker-major 版面（每個 ticker 每年一份文件）。
+        - 版面尚未建立，或指定的起始日不晚於已同步的最新日：依年份整年重建（每次僅載入一年資料）
+        - 先前同步失敗（版面標記為不一致）：自已同步的起始日起整段重建
+        - 其他情況：僅附加已同步最新日之後的新日期
+        """
+        ticker_major_dao = self._get_ticker_major_dao_instance(item)
+        synced_start, synced_end = ticker_major_dao.get_synced_range(refresh=True)
+        is_synced = ticker_major_dao.is_synced()
+        
+        start_timestamp = self._parse_datetime(start_timestamp)
+        end_timestamp = self._parse_datetime(end_timestamp) or self.get_latest_data_date(item)
+        
+        if not is_synced and (start_timestamp is None or start_timestamp > synced_start):
+            logging.info(f"[SAVE][{item}][ticker-major][版面與 date-major 不一致，自 {datetime2str(synced_start)} 起重建]")
+            start_timestamp = synced_start
+        
+        if is_synced and synced_end is not None and (start_timestamp is None or start_timestamp > synced_end):
+            item_df = self.get_item_df(item=item, method="by_date", start_timestamp=synced_end + timedelta(days=1), end_timestamp=end_timestamp)
+            ticker_major_dao.append_from_item_df(item_df)
+            return
+        
+        if start_timestamp is None:
+            # 初次建立：自 date-major 最早的資料開始
+            earliest_doc = self._get_dao_instance(item).find_one({}, sort=[("data_timestamp", 1)], projection={"data_timestamp": 1})
+            if not earliest_doc:
+                logging.warning(f"[SAVE][{item}][ticker-major][date-major 資料不存在]")
+                return
+            start_timestamp = earliest_doc["data_timestamp"]
+        
+        for year in range(start_timestamp.year, end_timestamp.year + 1):
+            self._rebuild_ticker_major_year(item, year)
+        
+        # 已重建整段同步範圍：恢復為可供查詢
+        if not is_synced and start_timestamp <= synced_start and end_timestamp >= synced_end:
+            ticker_major_dao._set_synced_range(*ticker_major_dao.get_synced_range(refresh=True), is_synced=True)
+    
+    def _rebuild_ticker_major_year(self, item, year):
+        """以該年全部的 date-major 資料重建 ticker-major 文件（須傳入整年資料，否則文件將僅保留傳入的日期）"""
+        item_df = self.get_item_df(item=item, method="by_date", start_timestamp=datetime(year, 1, 1), end_timestamp=datetime(year, 12, 31))
+        self._get_ticker_major_dao_instance(item).rebuild_from_item_df(item_df)
+    
+    def _sync_ticker_major_layout(self, item_list, start_timestamp=None, end_timestamp=None):
+        """
+        對已建立 ticker-major 版面的項目，同步 date-major 的寫入：
+        - 寫入範圍（start_timestamp ~ end_timestamp）與已同步範圍重疊時，重建涉及的年份（date-major 的歷史日期已被覆寫）
+        - 已同步最新日之後的新資料則附加
+        """
+        start_timestamp = self._parse_datetime(start_timestamp)
+        end_timestamp = self._parse_datetime(end_timestamp)
+        for item in item_list:
+            if not self.dao_info[item].get("is_ticker_major_available"):
+                continue
+            ticker_major_dao = self._get_ticker_major_dao_instance(item)
+            synced_start, synced_end = ticker_major_dao.get_synced_range(refresh=True)
+            if synced_end is None:
+                continue
+            try:
+                # 版面已標記為不一致時，由 update_stock_ticker_major_layout 整段重建
+                if ticker_major_dao.is_synced() and start_timestamp is not None and start_timestamp <= synced_end:
+                    rewritten_end_timestamp = min(end_timestamp or synced_end, synced_end)
+                    logging.info(f"[SAVE][{item}][ticker-major][重建被覆寫的年份: {start_timestamp.year} ~ {rewritten_end_timestamp.year}]")
+                    for year in range(start_timestamp.year, rewritten_end_timestamp.year + 1):
+                        self._rebuild_ticker_major_year(item, year)
+                self.update_stock_ticker_major_layout(item)
+            except Exception as e:
+                logging.error(f"[SAVE][{item}][ticker-major][同步失敗，標記版面為不一致（查詢改讀 date-major）: {e}]")
+                ticker_major_dao.mark_unsynced()
     
     def update_stock_market_status(self, source="polygon"):
         """
@@ -89,7 +262,7 @@ class UsStockDataUpdater(UsStockDataManager):
             
             # Insert the data into the database
             dao_instance = self._get_dao_instance("market_status")
-            dao_instance.insert_many(data_list, unique_key="data_timestamp")
+            dao_instance.bulk_upsert(data_list, key="data_timestamp")
             
             start_timestamp = datetime2str(data_list[0]["data_timestamp"])
             end_timestamp = datetime2str(data_list[-1]["data_timestamp"])
@@ -114,7 +287,7 @@ class UsStockDataUpdater(UsStockDataManager):
 
         # 根據資料來源抓取資料
         if source == "polygon":
-            data_dict = save_stock_split_from_Polygon(self.polygon_API_key, start_timestamp, end_timestamp)
+            data_dict = save_stock_split_from_Polygon(self.polygon_API_key, start_timestamp, end_timestamp, trade_calendar=self._get_scraper_trade_calendar())
             
         else:
             logging.error(f"[SAVE][stock_splits][資料來源不支持: {source}]")
@@ -131,7 +304,7 @@ class UsStockDataUpdater(UsStockDataManager):
                 "created_timestamp": created_timestamp,
                 "values": values
             }
-            for date, values in ((date, s.to_dict()[date]) for date, s in data_dict.items())
+            for date, values in data_dict.items()
         ]
         
         logging.info(f"[SAVE][stock_splits][{datetime2str(start_timestamp)} ~ {datetime2str(end_timestamp)}]")
@@ -139,13 +312,36 @@ class UsStockDataUpdater(UsStockDataManager):
         if data_list:
             dao_instance = self._get_dao_instance("stock_split")
             try:
-                dao_instance.insert_many(data_list, unique_key="data_timestamp")
+                dao_instance.bulk_upsert(data_list, key="data_timestamp")
                 logging.info(f"[SAVE][stock_splits][成功儲存 {len(data_list)} 筆資料]")
+                # 僅重算新分割資料涉及的 ticker 的調整因子（尚未建立完整調整因子時改為全部重建）
+                if self._get_dao_instance("adjust_factor").is_bootstrapped(refresh=True):
+                    self._get_dao_instance("adjust_factor").apply_split_documents(data_list)
+                else:
+                    self.update_stock_adjust_factor()
+                self.clear_adjusted_item_cache()
             except Exception as e:
                 logging.error(f"[SAVE][stock_splits][資料儲存失敗: {e}]")
         else:
             logging.info("[SAVE][stock_splits][資料已更新至最新日期]")
 
+    def update_stock_adjust_factor(self):
+        """
+        以全部 stock_split 資料重建調整因子（初次建立，或歷史分割資料被修正後執行；日常更新由 update_stock_split_data 增量維護）
+        """
+        stock_splits_df = self.get_item_df(item="stock_split", method="by_date", start_timestamp=datetime(1900, 1, 1))
+        split_document_list = item_df_to_document_list(stock_splits_df, created_timestamp=None)
+        self._get_dao_instance("adjust_factor").rebuild(split_document_list)
+    
+    def bootstrap_version_history(self, item):
+        """
+        將資料項目現有的文件複製至版本 collection（維護作業：項目首次加入 versioned_item_list 時執行一次，
+        使啟用版本化之前寫入的歷史資料也能進行 as-of 查詢）
+        """
+        if item not in self.versioned_item_list:
+            raise ValueError(f"{item} 未啟用版本化寫入（請於 versioned_item_list 指定）")
+        self._get_dao_instance(item).bootstrap_version_history()
+    
     # 儲存現金股利資料
     def update_stock_cash_dividend(self, start_timestamp=None, end_timestamp=None, item="ex_dividend", source="polygon"):
         if start_timestamp == None:
@@ -161,7 +357,8 @@ class UsStockDataUpdater(UsStockDataManager):
             data_dict = save_stock_cash_dividend_from_Polygon(self.polygon_API_key, 
                                                             start_timestamp, 
                                                             end_timestamp, 
-                                                            div_type=trans_dict[item])
+                                                            div_type=trans_dict[item],
+                                                            trade_calendar=self._get_scraper_trade_calendar())
         else:
             raise ValueError(f"source: {source} is not supported.")
         
@@ -186,8 +383,9 @@ class UsStockDataUpdater(UsStockDataManager):
         if data_list:
             dao_instance = self._get_dao_instance(item)
             try:
-                dao_instance.insert_many(data_list, unique_key="data_timestamp")
+                dao_instance.bulk_upsert(data_list, key="data_timestamp")
                 logging.info(f"[SAVE][{item}][成功儲存 {len(data_list)} 筆資料]")
+                self.clear_adjusted_item_cache()
             except Exception as e:
                 logging.error(f"[SAVE][{item}][資料儲存失敗: {e}]")
         else:
@@ -215,61 +413,57 @@ class UsStockDataUpdater(UsStockDataManager):
         logging.info(f"[SAVE][{item}][{datetime2str(start_timestamp)} ~ {datetime2str(end_timestamp)}]")
         
         price_df = self.get_item_df(item=price_type, method="by_date", start_timestamp=start_timestamp, end_timestamp=end_timestamp)
+        price_df = price_df.loc[:, price_df.columns.notna()]
         
-        # 取得股價調整因子，因須計算當日股利報酬，使用forward法可還原當日股價
-        adjust_factor_df = self.get_stock_adjust_factor_df(start_timestamp=start_timestamp, end_timestamp=end_timestamp, method="forward")        
+        # 取得股價調整因子，因須計算當日股利報酬，使用forward法可還原當日股價（對齊股價的日期與 ticker）
+        adjust_factor_values = self._get_adjust_factor_df_by_dates(price_df.index, tickers=list(price_df.columns), method="forward").to_numpy(dtype=np.float64)
         
         # 取得股利資料並過濾非交易日的數據（少部分特殊ticker假日發股利，這種情況當作沒發，否則會導致return出現Nan）
         dividends_df = self.get_item_df(item="ex_dividend", method="by_date", start_timestamp=start_timestamp, end_timestamp=end_timestamp)
-        dividends_df = dividends_df.reindex(price_df.index).fillna(0)  # 確保索引對齊
-        dividends_ret_df = (dividends_df / price_df).fillna(0)
-        
-        # 對股價進行調整
-        adjust_ticker_list = price_df.columns.intersection(adjust_factor_df.columns)
-        price_df[adjust_ticker_list] *= adjust_factor_df[adjust_ticker_list]
-
-        # 計算日報酬
-        return_df = price_df.pct_change().add(dividends_ret_df, fill_value=0)
-
-        # 過濾無效數據
-        return_df = return_df.mask(price_df.isna())
-
-        # 移除第一行，因為 pct_change 的結果為 NaN
-        return_df = return_df.iloc[1:]
-
-        # 初始化 data_list
-        data_list = []
+        dividend_values = dividends_df.reindex(index=price_df.index, columns=price_df.columns).fillna(0).to_numpy(dtype=np.float64)
         
-        # 設置創建時間戳
-        created_timestamp = datetime.now(timezone.utc)
+        return_values = self._compute_daily_return_values(price_df.to_numpy(dtype=np.float64), adjust_factor_values, dividend_values)
+        # 第一列為計算基準（前一次已更新的日期），不寫入
+        return_df = pd.DataFrame(return_values, index=price_df.index[1:], columns=price_df.columns)
         
-        # 逐行處理 return_df
-        for date in return_df.index:
-            # 提取當日的 Series，移除 NaN 值
-            return_series = return_df.loc[date].dropna()
-            
-            # 移除索引為 NaN 的情況（來自資料異常）
-            return_series = return_series[return_series.index.notna()]
-            
-            if not return_series.empty:
-                # 添加到 data_list 中
-                data_list.append({
-                    "data_timestamp": date,  # 假設索引已為 datetime 格式，否則需要轉換
-                    "created_timestamp": created_timestamp,
-                    "values": return_series.to_dict()  # 將 Series 轉為字典
-                })
+        # 以向量化方式轉為逐日文件
+        data_list = item_df_to_document_list(return_df, created_timestamp=datetime.now(timezone.utc))
         
         # 儲存資料至資料庫
         if data_list:
             dao_instance = self._get_dao_instance(item)
             try:
-                dao_instance.insert_many(data_list, unique_key="data_timestamp")
+                dao_instance.bulk_upsert(data_list, key="data_timestamp")
                 logging.info(f"[SAVE][{item}][成功儲存 {len(data_list)} 筆資料]")
             except Exception as e:
                 logging.error(f"[SAVE][{item}][資料儲存失敗: {e}]")
+            
+            self._sync_ticker_major_layout([item], return_df.index.min(), return_df.index.max())
         else:
             logging.info(f"[SAVE][{item}][資料源返回空值，無資料更新，建議檢查資料源是否正常]")
     
+    @staticmethod
+    def _compute_daily_return_values(price_values, adjust_factor_values, dividend_values):
+        """
+        以單次 NumPy 運算計算 (T x N) 日報酬矩陣（第 0 列為基準日，返回 (T-1) x N）：
+        - 調整後股價 = 股價 x forward 調整因子，各 ticker 以最後一個有效的調整後股價作為前一日股價（停牌日不中斷報酬）
+        - 日報酬 = 調整後股價 / 前一有效調整後股價 - 1 + 當日股利 / 當日股價（無前一有效股價者，價格報酬視為 0）
+        - 當日股價缺值者，報酬為 NaN
+        """
+        adjusted_price_values = price_values * adjust_factor_values
+        is_valid = ~np.isnan(adjusted_price_values)
+        
+        # 各列各 ticker 最後一個有效值的列位置（向前填補）
+        row_count, ticker_count = adjusted_price_values.shape
+        last_valid_rows = np.maximum.accumulate(np.where(is_valid, np.arange(row_count)[:, np.newaxis], 0), axis=0)
+        last_adjusted_price_values = adjusted_price_values[last_valid_rows, np.arange(ticker_count)]
+        
+        with np.errstate(divide="ignore", invalid="ignore"):
+            price_return_values = adjusted_price_values[1:] / last_adjusted_price_values[:-1] - 1
+            return_values = np.nan_to_num(price_return_values, nan=0.0, posinf=np.inf, neginf=-np.inf) + dividend_values[1:] / price_values[1:]
+        return_values[~is_valid[1:]] = np.nan
+        return return_values
+    
     def update_stock_universe_ticker(self, item, start_timestamp=None, end_timestamp=None, source="polygon"):
         if start_timestamp is None:
             start_timestamp = self.get_latest_data_date(item=item)
@@ -296,6 +490,7 @@ class UsStockDataUpdater(UsStockDataManager):
         
         # 僅讀取交易日的universe data，並存入資料庫
         current_timestamp = datetime.now(timezone.utc)
+        data_list = []
         for data_timestamp in trade_date_list:
             date_str = datetime2str(data_timestamp)
             if date_str not in data_dict:
@@ -306,117 +501,154 @@ class UsStockDataUpdater(UsStockDataManager):
             meta_data = {"data_timestamp": data_timestamp,
                         "created_timestamp": current_timestamp,
                         "values": ticker_list}
-            
-            dao_instance = self._get_dao_instance(item)
-            dao_instance.insert_one(meta_data, unique_key="data_timestamp")
+            data_list.append(meta_data)
             logging.info(f"[SAVE][{item}][{date_str}][{len(ticker_list)}]")
+        
+        # 一次批次寫入（重複執行同一日期時覆寫既有資料）
+        if data_list:
+            dao_instance = self._get_dao_instance(item)
+            dao_instance.bulk_upsert(data_list, key="data_timestamp")
             
     
     # 儲存流通股數（已與舊資料校驗，函數功能正常，然而polygon shares資料品質較差，經常更動（主要是小型股，spx500偶爾也有），須定期用BBG刷新）
     def update_stock_shares_outstanding(self, start_timestamp=None, end_timestamp=None, source="polygon"):
+        """
+        更新流通股數：因polygon須依據ticker逐一抓取股數，僅在每月最後一交易日重新抓取，其他日則依據前一日股數，參考split調整。
+        整段範圍的前日股數、split資料與交易日曆皆僅載入一次，各段期間以 split 因子累乘一次推算，最後一次寫入。
+        """
         if start_timestamp == None:
             latest_data_timestamp = self.get_latest_data_date("shares_outstanding")
-            start_timestamp = datetime2str(latest_data_timestamp + timedelta(days=1))
+            start_timestamp = latest_data_timestamp + timedelta(days=1)
 
         if end_timestamp == None:
             end_timestamp = TODAY_DATE_STR
+        
+        start_timestamp = self._parse_datetime(start_timestamp)
+        end_timestamp = self._parse_datetime(end_timestamp)
 
         # 若資料已更新至最新日期，則不需進行更新
         current_timestamp = datetime.now()
-        if current_timestamp - latest_data_timestamp <= timedelta(days=1):
-            logging.info(f"[SAVE][shares_outstanding][資料已更新至最新日期({datetime2str(latest_data_timestamp)})，不需進行更新]")
+        if current_timestamp - start_timestamp < timedelta(days=1):
+            logging.info(f"[SAVE][shares_outstanding][資料已更新至最新日期({datetime2str(start_timestamp - timedelta(days=1))})，不需進行更新]")
             return
         
-        logging.info("[SAVE][shares_outstanding][{start_timestamp} ~ {end_timestamp}]".format(start_timestamp=start_timestamp, end_timestamp=end_timestamp))
         if source != "polygon":
             raise ValueError("[SAVE][shares_outstanding][不支持的來源: {source}]".format(source=source))
         
-        # 因polygon須依據ticker逐一抓取股數，若每日更新較為費時，故僅在每月最後一日重新抓取
-        # 其他日則依據前一日股數，參考split調整
-        trade_date_list = self.get_trade_date_list(start_timestamp=start_timestamp, end_timestamp=end_timestamp)
+        trade_calendar = self.get_trade_calendar()
+        trade_date_index = pd.DatetimeIndex(trade_calendar.get_trade_date_list(start_timestamp, end_timestamp))
+        if trade_date_index.empty:
+            logging.info(f"[SAVE][shares_outstanding][{datetime2str(start_timestamp)} ~ {datetime2str(end_timestamp)}][範圍內無交易日]")
+            return
         
         logging.info(f"[SAVE][shares_outstanding][{datetime2str(start_timestamp)} ~ {datetime2str(end_timestamp)}]")
         
-        # 設置創建時間戳
-        current_timestamp = datetime.now(timezone.utc)
-        data_list = list()
-        for timestamp in trade_date_list:
-            # 取得該日的上一交易日與下一交易日
-            last_trade_date = self.get_closest_trade_date(timestamp=timestamp, direction="last", cal_self=False)
-            next_trade_date = self.get_closest_trade_date(timestamp=timestamp, direction="next", cal_self=False)
-
-            # 判斷是否為該月最後一交易日（用於判斷是否重新下載股數資料，或者僅用stock split推算）
-            if_last_trade_date_of_the_moth = False
-            if timestamp.month != next_trade_date.month:
-                if_last_trade_date_of_the_moth = True
-            
-            # 取得該日的上一交易日之流通股數資料
-            last_date_shares_series = self.get_item_df(item="shares_outstanding", method="by_num", end_timestamp=last_trade_date, num=1).squeeze(axis=0)
-            # 取得split資料（須設定axis為0，否則當日僅有一檔標的split時，ticker會消失，降維成純量）
-            stock_splits_series = self.get_item_df(item="stock_split", method="by_num", end_timestamp=timestamp, num=1).squeeze(axis=0)
+        # 一次載入：起始日之前最近一日的股數（推算基礎）、範圍內（含前一交易日）的split資料
+        base_shares_df = self.get_item_df(item="shares_outstanding", method="by_num", end_timestamp=trade_date_index[0] - timedelta(days=1), num=1)
+        if base_shares_df.empty:
+            logging.error("[SAVE][shares_outstanding][無前日股數資料，無法推算]")
+            return
+        shares_series = base_shares_df.iloc[-1].dropna()
+        
+        previous_trade_date = self._get_previous_trade_date(trade_calendar, trade_date_index[0])
+        stock_splits_df = self.get_item_df(item="stock_split", method="by_date", start_timestamp=previous_trade_date, end_timestamp=trade_date_index[-1])
+        
+        # 依月底最後一交易日切分區段，每段以 split 因子累乘推算，月底再以 polygon 資料重新設定推算基礎
+        month_end_flags = self._get_month_end_flags(trade_calendar, trade_date_index)
+        segment_end_positions = list(np.nonzero(month_end_flags)[0]) + ([len(trade_date_index) - 1] if not month_end_flags[-1] else [])
+        
+        data_list = []
+        created_timestamp = datetime.now(timezone.utc)
+        segment_start_position = 0
+        for segment_end_position in segment_end_positions:
+            segment_date_index = trade_date_index[segment_start_position:segment_end_position + 1]
+            split_factor_values = stock_splits_df.reindex(index=segment_date_index, columns=shares_series.index).to_numpy(dtype=np.float64)
+            split_factor_values[np.isnan(split_factor_values) | (split_factor_values == 0)] = 1
+            segment_shares_df = pd.DataFrame(shares_series.to_numpy(dtype=np.float64) * np.cumprod(split_factor_values, axis=0),
+                                             index=segment_date_index, columns=shares_series.index)
             
-            # 若當日非月底最後一交易日，則依據前一日股數，參考split調整
-            if if_last_trade_date_of_the_moth == False:
-                shares_series = last_date_shares_series.copy(deep=True)
-                adjusted_shares_series = (last_date_shares_series * stock_splits_series).dropna()
-                shares_series.update(adjusted_shares_series)                        
-                logging.info("[SAVE][shares_outstanding][{date}][流通股數計算完成（依據前日基礎計算）]".format(date=datetime2str(timestamp)))
-                
-            # 月底最後一交易日，重新抓取（減少計算量）
+            if month_end_flags[segment_end_position]:
+                # 月底最後一交易日：重新下載股數（最後一列改以下載資料為主）
+                month_end_timestamp = segment_date_index[-1].to_pydatetime()
+                data_list += item_df_to_document_list(segment_shares_df.iloc[:-1], created_timestamp=created_timestamp)
+                rolled_shares_series = segment_shares_df.iloc[-1]
+                shares_series = self._get_month_end_shares_series(trade_calendar, month_end_timestamp, rolled_shares_series, stock_splits_df)
+                self._log_shares_change(month_end_timestamp, shares_series, rolled_shares_series)
+                data_list.append({"data_timestamp": month_end_timestamp, "created_timestamp": created_timestamp, "values": shares_series.to_dict()})
             else:
-                logging.info("[NOTE][shares_outstanding][本日是本月最後一交易日，須重新更新股數計算基礎]")
-                # 取得最新一筆美股所有上市公司清單
-                univ_us_ticker_list = self.get_latest_universe_tickers(universe_item="univ_us_stock")
-                
-                # 因polygon流通股數資料，通常會延遲1~2日反應split調整，若直接下載當日數據會出錯，故若重新下載日之前2日，該股曾進行split，則該股不重新下載，改回依據前日股數參考split調整
-                recent_splits_df = self.get_item_df(item="stock_split", method="by_num", end_timestamp=timestamp, num=2)
-                recent_splits_ticker_list = list(recent_splits_df.columns)
-                target_ticker_list = sorted(list(set(univ_us_ticker_list) - set(recent_splits_ticker_list)))                
-                
-                # 下載流通股數資料（polygon）
-                data_dict = save_stock_shares_outstanding_from_Polygon(API_key=self.polygon_API_key, ticker_list=target_ticker_list, start_timestamp=timestamp, end_timestamp=timestamp)
-                shares_series = pd.Series(data_dict[datetime2str(timestamp)])
-                
-                # 取得缺漏標的：近日有作split + polygon資料源缺漏
-                lost_ticker_set = set(univ_us_ticker_list) - set(list(shares_series.index))
-                # 在缺漏標的中，過濾出昨日即有股數資料的標的
-                lost_ticker_list = list(lost_ticker_set.intersection(last_date_shares_series.index))
-
-                # 針對缺漏的標的，改為依據前一日股數，參考split調整（即依照一般日算法）
-                lost_ticker_shares_series = last_date_shares_series[lost_ticker_list]
-                lost_ticker_shares_series.update((lost_ticker_shares_series * stock_splits_series).dropna())
-
-                # 將缺漏標的資料，併入polygon重新下載而得的資料
-                shares_series = pd.concat([shares_series, lost_ticker_shares_series]).sort_index()
-                logging.info("[SAVE][shares_outstanding][{date}][流通股數計算完成（重新下載更新）]".format(date=datetime2str(timestamp)))
+                data_list += item_df_to_document_list(segment_shares_df, created_timestamp=created_timestamp)
+                shares_series = segment_shares_df.iloc[-1].dropna()
             
-            # 檢查變動的股數資料，並打印
-            common_ticker_list = list(set(shares_series.index).intersection(last_date_shares_series.index))
-            share_change_series = shares_series[common_ticker_list] / last_date_shares_series[common_ticker_list]
-            share_change_series = share_change_series[share_change_series != 1]
-            
-            if not share_change_series.empty:
-                logging.info("[NOTE][shares_outstanding][{date}][本日流通股數變化如下：本日股數/前日股數]".format(date=datetime2str(timestamp)))
-                logging.info(dict(share_change_series))
-            
-            # 檢查新增的標的，並打印
-            new_ticker_list = list(set(shares_series.index) - set(common_ticker_list))
-            if len(new_ticker_list) > 0:
-                logging.info("[NOTE][shares_outstanding][{date}][本日新增標的如下]".format(date=datetime2str(timestamp)))
-                logging.info(new_ticker_list)
-                
-            # 將資料轉換為列表格式，並添加至 data_list，準備儲存
-            data_list.append(
-                {"data_timestamp": timestamp,
-                "created_timestamp": current_timestamp,
-                "values": shares_series.to_dict()
-            })
+            segment_start_position = segment_end_position + 1
         
-        # 儲存資料至資料庫
+        # 儲存資料至資料庫（單次批次寫入）
         if data_list:
             dao_instance = self._get_dao_instance("shares_outstanding")
             try:
-                dao_instance.insert_many(data_list, unique_key="data_timestamp")
+                dao_instance.bulk_upsert(data_list, key="data_timestamp")
                 logging.info(f"[SAVE][shares_outstanding][成功儲存 {len(data_list)} 筆資料]")
             except Exception as e:
-                logging.error(f"[SAVE][shares_outstanding][資料儲存失敗: {e}]")
\ No newline at end of file
+                logging.error(f"[SAVE][shares_outstanding][資料儲存失敗: {e}]")
+                return
+            self._sync_ticker_major_layout(["shares_outstanding"], trade_date_index[0], trade_date_index[-1])
+    
+    @staticmethod
+    def _get_previous_trade_date(trade_calendar, timestamp):
+        """取得前一交易日（超出交易日曆範圍時以前一個週間日代替）"""
+        try:
+            return trade_calendar.shift_trade_date(timestamp, -1)
+        except ValueError:
+            return (pd.Timestamp(timestamp) - pd.offsets.BDay(1)).to_pydatetime()
+    
+    @staticmethod
+    def _get_month_end_flags(trade_calendar, trade_date_index):
+        """判斷各交易日是否為該月最後一交易日（下一交易日超出交易日曆範圍時，以下一個週間日判斷）"""
+        trade_date_values = trade_calendar.trade_dates.values
+        next_positions = np.searchsorted(trade_date_values, trade_date_index.as_unit("ns").values, side="right")
+        next_trade_date_index = pd.DatetimeIndex(np.where(next_positions < len(trade_date_values),
+                                                          trade_date_values[np.minimum(next_positions, len(trade_date_values) - 1)],
+                                                          (trade_date_index + pd.offsets.BDay(1)).as_unit("ns").values))
+        return np.asarray(next_trade_date_index.month != trade_date_index.month)
+    
+    def _get_month_end_shares_series(self, trade_calendar, timestamp, rolled_shares_series, stock_splits_df):
+        """
+        月底最後一交易日：自 polygon 重新下載美股上市公司的流通股數，下載缺漏的標的則沿用依 split 推算的股數。
+        """
+        logging.info("[NOTE][shares_outstanding][本日是本月最後一交易日，須重新更新股數計算基礎]")
+        # 取得該日的美股所有上市公司清單（point-in-time，無資料時改用最新一筆）
+        univ_dao = self._get_dao_instance("univ_us_stock")
+        univ_us_ticker_list = univ_dao.get_membership(timestamp - timedelta(days=31), timestamp).members_on(timestamp)
+        if not univ_us_ticker_list:
+            univ_us_ticker_list = self.get_latest_universe_tickers(universe_item="univ_us_stock")
+        
+        # 因polygon流通股數資料，通常會延遲1~2日反應split調整，若直接下載當日數據會出錯，故若重新下載日之前2日，該股曾進行split，則該股不重新下載，改回依據前日股數參考split調整
+        previous_trade_date = self._get_previous_trade_date(trade_calendar, timestamp)
+        recent_splits_df = stock_splits_df.loc[(stock_splits_df.index >= previous_trade_date) & (stock_splits_df.index <= timestamp)]
+        recent_splits_ticker_list = list(recent_splits_df.columns[recent_splits_df.notna().any(axis=0)])
+        target_ticker_list = sorted(list(set(univ_us_ticker_list) - set(recent_splits_ticker_list)))
+        
+        # 下載流通股數資料（polygon）
+        data_dict = save_stock_shares_outstanding_from_Polygon(API_key=self.polygon_API_key, ticker_list=target_ticker_list, start_date=timestamp, end_date=timestamp)
+        shares_series = pd.Series(data_dict.get(datetime2str(timestamp), {}), dtype=np.float64).dropna()
+        
+        # 取得缺漏標的（近日有作split + polygon資料源缺漏），其中前日即有股數資料者，改為依據前一日股數參考split調整
+        lost_ticker_list = sorted(set(univ_us_ticker_list) - set(shares_series.index))
+        lost_ticker_shares_series = rolled_shares_series.reindex(lost_ticker_list).dropna()
+        
+        logging.info("[SAVE][shares_outstanding][{date}][流通股數計算完成（重新下載更新）]".format(date=datetime2str(timestamp)))
+        return pd.concat([shares_series, lost_ticker_shares_series]).sort_index()
+    
+    @staticmethod
+    def _log_shares_change(timestamp, shares_series, last_shares_series):
+        """打印重新下載後股數有變動的標的（本日股數/前日推算股數）與新增的標的"""
+        common_ticker_list = shares_series.index.intersection(last_shares_series.dropna().index)
+        share_change_series = shares_series[common_ticker_list] / last_shares_series[common_ticker_list]
+        share_change_series = share_change_series[share_change_series != 1]
+        if not share_change_series.empty:
+            logging.info("[NOTE][shares_outstanding][{date}][本日流通股數變化如下：本日股數/前日股數]".format(date=datetime2str(timestamp)))
+            logging.info(dict(share_change_series))
+        
+        new_ticker_list = list(shares_series.index.difference(common_ticker_list))
+        if len(new_ticker_list) > 0:
+            logging.info("[NOTE][shares_outstanding][{date}][本日新增標的如下]".format(date=datetime2str(timestamp)))
+            logging.info(new_ticker_list)
\ No newline at end of file
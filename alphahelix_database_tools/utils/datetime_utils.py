@@ -27,6 +27,12 @@ def datetime2str(date):
 # 將本日的日期以字串形式表達，方便調用
 TODAY_DATE_STR = datetime2str(datetime.today())
 
+# 轉換為 numpy datetime64[ns]（供 np.searchsorted 使用），超出 ns 可表示範圍的日期（如 9999-12-31）以邊界值代替
+def datetime2datetime64(date):
+    timestamp = pd.Timestamp(str2datetime(date)).tz_localize(None)
+    timestamp = min(max(timestamp, pd.Timestamp.min), pd.Timestamp.max)
+    return timestamp.as_unit("ns").to_datetime64()
+
 def str2datetime_list(strdate_list):
     return list(map(lambda x:str2datetime(x), strdate_list))
 
@@ -1,4 +1,7 @@
 import re
+from datetime import datetime
+from typing import List
+import numpy as np
 import pandas as pd
 
 # 将dict标准化key（避免LLM随即性导致key不一致）
@@ -76,4 +79,27 @@ def combine_dict(dict1, dict2):
             merged_dict[key].update(value)
         else:
             merged_dict[key] = value
-    return merged_dict
\ No newline at end of file
+    return merged_dict
+
+# 將數值 df（index 為日期，columns 為 ticker）轉為逐日文件列表 [{"data_timestamp", "created_timestamp", "values": {ticker: value}}]
+# 以 np.nonzero 一次取出所有有效值（排除 NaN 值與 NaN ticker），再依列切片組成 dict，不需逐列呼叫 dropna / to_dict
+def item_df_to_document_list(item_df: pd.DataFrame, created_timestamp: datetime) -> List[dict]:
+    values = item_df.to_numpy(dtype=np.float64)
+    is_valid = ~np.isnan(values) & np.asarray(item_df.columns.notna())[np.newaxis, :]
+    
+    row_indices, column_indices = np.nonzero(is_valid)
+    flat_tickers = np.asarray(item_df.columns, dtype=object)[column_indices].tolist()
+    flat_values = values[row_indices, column_indices].tolist()
+    row_boundaries = np.searchsorted(row_indices, np.arange(len(item_df) + 1))
+    
+    document_list = []
+    for i, data_timestamp in enumerate(item_df.index):
+        start, end = row_boundaries[i], row_boundaries[i+1]
+        if start == end:
+            continue
+        document_list.append({
+            "data_timestamp": data_timestamp,
+            "created_timestamp": created_timestamp,
+            "values": dict(zip(flat_tickers[start:end], flat_values[start:end])),
+        })
+    return document_list
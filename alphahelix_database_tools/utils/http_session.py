@@ -0,0 +1,85 @@
+import logging
+import threading
+import weakref
+from typing import Dict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 預設逾時（連線逾時, 讀取逾時），呼叫時可另行指定
+DEFAULT_TIMEOUT = (5, 30)
+# 每個 host 的連線池大小（同時連線數上限，超過時等待而非另開連線）
+DEFAULT_POOL_MAXSIZE = 10
+# 保留連線池的 host 數（超過時最久未使用的 host 連線池將被關閉）
+DEFAULT_POOL_HOST_NUM = 32
+
+class HttpSession(requests.Session):
+    """
+    共用的 HTTP session：以連線池重複使用 TCP / TLS 連線（keep-alive），預設要求 gzip 壓縮並套用逾時。
+    requests.Session（cookie、連線統計等狀態）並非執行緒安全，須經由 get_http_session 取得各執行緒各自的 session。
+    """
+    def __init__(self, timeout=DEFAULT_TIMEOUT, pool_maxsize: int = DEFAULT_POOL_MAXSIZE, pool_host_num: int = DEFAULT_POOL_HOST_NUM):
+        super().__init__()
+        self.timeout = timeout
+        self.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+        # pool_block=True：同一 host 的連線數達上限時等待可用連線（限制單一 host 的連線數）
+        adapter = HTTPAdapter(pool_connections=pool_host_num, pool_maxsize=pool_maxsize, pool_block=True)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+    def get_connection_stats(self) -> Dict[str, dict]:
+        """
+        取得各 host 的連線重複使用統計：
+        {host: {"requests": 請求數, "connections": 建立的連線數（即 TCP / TLS 握手次數）, "reused_requests": 重複使用連線的請求數}}
+        """
+        stats = {}
+        for adapter in {id(adapter): adapter for adapter in self.adapters.values()}.values():
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host_stats = stats.setdefault(pool.host, {"requests": 0, "connections": 0})
+                host_stats["requests"] += pool.num_requests
+                host_stats["connections"] += pool.num_connections
+
+        for host_stats in stats.values():
+            host_stats["reused_requests"] = max(host_stats["requests"] - host_stats["connections"], 0)
+        return stats
+
+# 每個執行緒各自的 session（同一執行緒內的請求共用連線池），並記錄全部 session 以彙總連線統計（執行緒結束後自動移除）
+_thread_local = threading.local()
+_session_set = weakref.WeakSet()
+_session_set_lock = threading.Lock()
+
+def get_http_session() -> HttpSession:
+    """取得目前執行緒共用的 HttpSession（各執行緒首次呼叫時建立）"""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = _thread_local.session = HttpSession()
+        with _session_set_lock:
+            _session_set.add(session)
+    return session
+
+def get_http_session_stats() -> Dict[str, dict]:
+    """彙總各執行緒 session 的連線統計（格式同 HttpSession.get_connection_stats）"""
+    with _session_set_lock:
+        session_list = list(_session_set)
+    
+    stats = {}
+    for session in session_list:
+        for host, host_stats in session.get_connection_stats().items():
+            merged_stats = stats.setdefault(host, {"requests": 0, "connections": 0, "reused_requests": 0})
+            for key in merged_stats:
+                merged_stats[key] += host_stats[key]
+    return stats
+
+def log_http_session_stats() -> None:
+    """記錄各執行緒 session 彙總後各 host 的連線重複使用情形"""
+    for host, host_stats in get_http_session_stats().items():
+        logging.info(f"[HTTP][{host}][請求數={host_stats['requests']}][建立連線數={host_stats['connections']}][重複使用連線的請求數={host_stats['reused_requests']}]")
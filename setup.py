@@ -68,6 +68,7 @@ setup(
         "psutil==6.0.0",
         "ptyprocess==0.7.0",
         "pure-eval==0.2.2",
+        "pyarrow==16.1.0",
         "pyasn1==0.6.0",
         "pyasn1_modules==0.4.0",
         "pydantic==2.7.4",
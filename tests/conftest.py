@@ -0,0 +1,34 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from alphahelix_database_tools.us_stock_database.data_model.client_registry import MongoClientRegistry
+
+TEST_URI = "mongodb://localhost:27017/"
+
+@pytest.fixture
+def mongo_client(monkeypatch):
+    """以 mongomock 取代共用連線池（所有 DAO / Manager 皆取得同一個記憶體內的 client）"""
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(MongoClientRegistry, "acquire", classmethod(lambda cls, uri, max_pool_size=None: client))
+    monkeypatch.setattr(MongoClientRegistry, "release", classmethod(lambda cls, uri: None))
+    return client
+
+def insert_market_status(client, start_timestamp, end_timestamp):
+    """寫入交易日曆（週一至週五為交易日）"""
+    client["Reference"]["market_status"].insert_many([
+        {"data_timestamp": timestamp.to_pydatetime(), "values": 1 if timestamp.weekday() < 5 else 0}
+        for timestamp in pd.date_range(start_timestamp, end_timestamp)
+    ])
+
+@pytest.fixture
+def updater(mongo_client):
+    from alphahelix_database_tools.us_stock_database.data_updater import UsStockDataUpdater
+
+    insert_market_status(mongo_client, datetime(2023, 1, 1), datetime(2024, 12, 31))
+    updater = UsStockDataUpdater("user", "password")
+    yield updater
+    updater.close()
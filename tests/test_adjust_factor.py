@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+QUERY_LIST = [(start_timestamp, end_timestamp, method)
+              for start_timestamp, end_timestamp in [("2023-03-01", "2023-09-30"), ("2024-01-01", "2024-12-31"), ("2023-01-01", "2024-12-31")]
+              for method in ["forward", "backward"]]
+
+@pytest.fixture
+def split_documents(updater):
+    rng = np.random.default_rng(1)
+    trade_date_index = pd.bdate_range("2023-01-02", "2024-12-31")
+    split_dict = {}
+    for _ in range(40):
+        timestamp = trade_date_index[rng.integers(len(trade_date_index))].to_pydatetime()
+        split_dict.setdefault(timestamp, {})[f"T{rng.integers(15)}"] = float(rng.choice([2, 3, 0.5, 0.1]))
+    split_documents = [{"data_timestamp": timestamp, "values": values} for timestamp, values in sorted(split_dict.items())]
+    updater._get_dao_instance("stock_split").bulk_upsert(split_documents)
+    return split_documents
+
+def _get_baseline_df(updater, start_timestamp, end_timestamp, method):
+    """以 stock_split 資料即時計算的調整因子（稀疏調整因子建立前的計算方式）"""
+    trade_date_list = updater.get_trade_date_list(start_timestamp=start_timestamp, end_timestamp=end_timestamp)
+    stock_splits_df = updater.get_item_df(item="stock_split", method="by_date", start_timestamp=min(trade_date_list), end_timestamp=max(trade_date_list))
+    return updater._cal_stock_adjust_factor_df(stock_splits_df, date_list=trade_date_list, method=method)
+
+def _assert_matches_baseline(updater):
+    for start_timestamp, end_timestamp, method in QUERY_LIST:
+        adjust_factor_df = updater.get_stock_adjust_factor_df(start_timestamp, end_timestamp, method)
+        baseline_df = _get_baseline_df(updater, start_timestamp, end_timestamp, method)
+        assert list(adjust_factor_df.columns) == list(baseline_df.columns)
+        assert (adjust_factor_df.index == baseline_df.index).all()
+        np.testing.assert_allclose(adjust_factor_df.to_numpy(dtype=float), baseline_df.to_numpy(dtype=float))
+
+def test_rebuilt_store_matches_baseline(updater, split_documents):
+    updater.update_stock_adjust_factor()
+    assert updater._get_dao_instance("adjust_factor").is_bootstrapped()
+    _assert_matches_baseline(updater)
+
+def test_incremental_apply_matches_baseline(updater, split_documents):
+    adjust_factor_dao = updater._get_dao_instance("adjust_factor")
+    adjust_factor_dao.rebuild(split_documents[:20])
+    adjust_factor_dao.apply_split_documents(split_documents[20:])
+    _assert_matches_baseline(updater)
+
+def test_apply_before_bootstrap_keeps_the_full_history_fallback(updater, split_documents):
+    adjust_factor_dao = updater._get_dao_instance("adjust_factor")
+
+    assert adjust_factor_dao.apply_split_documents(split_documents[-1:]) == 0
+    assert adjust_factor_dao.collection.count_documents({}) == 0
+    assert not adjust_factor_dao.is_bootstrapped()
+    _assert_matches_baseline(updater)
@@ -0,0 +1,36 @@
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+
+from conftest import insert_market_status
+
+def test_total_return_uses_dividends_as_of_the_same_time(mongo_client):
+    from alphahelix_database_tools.us_stock_database.data_manager import UsStockDataManager
+
+    insert_market_status(mongo_client, datetime(2024, 1, 1), datetime(2024, 1, 31))
+    with UsStockDataManager("user", "password", versioned_item_list=["close", "ex_dividend"]) as manager:
+        trade_date_index = pd.bdate_range("2024-01-01", periods=6)
+        manager._get_dao_instance("close").insert_many(
+            [{"data_timestamp": timestamp.to_pydatetime(), "values": {"B": 10.0}} for timestamp in trade_date_index], unique_key="data_timestamp")
+        manager._get_dao_instance("ex_dividend").insert_many(
+            [{"data_timestamp": trade_date_index[3].to_pydatetime(), "values": {"B": 1.0}}], unique_key="data_timestamp")
+        time.sleep(0.01)
+        as_of = datetime.now(timezone.utc).replace(tzinfo=None)
+        time.sleep(0.01)
+        manager._get_dao_instance("ex_dividend").insert_many(
+            [{"data_timestamp": trade_date_index[3].to_pydatetime(), "values": {"B": 3.0}}], unique_key="data_timestamp")
+
+        as_of_df = manager.get_item_df("close", "by_date", "2024-01-01", "2024-01-08", adjust="total_return", as_of=as_of)
+        latest_df = manager.get_item_df("close", "by_date", "2024-01-01", "2024-01-08", adjust="total_return")
+
+    assert as_of_df.iloc[0, 0] == pytest.approx(9.0)
+    assert latest_df.iloc[0, 0] == pytest.approx(7.0)
+
+def test_total_return_as_of_requires_versioned_dividends(mongo_client):
+    from alphahelix_database_tools.us_stock_database.data_manager import UsStockDataManager
+
+    with UsStockDataManager("user", "password", versioned_item_list=["close"]) as manager:
+        with pytest.raises(ValueError):
+            manager.get_item_df("close", "by_date", "2024-01-01", "2024-01-08", adjust="total_return", as_of=datetime(2024, 2, 1))
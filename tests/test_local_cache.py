@@ -0,0 +1,75 @@
+import os
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from alphahelix_database_tools.us_stock_database.data_model.priceVolume_data import CloseDAO
+from conftest import TEST_URI
+
+def _write_days(dao, start_timestamp, day_count, value_func):
+    dao.bulk_upsert([
+        {"data_timestamp": start_timestamp + timedelta(days=i), "values": {"A": value_func(i), "B": 1.0}}
+        for i in range(day_count)
+    ])
+    # created_timestamp 以毫秒儲存，間隔寫入以區分先後
+    time.sleep(0.01)
+
+@pytest.fixture
+def daos(mongo_client, tmp_path):
+    writer_dao, reference_dao = CloseDAO(TEST_URI), CloseDAO(TEST_URI)
+    cached_dao = CloseDAO(TEST_URI)
+    cached_dao.enable_local_cache(str(tmp_path))
+    _write_days(writer_dao, datetime(2023, 1, 1), 400, float)
+    return writer_dao, cached_dao, reference_dao
+
+def _assert_same_as_database(cached_dao, reference_dao, start_timestamp, end_timestamp):
+    pd.testing.assert_frame_equal(cached_dao.get_item_df_by_datetime(start_timestamp, end_timestamp),
+                                  reference_dao.get_item_df_by_datetime(start_timestamp, end_timestamp), check_freq=False)
+
+def test_cold_cache_fetches_only_the_query_window(daos):
+    _, cached_dao, reference_dao = daos
+    _assert_same_as_database(cached_dao, reference_dao, datetime(2023, 3, 1), datetime(2023, 3, 31))
+
+    assert len(cached_dao.local_cache.read()) == 31
+    assert cached_dao.local_cache.get_synced_start() == datetime(2023, 3, 1)
+    assert cached_dao.local_cache.get_synced_end() == datetime(2023, 3, 31)
+
+def test_cache_extends_the_synced_range_at_both_ends(daos):
+    _, cached_dao, reference_dao = daos
+    _assert_same_as_database(cached_dao, reference_dao, datetime(2023, 3, 1), datetime(2023, 3, 31))
+    _assert_same_as_database(cached_dao, reference_dao, datetime(2023, 2, 1), datetime(2023, 4, 30))
+
+    assert len(cached_dao.local_cache.read()) == 89
+    assert cached_dao.local_cache.get_synced_start() == datetime(2023, 2, 1)
+    assert cached_dao.local_cache.get_synced_end() == datetime(2023, 4, 30)
+
+def test_cache_reloads_dates_rewritten_after_the_last_sync(daos):
+    writer_dao, cached_dao, reference_dao = daos
+    _assert_same_as_database(cached_dao, reference_dao, datetime(2023, 2, 1), datetime(2023, 4, 30))
+
+    writer_dao.bulk_upsert([{"data_timestamp": datetime(2023, 3, 5), "values": {"A": -1.0}}])
+    time.sleep(0.01)
+    _assert_same_as_database(cached_dao, reference_dao, datetime(2023, 2, 1), datetime(2023, 4, 30))
+    assert cached_dao.local_cache.read(datetime(2023, 3, 5), datetime(2023, 3, 5))["A"].tolist() == [-1.0]
+
+def test_by_num_query_tracks_the_latest_dates(daos):
+    writer_dao, cached_dao, reference_dao = daos
+    _assert_same_as_database(cached_dao, reference_dao, datetime(2023, 1, 1), datetime(2024, 12, 31))
+    _write_days(writer_dao, datetime(2025, 3, 1), 3, lambda i: 9.0)
+
+    pd.testing.assert_frame_equal(cached_dao.get_item_df_by_num(5), reference_dao.get_item_df_by_num(5))
+    assert cached_dao.local_cache.get_synced_end() is None
+
+    _write_days(writer_dao, datetime(2025, 3, 4), 1, lambda i: 4.5)
+    pd.testing.assert_frame_equal(cached_dao.get_item_df_by_num(5), reference_dao.get_item_df_by_num(5))
+
+def test_meta_file_is_replaced_atomically(daos):
+    _, cached_dao, _ = daos
+    cached_dao.local_cache.set_synced_start(datetime(2023, 1, 1))
+
+    assert cached_dao.local_cache.get_synced_start() == datetime(2023, 1, 1)
+    assert [file_name for file_name in os.listdir(cached_dao.local_cache.folder_path) if file_name.endswith(".tmp")] == []
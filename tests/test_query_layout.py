@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+START_TIMESTAMP, END_TIMESTAMP = datetime(2023, 12, 1), datetime(2024, 2, 29)
+
+def _write_close(updater, start_timestamp, end_timestamp, value):
+    updater._get_dao_instance("close").bulk_upsert([
+        {"data_timestamp": timestamp.to_pydatetime(), "values": {"A": value, "B": 2.0}}
+        for timestamp in pd.bdate_range(start_timestamp, end_timestamp)
+    ])
+
+@pytest.fixture
+def layout_updater(updater):
+    _write_close(updater, START_TIMESTAMP, END_TIMESTAMP, 1.0)
+    updater.update_stock_ticker_major_layout("close")
+    return updater
+
+def _plan(updater, tickers, start_timestamp=START_TIMESTAMP):
+    return updater._plan_query_layout("close", "by_date", start_timestamp, END_TIMESTAMP, tickers)
+
+def test_planner_picks_layout_by_query_shape(layout_updater):
+    assert _plan(layout_updater, ["A"]) == "ticker_major"
+    assert _plan(layout_updater, [f"T{i}" for i in range(layout_updater.TICKER_MAJOR_MAX_TICKERS + 1)]) == "date_major"
+    assert _plan(layout_updater, ["A"], start_timestamp=datetime(2023, 11, 1)) == "date_major"
+
+def test_ticker_major_matches_date_major(layout_updater):
+    ticker_major_df = layout_updater.get_item_df("close", "by_date", START_TIMESTAMP, END_TIMESTAMP, tickers=["A", "B"])
+    date_major_df = layout_updater._get_dao_instance("close").get_item_df_by_datetime(START_TIMESTAMP, END_TIMESTAMP, tickers=["A", "B"])
+
+    pd.testing.assert_frame_equal(ticker_major_df, date_major_df, check_names=False, check_freq=False)
+
+def test_rewritten_years_are_rebuilt(layout_updater):
+    _write_close(layout_updater, datetime(2023, 12, 20), datetime(2024, 1, 10), 9.0)
+    layout_updater._sync_ticker_major_layout(["close"], datetime(2023, 12, 20), datetime(2024, 1, 10))
+
+    item_df = layout_updater._get_ticker_major_dao_instance("close").get_item_df_by_tickers(["A"], START_TIMESTAMP, END_TIMESTAMP)
+    assert item_df["A"].value_counts().to_dict() == {1.0: 49, 9.0: 16}
+
+def test_failed_sync_falls_back_to_date_major_until_rebuilt(layout_updater, monkeypatch):
+    ticker_major_dao = layout_updater._get_ticker_major_dao_instance("close")
+
+    def _raise(item, year):
+        raise RuntimeError("sync failed")
+    monkeypatch.setattr(layout_updater, "_rebuild_ticker_major_year", _raise)
+    _write_close(layout_updater, datetime(2023, 12, 20), datetime(2024, 1, 10), 9.0)
+    layout_updater._sync_ticker_major_layout(["close"], datetime(2023, 12, 20), datetime(2024, 1, 10))
+
+    assert not ticker_major_dao.is_synced()
+    assert _plan(layout_updater, ["A"]) == "date_major"
+    assert layout_updater.get_item_df("close", "by_date", datetime(2024, 1, 2), datetime(2024, 1, 2), tickers=["A"])["A"].tolist() == [9.0]
+
+    monkeypatch.delattr(layout_updater, "_rebuild_ticker_major_year")
+    layout_updater.update_stock_ticker_major_layout("close")
+
+    assert ticker_major_dao.is_synced()
+    assert _plan(layout_updater, ["A"]) == "ticker_major"
+    item_df = ticker_major_dao.get_item_df_by_tickers(["A"], START_TIMESTAMP, END_TIMESTAMP)
+    assert item_df["A"].value_counts().to_dict() == {1.0: 49, 9.0: 16}
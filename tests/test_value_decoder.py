@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from alphahelix_database_tools.us_stock_database.data_model.priceVolume_data import CloseDAO
+from conftest import TEST_URI
+
+def _make_documents():
+    rng = np.random.default_rng(0)
+    documents = []
+    for day in range(1, 21):
+        tickers = [f"T{i}" for i in rng.choice(30, size=20, replace=False)]
+        values = {ticker: (None if rng.random() < 0.1 else float(rng.normal())) for ticker in tickers}
+        documents.append({"data_timestamp": datetime(2024, 1, day), "values": values})
+    # 資料庫查詢多為日期降冪
+    return documents[::-1]
+
+@pytest.fixture
+def close_dao(mongo_client):
+    return CloseDAO(TEST_URI)
+
+@pytest.mark.parametrize("tickers", [None, ["T1", "T5", "T29", "UNKNOWN"]])
+def test_decoder_matches_dataframe_path(close_dao, tickers):
+    documents = _make_documents()
+    decoded_df = close_dao._decode_numeric_cursor(iter(documents), tickers=tickers)
+    baseline_df = close_dao._documents_to_item_df(documents, tickers=tickers).dropna(axis=1, how="all").astype(np.float64)
+
+    pd.testing.assert_frame_equal(decoded_df, baseline_df, check_names=False, check_column_type=False)
+
+def test_decoder_grows_past_initial_rows(close_dao):
+    documents = _make_documents()
+    decoded_df = close_dao._decode_numeric_cursor(iter(documents), limit=2)
+    assert len(decoded_df) == len(documents)
+
+def test_packed_and_dict_documents_decode_identically(mongo_client):
+    documents = _make_documents()
+    dict_dao = CloseDAO(TEST_URI)
+    dict_dao.bulk_upsert(documents[:10])
+    packed_dao = CloseDAO(TEST_URI)
+    packed_dao.enable_packed_encoding()
+    packed_dao.bulk_upsert(documents[10:])
+
+    item_df = dict_dao.get_item_df_by_datetime(datetime(2024, 1, 1), datetime(2024, 1, 31))
+    baseline_df = dict_dao._documents_to_item_df(documents).astype(np.float64)
+    pd.testing.assert_frame_equal(item_df, baseline_df.dropna(axis=1, how="all"), check_names=False, check_column_type=False)
+
+def test_non_numeric_values_fall_back_to_dataframe_path(close_dao):
+    documents = _make_documents()
+    documents[5] = {"data_timestamp": documents[5]["data_timestamp"], "values": {**documents[5]["values"], "T0": "n/a"}}
+
+    decoded_df = close_dao._decode_numeric_cursor(iter(documents))
+    baseline_df = close_dao._documents_to_item_df(documents)
+
+    assert decoded_df.loc[documents[5]["data_timestamp"], "T0"] == "n/a"
+    pd.testing.assert_frame_equal(decoded_df.astype(str), baseline_df.astype(str), check_names=False, check_column_type=False)
@@ -0,0 +1,56 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from alphahelix_database_tools.us_stock_database.data_model.priceVolume_data import SharesOutstandingDAO
+from conftest import TEST_URI
+
+def _utc_now():
+    # created_timestamp 以 UTC 寫入（讀出時不含時區）
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+@pytest.fixture
+def shares_dao(mongo_client):
+    dao = SharesOutstandingDAO(TEST_URI)
+    dao.insert_many([{"data_timestamp": datetime(2024, 1, day), "values": {"A": 1.0 * day, "B": 2.0 * day}} for day in range(1, 6)],
+                    unique_key="data_timestamp")
+    time.sleep(0.01)
+    return dao
+
+def test_enable_versioning_does_not_write(mongo_client, shares_dao):
+    shares_dao.enable_versioning()
+    assert "shares_outstanding_versions" not in mongo_client["PriceVolume"].list_collection_names()
+
+def test_as_of_returns_the_version_visible_at_that_time(shares_dao):
+    shares_dao.enable_versioning()
+    shares_dao.bootstrap_version_history()
+    as_of = _utc_now()
+    time.sleep(0.01)
+    shares_dao.insert_many([{"data_timestamp": datetime(2024, 1, day), "values": {"A": 100.0 * day, "C": 5.0}} for day in range(3, 8)],
+                           unique_key="data_timestamp")
+
+    start_timestamp, end_timestamp = datetime(2024, 1, 1), datetime(2024, 1, 31)
+    latest_df = shares_dao.get_item_df_by_datetime(start_timestamp, end_timestamp)
+    as_of_df = shares_dao.get_item_df_by_datetime(start_timestamp, end_timestamp, as_of=as_of)
+
+    assert latest_df["A"].tolist() == [1.0, 2.0, 300.0, 400.0, 500.0, 600.0, 700.0]
+    assert as_of_df["A"].tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert "C" not in as_of_df.columns
+    assert shares_dao.get_item_df_by_num(2, as_of=as_of, tickers=["B"])["B"].tolist() == [8.0, 10.0]
+
+def test_as_of_without_bootstrap_misses_earlier_history(shares_dao):
+    shares_dao.enable_versioning()
+    as_of = _utc_now()
+
+    assert shares_dao.get_item_df_by_datetime(datetime(2024, 1, 1), datetime(2024, 1, 31), as_of=as_of).empty
+
+def test_manager_rejects_as_of_for_unversioned_items(mongo_client):
+    from alphahelix_database_tools.us_stock_database.data_manager import UsStockDataManager
+
+    with UsStockDataManager("user", "password") as manager:
+        with pytest.raises(ValueError):
+            manager.get_item_df("shares_outstanding", "by_date", "2024-01-01", "2024-01-31", as_of=_utc_now())
+
+    with UsStockDataManager("user", "password", versioned_item_list=["shares_outstanding"]) as manager:
+        assert manager._get_dao_instance("shares_outstanding").version_collection is not None